@@ -97,6 +97,7 @@ MIDDLEWARE = [
     'impersonate.middleware.ImpersonateMiddleware',
     'simple_history.middleware.HistoryRequestMiddleware',
     'users.middleware.EnsureProfileMiddleware',
+    'users.middleware.SessionRegistryMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -155,6 +156,15 @@ else:
         }
     }
 
+# Finished quizzes are written to UserAnswer by the request that finishes them, unless a separate
+# `manage.py drain_answer_queue --follow` worker consumes the answer queue (see quiz/ingest.py)
+ANSWER_QUEUE_WORKER = get_env_variable('ANSWER_QUEUE_WORKER', 'False') == 'True'
+
+# Without REDIS_URL the security dashboard's answer-rate counters live in the cache, which is
+# per-process with LocMemCache. Set to True to keep them in the database instead (shared by every
+# worker, at the cost of a write per answered question; see quiz/answer_rate.py)
+ANSWER_RATE_DB_FALLBACK = get_env_variable('ANSWER_RATE_DB_FALLBACK', 'False') == 'True'
+
 # Password validation - Enhanced for production
 AUTH_PASSWORD_VALIDATORS = [
     {
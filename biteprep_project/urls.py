@@ -10,93 +10,43 @@ from django.contrib.admin.sites import site
 from django.contrib.auth import views as auth_views
 
 # Imports for the Custom Dashboard
-from django.contrib.auth.models import User
-from quiz.models import Question, UserAnswer, QuestionReport, ContactInquiry
+from django.contrib import messages
+from django.shortcuts import redirect
+from quiz.admin_metrics import get_admin_index_metrics, refresh_admin_index_metrics
 
-# FIX: Import DatabaseError and logging
-from django.db.utils import DatabaseError
 import logging
 
-# We must ensure Profile is imported if it exists
-try:
-    from users.models import Profile
-except ImportError:
-    Profile = None
-
-from django.db.models import Count, Q
-from django.utils import timezone
-from datetime import timedelta
-
 # Setup logger
 logger = logging.getLogger(__name__)
 
 # --- Custom Admin Site Definition ---
 class BitePrepOTPAdminSite(OTPAdminSite):
     def index(self, request, extra_context=None):
-        """Override the index view. Must be robust against DatabaseErrors during migration."""
+        """Override the index view. KPIs come from a cached snapshot refreshed in the background."""
         extra_context = extra_context or {}
 
-        # Calculate KPIs
-        today = timezone.now().date()
-        last_7_days = today - timedelta(days=7)
-
-        # Initialize defaults
-        new_users_today = 0
-        new_users_7d = 0
-        active_subscriptions = 0
-        total_answers_taken = 0
-        live_questions = 0
-        draft_questions = 0
-        open_reports = 0
-        new_inquiries = 0
-
-        # FIX: Wrap all database access in a try/except block for resilience
-        try:
-            # User Stats
-            new_users_today = User.objects.filter(date_joined__date=today).count()
-            new_users_7d = User.objects.filter(date_joined__date__gte=last_7_days).count()
-
-            # Subscription Stats
-            if Profile:
-                active_subscriptions = Profile.objects.filter(
-                    Q(membership='Monthly') | Q(membership='Annual'),
-                    membership_expiry_date__gte=today
-                ).count()
-
-            total_answers_taken = UserAnswer.objects.count()
-
-            # Content and Support Stats (These rely on the 'status' column)
-            # We use a nested try/except specifically for the status column issue.
-            try:
-                live_questions = Question.objects.filter(status='LIVE').count()
-                draft_questions = Question.objects.filter(status='DRAFT').count()
-                open_reports = QuestionReport.objects.filter(status='OPEN').count()
-                new_inquiries = ContactInquiry.objects.filter(status='NEW').count()
-            except DatabaseError:
-                # Fallback if the 'status' column specifically is missing
-                logger.warning("DatabaseError (Status Columns) in Admin Dashboard. Migrations may be incomplete. Using fallback values.")
-                live_questions = Question.objects.count()  # Assume all are live if column missing
-                # Reports/Inquiries cannot be counted without status, remain 0.
-
-        except DatabaseError as e:
-            # Catch-all for broader database issues (e.g., tables don't exist yet)
-            logger.error(f"General DatabaseError in Admin Dashboard: {e}. Initial migrations likely pending.")
-            pass  # All values remain at their defaults (0)
-
-        # Add stats to context
-        extra_context['dashboard_stats'] = {
-            'new_users_today': new_users_today,
-            'new_users_7d': new_users_7d,
-            'active_subscriptions': active_subscriptions,
-            'live_questions': live_questions,
-            'draft_questions': draft_questions,
-            'total_answers_taken': total_answers_taken,
-            'open_reports': open_reports,
-            'new_inquiries': new_inquiries,
-        }
+        # OPTIMIZATION: Served from a stale-while-revalidate snapshot (see quiz/admin_metrics.py)
+        # instead of eight count queries on every load
+        snapshot = get_admin_index_metrics()
+        extra_context['dashboard_stats'] = snapshot['stats']
+        extra_context['dashboard_stats_as_of'] = snapshot['computed_at']
 
         return super().index(request, extra_context)
 
+    def get_urls(self):
+        return [
+            path('refresh-metrics/', self.admin_view(self.refresh_metrics), name='refresh_metrics'),
+        ] + super().get_urls()
+
+    def refresh_metrics(self, request):
+        """Recomputes the index KPIs now (POST only)."""
+        if request.method == 'POST':
+            if refresh_admin_index_metrics() is None:
+                messages.info(request, "The dashboard figures are already being refreshed.")
+            else:
+                messages.success(request, "Dashboard figures refreshed.")
+        return redirect(f'{self.name}:index')
+
 # Initialize the custom admin site
 otp_admin_site = BitePrepOTPAdminSite()
 
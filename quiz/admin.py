@@ -4,7 +4,7 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.text import Truncator
-from .models import Category, Topic, Subtopic, Question, Answer, UserAnswer, QuestionReport, ContactInquiry, FlaggedQuestion
+from .models import Category, Topic, Subtopic, Question, Answer, UserAnswer, QuestionReport, ContactInquiry, FlaggedQuestion, ExamBlueprint, BlueprintStratum
 
 # Import for History/Audit Log
 from simple_history.admin import SimpleHistoryAdmin
@@ -28,6 +28,29 @@ def get_admin_link(obj, display_text=None):
 
 # --- Model Admins ---
 
+class DifficultyFilter(admin.SimpleListFilter):
+    """Filters questions by their precomputed QuestionStats p-value (proportion answered correctly)."""
+    title = 'difficulty'
+    parameter_name = 'difficulty'
+
+    def lookups(self, request, model_admin):
+        return [('hard', 'Hard (< 30% correct)'), ('medium', 'Medium'), ('easy', 'Easy (> 80% correct)'),
+                ('poor', 'Poor discrimination (< 0.2)'), ('unanswered', 'Not answered yet')]
+
+    def queryset(self, request, queryset):
+        if self.value() == 'hard':
+            return queryset.filter(stats__p_value__lt=0.3)
+        if self.value() == 'medium':
+            return queryset.filter(stats__p_value__gte=0.3, stats__p_value__lte=0.8)
+        if self.value() == 'easy':
+            return queryset.filter(stats__p_value__gt=0.8)
+        if self.value() == 'poor':
+            return queryset.filter(stats__discrimination__lt=0.2)
+        if self.value() == 'unanswered':
+            return queryset.exclude(stats__attempts__gt=0)
+        return queryset
+
+
 class AnswerInline(admin.TabularInline):
     model = Answer
     extra = 1 
@@ -42,12 +65,13 @@ class QuestionAdmin(SimpleHistoryAdmin):
     ]
     inlines = [AnswerInline]
     # FIX: Added 'status' to list_display and list_editable
-    list_display = ('question_text_short', 'subtopic', 'get_topic', 'status')
-    list_filter = ['status', 'subtopic__topic__category', 'subtopic__topic', 'subtopic']
+    list_display = ('question_text_short', 'subtopic', 'get_topic', 'status', 'get_attempts', 'get_p_value', 'get_discrimination')
+    list_filter = ['status', DifficultyFilter, 'subtopic__topic__category', 'subtopic__topic', 'subtopic']
     list_editable = ('status',) # Make status editable in the list
     
     search_fields = ['question_text', 'explanation']
-    list_select_related = ('subtopic__topic__category',)
+    # OPTIMIZATION: Item statistics are joined from the precomputed QuestionStats row
+    list_select_related = ('subtopic__topic__category', 'stats')
 
     def question_text_short(self, obj): return str(obj)
     question_text_short.short_description = 'Question Text'
@@ -60,6 +84,22 @@ class QuestionAdmin(SimpleHistoryAdmin):
     get_category.short_description = 'Category'
     get_category.admin_order_field = 'subtopic__topic__category__name'
 
+    def get_attempts(self, obj): return getattr(getattr(obj, 'stats', None), 'attempts', 0)
+    get_attempts.short_description = 'Attempts'
+    get_attempts.admin_order_field = 'stats__attempts'
+
+    def get_p_value(self, obj):
+        p_value = getattr(getattr(obj, 'stats', None), 'p_value', None)
+        return '-' if p_value is None else f'{p_value:.2f}'
+    get_p_value.short_description = 'P-value'
+    get_p_value.admin_order_field = 'stats__p_value'
+
+    def get_discrimination(self, obj):
+        discrimination = getattr(getattr(obj, 'stats', None), 'discrimination', None)
+        return '-' if discrimination is None else f'{discrimination:.2f}'
+    get_discrimination.short_description = 'Discrimination'
+    get_discrimination.admin_order_field = 'stats__discrimination'
+
 @admin.register(UserAnswer)
 class UserAnswerAdmin(admin.ModelAdmin):
     list_display = ('user_link', 'question_link', 'is_correct', 'timestamp')
@@ -142,4 +182,18 @@ class FlaggedQuestionAdmin(admin.ModelAdmin):
     user_link.short_description = 'User'
 
     def question_link(self, obj): return get_admin_link(obj.question)
-    question_link.short_description = 'Question'
\ No newline at end of file
+    question_link.short_description = 'Question'
+
+
+class BlueprintStratumInline(admin.TabularInline):
+    model = BlueprintStratum
+    extra = 1
+    autocomplete_fields = ('category', 'topic')
+
+@admin.register(ExamBlueprint)
+class ExamBlueprintAdmin(SimpleHistoryAdmin):
+    list_display = ('name', 'total_questions', 'min_per_subtopic', 'time_limit_minutes', 'is_active')
+    list_editable = ('is_active',)
+    list_filter = ('is_active',)
+    search_fields = ('name', 'description')
+    inlines = [BlueprintStratumInline]
@@ -0,0 +1,124 @@
+# quiz/admin_metrics.py
+
+import logging
+import threading
+import uuid
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+from django.db.utils import DatabaseError
+from django.utils import timezone
+
+from .models import ContactInquiry, Question, QuestionReport, UserAnswer
+
+try:
+    from users.models import Profile
+except ImportError:
+    Profile = None
+
+logger = logging.getLogger(__name__)
+
+# Stale-while-revalidate snapshot of the OTP admin index KPIs. The index is served from the cached
+# snapshot straight away; once it is older than ADMIN_METRICS_TTL the request that notices starts a
+# background refresh and still renders the stale values. A cache lock (cache.add) makes sure only one
+# worker recomputes at a time. The snapshot never expires, so only the very first load (or one after
+# a cache flush) counts synchronously. Staff can force a refresh from the index page.
+ADMIN_METRICS_KEY = 'quiz:admin_index_metrics'
+ADMIN_METRICS_LOCK_KEY = 'quiz:admin_index_metrics_lock'
+ADMIN_METRICS_TTL = 60  # Seconds before a snapshot is refreshed in the background
+ADMIN_METRICS_LOCK_TIMEOUT = 60  # Releases the lock if a refreshing worker dies
+
+
+def compute_admin_index_metrics():
+    """Counts the admin index KPIs. Robust against DatabaseErrors during migrations."""
+    today = timezone.now().date()
+    last_7_days = today - timedelta(days=7)
+
+    # Initialize defaults
+    stats = dict.fromkeys([
+        'new_users_today', 'new_users_7d', 'active_subscriptions', 'live_questions', 'draft_questions',
+        'total_answers_taken', 'open_reports', 'new_inquiries',
+    ], 0)
+
+    # FIX: Wrap all database access in a try/except block for resilience
+    try:
+        # User Stats
+        stats['new_users_today'] = User.objects.filter(date_joined__date=today).count()
+        stats['new_users_7d'] = User.objects.filter(date_joined__date__gte=last_7_days).count()
+
+        # Subscription Stats
+        if Profile:
+            stats['active_subscriptions'] = Profile.objects.filter(
+                Q(membership='Monthly') | Q(membership='Annual'),
+                membership_expiry_date__gte=today
+            ).count()
+
+        stats['total_answers_taken'] = UserAnswer.objects.count()
+
+        # Content and Support Stats (These rely on the 'status' column)
+        # We use a nested try/except specifically for the status column issue.
+        try:
+            stats['live_questions'] = Question.objects.filter(status='LIVE').count()
+            stats['draft_questions'] = Question.objects.filter(status='DRAFT').count()
+            stats['open_reports'] = QuestionReport.objects.filter(status='OPEN').count()
+            stats['new_inquiries'] = ContactInquiry.objects.filter(status='NEW').count()
+        except DatabaseError:
+            # Fallback if the 'status' column specifically is missing
+            logger.warning("DatabaseError (Status Columns) in Admin Dashboard. Migrations may be incomplete. Using fallback values.")
+            stats['live_questions'] = Question.objects.count()  # Assume all are live if column missing
+            # Reports/Inquiries cannot be counted without status, remain 0.
+
+    except DatabaseError as e:
+        # Catch-all for broader database issues (e.g., tables don't exist yet)
+        logger.error(f"General DatabaseError in Admin Dashboard: {e}. Initial migrations likely pending.")
+
+    return stats
+
+
+def _store_snapshot():
+    snapshot = {'stats': compute_admin_index_metrics(), 'computed_at': timezone.now()}
+    cache.set(ADMIN_METRICS_KEY, snapshot, None)
+    return snapshot
+
+
+def refresh_admin_index_metrics():
+    """Recomputes the snapshot if no other worker is already doing so. Returns the new snapshot, or None
+    if the lock was held."""
+    token = uuid.uuid4().hex
+    if not cache.add(ADMIN_METRICS_LOCK_KEY, token, ADMIN_METRICS_LOCK_TIMEOUT):
+        return None
+    try:
+        return _store_snapshot()
+    finally:
+        # Only release our own lock (it may have timed out and been taken by another worker)
+        if cache.get(ADMIN_METRICS_LOCK_KEY) == token:
+            cache.delete(ADMIN_METRICS_LOCK_KEY)
+
+
+def _refresh_in_thread():
+    try:
+        refresh_admin_index_metrics()
+    except Exception as e:
+        logger.error(f"Error refreshing admin index metrics: {e}", exc_info=True)
+    finally:
+        # The thread opened its own database connection
+        connection.close()
+
+
+def start_background_refresh():
+    threading.Thread(target=_refresh_in_thread, name='admin-metrics-refresh', daemon=True).start()
+
+
+def get_admin_index_metrics():
+    """Returns the cached {'stats', 'computed_at'} snapshot, refreshing it in the background when stale."""
+    snapshot = cache.get(ADMIN_METRICS_KEY)
+    if snapshot is None:
+        # Nothing to serve yet: count now (another worker counting at the same time just wins the write)
+        return refresh_admin_index_metrics() or _store_snapshot()
+    if timezone.now() - snapshot['computed_at'] > timedelta(seconds=ADMIN_METRICS_TTL) \
+            and cache.get(ADMIN_METRICS_LOCK_KEY) is None:
+        start_background_refresh()
+    return snapshot
@@ -0,0 +1,154 @@
+# quiz/answer_rate.py
+
+import logging
+import time
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+
+from .models import AnswerRateBucket
+from .redis_store import get_redis, redis_key
+
+logger = logging.getLogger(__name__)
+
+# Real-time answer-rate counters for the security dashboard. Every question answered in the quiz player
+# (the first answer saved for it in the attempt; changing the choice doesn't count again) bumps the
+# user's count in the current minute's bucket (a Redis sorted set, ZINCRBY - atomic and O(log n));
+# buckets expire once they fall out of the longest window. A sliding window is the sum of its minute
+# buckets, so the top answerers over the last hour are one ZUNIONSTORE of 60 small sets, with no query
+# against UserAnswer (whose upserted timestamps miss repeat activity) or AnswerEvent (written only when
+# the answer queue drains). Without REDIS_URL each user's minute is a cache counter (an atomic
+# cache.add, then cache.incr), and each minute keeps a numbered list of the users counted in it so a
+# window can be summed with three get_many calls; recording an answer never touches the database.
+# The cache is per-process unless it is shared (Redis, Memcached), so a deployment with neither can set
+# ANSWER_RATE_DB_FALLBACK to keep the buckets in AnswerRateBucket rows shared by every worker instead,
+# at the cost of an upsert per counted answer and one grouped query per window read.
+ANSWER_RATE_WINDOW_MINUTES = 60
+ANSWER_RATE_BUCKET_TIMEOUT = (ANSWER_RATE_WINDOW_MINUTES + 1) * 60
+RAPID_ANSWER_THRESHOLD = 100  # More than 100 answers in an hour is suspicious
+ANSWER_RATE_PRUNE_KEY = 'quiz:answer_rate:pruned'
+ANSWER_RATE_PRUNE_INTERVAL = 60  # Seconds between prunes of expired AnswerRateBucket rows
+
+
+def _bucket_key(minute):
+    return redis_key(f'quiz:answer_rate:{minute}')
+
+
+def _counter_key(minute, user_id):
+    return f'quiz:answer_rate:{minute}:{user_id}'
+
+
+def _member_count_key(minute):
+    return f'quiz:answer_rate:{minute}:members'
+
+
+def _member_key(minute, slot):
+    return f'quiz:answer_rate:{minute}:member:{slot}'
+
+
+def _current_minute(now=None):
+    return int((now or time.time()) // 60)
+
+
+def _record_in_db(user_id, minute):
+    updated = AnswerRateBucket.objects.filter(minute=minute, user_id=user_id).update(answers=F('answers') + 1)
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            AnswerRateBucket.objects.create(minute=minute, user_id=user_id, answers=1)
+    except IntegrityError:
+        # Another request created the bucket first
+        AnswerRateBucket.objects.filter(minute=minute, user_id=user_id).update(answers=F('answers') + 1)
+
+    # The first answer after the interval (in any worker sharing the cache) drops expired buckets
+    if cache.add(ANSWER_RATE_PRUNE_KEY, True, ANSWER_RATE_PRUNE_INTERVAL):
+        AnswerRateBucket.objects.filter(minute__lte=_current_minute() - ANSWER_RATE_WINDOW_MINUTES).delete()
+
+
+def _record_in_cache(user_id, minute):
+    if not cache.add(_counter_key(minute, user_id), 1, ANSWER_RATE_BUCKET_TIMEOUT):
+        cache.incr(_counter_key(minute, user_id))
+        return
+    # The user's first answer this minute: add them to the minute's list of users
+    cache.add(_member_count_key(minute), 0, ANSWER_RATE_BUCKET_TIMEOUT)
+    slot = cache.incr(_member_count_key(minute))
+    cache.set(_member_key(minute, slot), user_id, ANSWER_RATE_BUCKET_TIMEOUT)
+
+
+def _cached_window_counts(minutes):
+    """Returns {user_id: answers} summed over the minutes' cache counters."""
+    member_counts = cache.get_many([_member_count_key(minute) for minute in minutes])
+    slot_minutes = {_member_key(minute, slot): minute for minute in minutes
+                    for slot in range(1, member_counts.get(_member_count_key(minute), 0) + 1)}
+    members = cache.get_many(list(slot_minutes))
+    counter_keys = {_counter_key(slot_minutes[key], user_id): user_id for key, user_id in members.items()}
+    totals = Counter()
+    for key, answers in cache.get_many(list(counter_keys)).items():
+        totals[counter_keys[key]] += answers
+    return totals
+
+
+def record_answer(user_id, now=None):
+    """Counts one answer by the user in the current minute."""
+    minute = _current_minute(now)
+    client = get_redis()
+    if client is None:
+        if settings.ANSWER_RATE_DB_FALLBACK:
+            _record_in_db(user_id, minute)
+        else:
+            _record_in_cache(user_id, minute)
+        return
+
+    key = _bucket_key(minute)
+    with client.pipeline(transaction=False) as pipe:
+        pipe.zincrby(key, 1, user_id)
+        pipe.expire(key, ANSWER_RATE_BUCKET_TIMEOUT)
+        pipe.execute()
+
+
+def _window_minutes(window_minutes):
+    minute = _current_minute()
+    return range(minute - min(window_minutes, ANSWER_RATE_WINDOW_MINUTES) + 1, minute + 1)
+
+
+def get_top_answerers(window_minutes=ANSWER_RATE_WINDOW_MINUTES, limit=10):
+    """Returns [(user_id, answers)] for the users with the most answers in the last `window_minutes`
+    minutes (including the current one), busiest first."""
+    minutes = _window_minutes(window_minutes)
+    client = get_redis()
+    if client is None and not settings.ANSWER_RATE_DB_FALLBACK:
+        return sorted(_cached_window_counts(minutes).items(), key=lambda item: (-item[1], item[0]))[:limit]
+    if client is None:
+        return list(AnswerRateBucket.objects.filter(minute__gte=minutes[0], minute__lte=minutes[-1])
+                    .values('user_id').annotate(total=Sum('answers'))
+                    .order_by('-total', 'user_id').values_list('user_id', 'total')[:limit])
+
+    # Sum the buckets into a scratch key (ZUNION needs Redis 6.2) and read the top of it in one round trip
+    scratch = redis_key(f'quiz:answer_rate:top:{uuid.uuid4().hex}')
+    with client.pipeline() as pipe:
+        pipe.zunionstore(scratch, [_bucket_key(minute) for minute in minutes])
+        pipe.zrevrange(scratch, 0, limit - 1, withscores=True)
+        pipe.delete(scratch)
+        _, top, _ = pipe.execute()
+    return [(int(member), int(score)) for member, score in top]
+
+
+def get_user_answer_count(user_id, window_minutes=ANSWER_RATE_WINDOW_MINUTES):
+    """Returns the user's answers in the last `window_minutes` minutes."""
+    minutes = _window_minutes(window_minutes)
+    client = get_redis()
+    if client is None and not settings.ANSWER_RATE_DB_FALLBACK:
+        return sum(cache.get_many([_counter_key(minute, user_id) for minute in minutes]).values())
+    if client is None:
+        return (AnswerRateBucket.objects.filter(user_id=user_id, minute__gte=minutes[0], minute__lte=minutes[-1])
+                .aggregate(total=Sum('answers'))['total'] or 0)
+
+    with client.pipeline(transaction=False) as pipe:
+        for minute in minutes:
+            pipe.zscore(_bucket_key(minute), user_id)
+        return int(sum(score or 0 for score in pipe.execute()))
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class QuizConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'quiz'
+
+    # Import the signals that keep the cached question bank views fresh
+    def ready(self):
+        import quiz.signals
@@ -0,0 +1,187 @@
+# quiz/attempts.py
+
+import json
+import uuid
+import logging
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import QuizAttempt, QuizAttemptAnswer
+from .redis_store import get_redis, redis_key
+
+logger = logging.getLogger(__name__)
+
+# A quiz attempt lives server-side and the session only holds its ID, so answering a question is a
+# single-field write instead of re-pickling the whole quiz into the session on every request.
+# With REDIS_URL set, an attempt is two Redis hashes (settings and answers, one field per question);
+# otherwise it falls back to the QuizAttempt/QuizAttemptAnswer tables with one row per answer.
+# Separate tabs write separate fields/rows, so they no longer overwrite each other's answers.
+ATTEMPT_SESSION_KEY = 'quiz_attempt_id'
+# The last finished attempt, kept for the paginated results review
+REVIEW_SESSION_KEY = 'quiz_review_attempt_id'
+ATTEMPT_TTL = 60 * 60 * 24  # 24 hours (from the last write in Redis, from creation in the DB)
+
+def _meta_key(attempt_id):
+    return redis_key(f'quiz:attempt:{attempt_id}:meta')
+
+
+def _answers_key(attempt_id):
+    return redis_key(f'quiz:attempt:{attempt_id}:answers')
+
+
+def _touch(pipe, attempt_id):
+    pipe.expire(_meta_key(attempt_id), ATTEMPT_TTL)
+    pipe.expire(_answers_key(attempt_id), ATTEMPT_TTL)
+
+
+def _valid_attempt_id(attempt_id):
+    try:
+        return str(uuid.UUID(str(attempt_id)))
+    except (ValueError, TypeError):
+        return None
+
+
+def create_attempt(user_id, meta):
+    """Stores a new attempt for the user and returns its ID."""
+    client = get_redis()
+    if client is None:
+        return str(QuizAttempt.objects.create(user_id=user_id, meta=meta).id)
+
+    attempt_id = str(uuid.uuid4())
+    meta = dict(meta, user_id=user_id, current_index=1)
+    with client.pipeline() as pipe:
+        pipe.hset(_meta_key(attempt_id), mapping={field: json.dumps(value) for field, value in meta.items()})
+        pipe.expire(_meta_key(attempt_id), ATTEMPT_TTL)
+        pipe.execute()
+    return attempt_id
+
+
+def get_attempt_meta(attempt_id, user_id):
+    """Returns the attempt settings (question_ids, mode, timer, penalty, current_index) or None
+    if the attempt does not exist, has expired or belongs to another user."""
+    attempt_id = _valid_attempt_id(attempt_id)
+    if attempt_id is None:
+        return None
+
+    client = get_redis()
+    if client is None:
+        attempt = (QuizAttempt.objects.filter(pk=attempt_id, user_id=user_id,
+                                              created_at__gte=timezone.now() - timedelta(seconds=ATTEMPT_TTL))
+                   .only('meta', 'current_index').first())
+        if attempt is None:
+            return None
+        return dict(attempt.meta, current_index=attempt.current_index)
+
+    raw = client.hgetall(_meta_key(attempt_id))
+    if not raw:
+        return None
+    meta = {field.decode(): json.loads(value) for field, value in raw.items()}
+    # Security: an attempt ID is only usable by the user who started it
+    if meta.pop('user_id', None) != user_id:
+        logger.warning(f"User {user_id} tried to load quiz attempt {attempt_id} owned by another user")
+        return None
+    return meta
+
+
+def update_attempt_meta(attempt_id, **fields):
+    """Overwrites individual attempt settings; a value of None removes the setting."""
+    client = get_redis()
+    if client is None:
+        updates = {}
+        if 'current_index' in fields:
+            updates['current_index'] = fields.pop('current_index')
+        if fields:
+            with transaction.atomic():
+                attempt = QuizAttempt.objects.select_for_update().only('meta').get(pk=attempt_id)
+                for field, value in fields.items():
+                    if value is None:
+                        attempt.meta.pop(field, None)
+                    else:
+                        attempt.meta[field] = value
+                updates['meta'] = attempt.meta
+        QuizAttempt.objects.filter(pk=attempt_id).update(updated_at=timezone.now(), **updates)
+        return
+
+    with client.pipeline() as pipe:
+        removed = [field for field, value in fields.items() if value is None]
+        changed = {field: json.dumps(value) for field, value in fields.items() if value is not None}
+        if removed:
+            pipe.hdel(_meta_key(attempt_id), *removed)
+        if changed:
+            pipe.hset(_meta_key(attempt_id), mapping=changed)
+        _touch(pipe, attempt_id)
+        pipe.execute()
+
+
+def get_attempt_answers(attempt_id, question_ids=None):
+    """Returns {question_id: {'answer_id', 'is_correct', 'is_submitted'}} for the attempt,
+    optionally limited to the given question IDs."""
+    client = get_redis()
+    if client is None:
+        rows = QuizAttemptAnswer.objects.filter(attempt_id=attempt_id)
+        if question_ids is not None:
+            rows = rows.filter(question_id__in=question_ids)
+        return {
+            question_id: {'answer_id': answer_id, 'is_correct': is_correct, 'is_submitted': is_submitted}
+            for question_id, answer_id, is_correct, is_submitted
+            in rows.values_list('question_id', 'answer_id', 'is_correct', 'is_submitted')
+        }
+
+    if question_ids is None:
+        raw = client.hgetall(_answers_key(attempt_id))
+        return {int(field): json.loads(value) for field, value in raw.items()}
+    question_ids = list(question_ids)
+    values = client.hmget(_answers_key(attempt_id), question_ids) if question_ids else []
+    return {question_id: json.loads(value) for question_id, value in zip(question_ids, values) if value is not None}
+
+
+def get_attempt_answer(attempt_id, question_id):
+    """Returns the stored answer info for one question of the attempt, or None."""
+    return get_attempt_answers(attempt_id, [question_id]).get(question_id)
+
+
+def save_attempt_answer(attempt_id, question_id, answer_info):
+    """Writes the answer for one question (a single hash field or a single row upsert)."""
+    client = get_redis()
+    if client is None:
+        QuizAttemptAnswer.objects.bulk_create(
+            [QuizAttemptAnswer(attempt_id=attempt_id, question_id=question_id, **answer_info)],
+            update_conflicts=True,
+            unique_fields=['attempt', 'question_id'],
+            update_fields=['answer_id', 'is_correct', 'is_submitted'],
+        )
+        return
+
+    with client.pipeline() as pipe:
+        pipe.hset(_answers_key(attempt_id), question_id, json.dumps(answer_info))
+        _touch(pipe, attempt_id)
+        pipe.execute()
+
+
+def clear_attempt_answers(attempt_id):
+    """Removes every answer from the attempt (restarting the quiz)."""
+    client = get_redis()
+    if client is None:
+        QuizAttemptAnswer.objects.filter(attempt_id=attempt_id).delete()
+        return
+    client.delete(_answers_key(attempt_id))
+
+
+def delete_attempt(attempt_id):
+    attempt_id = _valid_attempt_id(attempt_id)
+    if attempt_id is None:
+        return
+    client = get_redis()
+    if client is None:
+        QuizAttempt.objects.filter(pk=attempt_id).delete()
+        return
+    client.delete(_meta_key(attempt_id), _answers_key(attempt_id))
+
+
+def prune_attempts():
+    """Deletes abandoned DB-backed attempts (Redis attempts expire on their own). Returns the count."""
+    cutoff = timezone.now() - timedelta(seconds=ATTEMPT_TTL)
+    deleted, _ = QuizAttempt.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
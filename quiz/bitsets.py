@@ -0,0 +1,249 @@
+# quiz/bitsets.py
+
+import random
+import logging
+from functools import reduce
+from operator import or_
+
+from django.core.cache import cache
+
+from .models import UserAnswer
+from .sampling import get_subtopic_pools, sample_question_ids
+from .taxonomy import get_bank_version, get_taxonomy_snapshot
+from .versions import bump_versions, get_version
+
+logger = logging.getLogger(__name__)
+
+# Question sets are stored as Python ints used as bitsets: bit N is set when question ID N is
+# in the set. Set algebra is then plain bitwise arithmetic and .bit_count() gives the size.
+BITSET_CACHE_TIMEOUT = 60 * 60 * 24  # 24 hours
+
+# Below this share of eligible questions in the selected pools, the eligible IDs are enumerated
+# straight from the bitset instead of being rejection-sampled from the pools.
+REJECTION_SAMPLING_MIN_DENSITY = 0.25
+
+
+# --- Bitset helpers ---
+
+def ids_to_bits(question_ids):
+    """Packs an iterable of question IDs into an int bitset."""
+    question_ids = list(question_ids)
+    if not question_ids:
+        return 0
+    packed = bytearray(max(question_ids) // 8 + 1)
+    for question_id in question_ids:
+        packed[question_id >> 3] |= 1 << (question_id & 7)
+    return int.from_bytes(packed, 'little')
+
+
+def iter_bits(bits):
+    """Yields the question IDs set in a bitset, in ascending order."""
+    packed = bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+    for byte_index, byte in enumerate(packed):
+        while byte:
+            low_bit = byte & -byte
+            yield (byte_index << 3) + low_bit.bit_length() - 1
+            byte ^= low_bit
+
+
+def bit_predicate(bits):
+    """Returns an O(1) membership test for a bitset (used as a sampling predicate)."""
+    packed = bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+    size = len(packed)
+
+    def contains(question_id):
+        byte_index = question_id >> 3
+        return byte_index < size and bool(packed[byte_index] >> (question_id & 7) & 1)
+    return contains
+
+
+# --- Live question bitsets (shared, versioned with the question bank) ---
+
+def get_subtopic_bitsets(subtopic_ids, version=None):
+    """Returns {subtopic_id: bitset of live question IDs}, cached per subtopic."""
+    if version is None:
+        version = get_bank_version()
+    subtopic_ids = set(subtopic_ids)
+    keys = {f'quiz:live_bits:{version}:{subtopic_id}': subtopic_id for subtopic_id in subtopic_ids}
+    bitsets = {keys[key]: bits for key, bits in cache.get_many(keys).items()}
+
+    missing = subtopic_ids - bitsets.keys()
+    if missing:
+        fresh = {subtopic_id: ids_to_bits(pool) for subtopic_id, pool in get_subtopic_pools(missing, version).items()}
+        cache.set_many({f'quiz:live_bits:{version}:{subtopic_id}': bits for subtopic_id, bits in fresh.items()}, BITSET_CACHE_TIMEOUT)
+        bitsets.update(fresh)
+    return bitsets
+
+
+def get_live_bitset(subtopic_ids=None, version=None):
+    """Returns the bitset of live questions in the given subtopics (all live subtopics if None)."""
+    if version is None:
+        version = get_bank_version()
+    if subtopic_ids is not None:
+        return reduce(or_, get_subtopic_bitsets(subtopic_ids, version).values(), 0)
+
+    cache_key = f'quiz:live_bits:{version}:all'
+    bits = cache.get(cache_key)
+    if bits is None:
+        subtopic_ids = get_taxonomy_snapshot()['subtopics'].keys()
+        bits = reduce(or_, get_subtopic_bitsets(subtopic_ids, version).values(), 0)
+        cache.set(cache_key, bits, BITSET_CACHE_TIMEOUT)
+    return bits
+
+
+# --- Per-user answer history bitsets ---
+
+# Cached under the user's answer history version (quiz/versions.py), which every writer of the user's
+# answers bumps: quiz_results, the answer queue drain, a rescore and a reset. The version is kept in
+# the database, so the drain worker or `manage.py rescore_answers` invalidates the bitsets cached by
+# every web worker, not just its own LocMemCache.
+
+def _user_history_name(user_id):
+    return f'user_answers:{user_id}'
+
+
+def _user_bits_key(user_id, generation):
+    return f'quiz:user_bits:{user_id}:{generation}'
+
+
+def build_user_bitsets(user_id):
+    """Rebuilds (answered, correct) bitsets for a user from UserAnswer in one query, plus the results
+    still waiting in the answer queue: quiz_results records a quiz's results before a drain worker has
+    written them, and a rebuild in between must not drop them."""
+    from .ingest import get_pending_results  # ingest imports this module
+
+    latest = dict(UserAnswer.objects.filter(user_id=user_id).values_list('question_id', 'is_correct').iterator())
+    latest.update(get_pending_results(user_id))
+    return ids_to_bits(latest), ids_to_bits(question_id for question_id, is_correct in latest.items() if is_correct)
+
+
+def get_user_bitsets(user_id):
+    """Returns the user's (answered, correct) question bitsets, rebuilding from the DB on a miss."""
+    cache_key = _user_bits_key(user_id, get_user_generation(user_id))
+    bitsets = cache.get(cache_key)
+    if bitsets is None:
+        bitsets = build_user_bitsets(user_id)
+        cache.set(cache_key, bitsets, BITSET_CACHE_TIMEOUT)
+    return bitsets
+
+
+def get_user_generation(user_id):
+    """Returns the user's current answer history version."""
+    return get_version(_user_history_name(user_id))
+
+
+def record_user_answers(user_id, results):
+    """Invalidates the user's cached bitsets in every process, applying (question_id, is_correct)
+    results to the copy in this process's cache so it needn't be rebuilt.
+
+    quiz_results calls it as soon as a quiz's results are queued, so with a drain worker the UserAnswer
+    rows may not be written yet; the drain calls it again once they are. Applying the same results twice
+    is harmless, and a rebuild from UserAnswer in between still includes them, since build_user_bitsets
+    adds the results waiting in the queue.
+    """
+    name = _user_history_name(user_id)
+    # The copy cached under the version this bump replaced, which holds every earlier writer's results
+    # (a writer still storing its own copy leaves a miss here, and the next read rebuilds)
+    previous = bump_versions([name])[name]
+    bitsets = cache.get(_user_bits_key(user_id, previous))
+    if bitsets is None:
+        # Nothing cached to update: the next read rebuilds from UserAnswer and the queue
+        return
+
+    answered, correct = bitsets
+    answered_ids = []
+    correct_ids = []
+    incorrect_ids = []
+    for question_id, is_correct in results:
+        answered_ids.append(question_id)
+        (correct_ids if is_correct else incorrect_ids).append(question_id)
+
+    answered |= ids_to_bits(answered_ids)
+    correct = (correct | ids_to_bits(correct_ids)) & ~ids_to_bits(incorrect_ids)
+    cache.set(_user_bits_key(user_id, get_version(name)), (answered, correct), BITSET_CACHE_TIMEOUT)
+
+
+def get_user_subtopic_counts(user_id):
+    """Returns {subtopic_id: (answered, correct)} counts of the user's live answered questions.
+
+    Cached per user generation and bank version, so it is rebuilt at most once per finished quiz
+    and the setup form's live count is a dict lookup per selected subtopic.
+    """
+    generation = get_user_generation(user_id)
+    version = get_bank_version()
+    cache_key = f'quiz:user_subtopic_counts:{user_id}:{generation}:{version}'
+    counts = cache.get(cache_key)
+    if counts is None:
+        answered, correct = get_user_bitsets(user_id)
+        counts = {}
+        if answered:
+            subtopic_ids = get_taxonomy_snapshot()['subtopics'].keys()
+            for subtopic_id, live_bits in get_subtopic_bitsets(subtopic_ids, version).items():
+                answered_live = answered & live_bits
+                if answered_live:
+                    counts[subtopic_id] = (answered_live.bit_count(), (correct & answered_live).bit_count())
+        cache.set(cache_key, counts, BITSET_CACHE_TIMEOUT)
+    return counts
+
+
+def reset_user_bitsets(user_id):
+    """Clears the user's cached history (after reset_performance), in every process."""
+    bump_versions([_user_history_name(user_id)])
+
+
+# --- Filters ---
+
+def filter_candidates(live_bits, answered, correct, question_filter):
+    """Applies a quiz_setup history filter to a live-question bitset."""
+    if question_filter == 'unanswered':
+        return live_bits & ~answered
+    if question_filter == 'correct':
+        return live_bits & correct
+    if question_filter == 'incorrect':
+        return live_bits & answered & ~correct
+    return live_bits
+
+
+def count_matching_questions(user_id, subtopic_ids, question_filter):
+    """Counts live questions matching a quiz_setup selection using only precomputed counts."""
+    subtopics = get_taxonomy_snapshot()['subtopics']
+    subtopic_ids = set(subtopic_ids)
+    live = sum(subtopics[subtopic_id]['live_count'] for subtopic_id in subtopic_ids if subtopic_id in subtopics)
+    if question_filter not in ('unanswered', 'correct', 'incorrect'):
+        return live
+
+    user_counts = get_user_subtopic_counts(user_id)
+    answered = correct = 0
+    for subtopic_id in subtopic_ids:
+        subtopic_answered, subtopic_correct = user_counts.get(subtopic_id, (0, 0))
+        answered += subtopic_answered
+        correct += subtopic_correct
+
+    if question_filter == 'unanswered':
+        return live - answered
+    if question_filter == 'correct':
+        return correct
+    return answered - correct
+
+
+def sample_filtered_question_ids(user_id, subtopic_ids, question_filter, count, rng=None):
+    """Samples up to `count` random live question IDs from the subtopics, honouring the user filter."""
+    rng = rng or random
+    version = get_bank_version()
+    pools = get_subtopic_pools(subtopic_ids, version)
+    if question_filter not in ('unanswered', 'correct', 'incorrect'):
+        return sample_question_ids(subtopic_ids, count, rng=rng, pools=pools)
+
+    live_bits = get_live_bitset(subtopic_ids, version)
+    answered, correct = get_user_bitsets(user_id)
+    candidates = filter_candidates(live_bits, answered, correct, question_filter)
+
+    eligible = candidates.bit_count()
+    if eligible == 0:
+        return []
+    if eligible >= live_bits.bit_count() * REJECTION_SAMPLING_MIN_DENSITY:
+        return sample_question_ids(subtopic_ids, count, accept=bit_predicate(candidates), rng=rng, pools=pools)
+
+    # Sparse result (e.g. a handful of incorrect answers): enumerate only the eligible IDs
+    eligible_ids = list(iter_bits(candidates))
+    return rng.sample(eligible_ids, min(count, eligible))
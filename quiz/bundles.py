@@ -0,0 +1,123 @@
+# quiz/bundles.py
+
+import logging
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+
+from .models import Answer, Question
+from .taxonomy import get_bank_version
+from .versions import bump_versions, get_versions
+
+logger = logging.getLogger(__name__)
+
+# A bundle is a serialized question with its answers, correctness and explanation. Bundles are
+# cached under the question's own content version (quiz/versions.py), bumped when the question or
+# one of its answers is edited, and under the question bank version (quiz/taxonomy.py), bumped only
+# when a question is added, deleted, published or moved (quiz/signals.py). Both live in the
+# database, so an edit in one worker reaches every worker's cache; a per-question counter in the
+# cache did not without Redis, and other workers kept scoring against the old answer key for up to
+# 24 hours. Editing one question leaves every other cached bundle valid.
+BUNDLE_CACHE_TIMEOUT = 60 * 60 * 24  # 24 hours
+
+
+def _content_version_name(question_id):
+    return f'question:{question_id}'
+
+
+def _content_versions(question_ids):
+    """Returns {question_id: version} combining the bank version and each question's content version."""
+    bank_version = get_bank_version()
+    versions = get_versions([_content_version_name(question_id) for question_id in question_ids])
+    return {question_id: f'{bank_version}.{versions[_content_version_name(question_id)]}' for question_id in question_ids}
+
+
+def bump_content_versions(question_ids):
+    """Invalidates the cached bundles and answer keys of the given questions, in every process."""
+    bump_versions(_content_version_name(question_id) for question_id in question_ids)
+
+
+def _bundle_key(question_id, version):
+    return f'quiz:bundle:{question_id}:{version}'
+
+
+def _answer_key_key(question_id, version):
+    return f'quiz:answer_key:{question_id}:{version}'
+
+
+def serialize_question(question):
+    answers = sorted(question.answers.all(), key=lambda answer: answer.id)
+    return {
+        'id': question.id,
+        'subtopic_id': question.subtopic_id,
+        'question_text': question.question_text,
+        'image_name': question.question_image.name if question.question_image else None,
+        'explanation': question.explanation,
+        'answers': [
+            {'id': answer.id, 'answer_text': answer.answer_text, 'is_correct': answer.is_correct}
+            for answer in answers
+        ],
+    }
+
+
+def get_question_bundles(question_ids):
+    """Returns {question_id: bundle} for the given IDs; missing questions are simply absent.
+
+    Steady state is one cache round trip and no queries; cache misses are loaded together
+    with one question query plus one answer query.
+    """
+    question_ids = list(dict.fromkeys(question_ids))
+    versions = _content_versions(question_ids)
+    keys = {_bundle_key(question_id, versions[question_id]): question_id for question_id in question_ids}
+    bundles = {keys[key]: bundle for key, bundle in cache.get_many(keys).items()}
+
+    missing = [question_id for question_id in question_ids if question_id not in bundles]
+    if missing:
+        fresh = {question.id: serialize_question(question)
+                 for question in Question.objects.filter(pk__in=missing).prefetch_related('answers')}
+        cache.set_many({_bundle_key(question_id, versions[question_id]): bundle for question_id, bundle in fresh.items()},
+                       BUNDLE_CACHE_TIMEOUT)
+        bundles.update(fresh)
+
+    # Image URLs are resolved per request (signed storage URLs expire, so they are never cached)
+    for bundle in bundles.values():
+        bundle['image_url'] = default_storage.url(bundle['image_name']) if bundle['image_name'] else None
+    return bundles
+
+
+def get_question_bundle(question_id):
+    """Returns one question bundle, or None if the question does not exist."""
+    return get_question_bundles([question_id]).get(question_id)
+
+
+def get_bundle_answer(bundle, answer_id):
+    """Returns the answer dict with the given ID from a bundle, or None."""
+    return next((answer for answer in bundle['answers'] if answer['id'] == answer_id), None)
+
+
+def get_answer_keys(question_ids):
+    """Returns {question_id: {answer_id: is_correct}} for the given IDs.
+
+    Answer keys share the bundle versions (so an Answer save invalidates them too) but are cached
+    separately, since validating a submission only needs this small map. They are warmed for the
+    whole quiz at start_quiz, so the answer hot path is cache-only; misses cost one Answer query.
+    """
+    question_ids = list(dict.fromkeys(question_ids))
+    versions = _content_versions(question_ids)
+    keys = {_answer_key_key(question_id, versions[question_id]): question_id for question_id in question_ids}
+    answer_keys = {keys[key]: answer_key for key, answer_key in cache.get_many(keys).items()}
+
+    missing = [question_id for question_id in question_ids if question_id not in answer_keys]
+    if missing:
+        fresh = {question_id: {} for question_id in missing}
+        for question_id, answer_id, is_correct in Answer.objects.filter(question_id__in=missing).values_list('question_id', 'id', 'is_correct'):
+            fresh[question_id][answer_id] = is_correct
+        cache.set_many({_answer_key_key(question_id, versions[question_id]): answer_key for question_id, answer_key in fresh.items()},
+                       BUNDLE_CACHE_TIMEOUT)
+        answer_keys.update(fresh)
+    return answer_keys
+
+
+def get_answer_key(question_id):
+    """Returns {answer_id: is_correct} for one question (empty if it has no answers)."""
+    return get_answer_keys([question_id])[question_id]
@@ -0,0 +1,68 @@
+# quiz/dashboard.py
+
+import logging
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .versions import bump_versions, get_version
+
+logger = logging.getLogger(__name__)
+
+# The computed dashboard context is cached per user under a generation number. Anything that changes
+# what the dashboard shows (a finished quiz, its results being drained, a rescore, a stats rebuild, a
+# reset) bumps the user's generation, so stale entries are never read and simply expire. The key also
+# embeds the local date, since the 30-day activity chart moves on at midnight. The generation is a
+# database-backed version (quiz/versions.py), so a bump from the drain worker or a management command
+# reaches every web worker's LocMemCache.
+DASHBOARD_CACHE_TIMEOUT = 60 * 60  # 1 hour
+DASHBOARD_HITS_KEY = 'quiz:dashboard_cache:hits'
+DASHBOARD_MISSES_KEY = 'quiz:dashboard_cache:misses'
+
+
+def _generation_name(user_id):
+    return f'dashboard:{user_id}'
+
+
+def _context_key(user_id, generation):
+    return f'quiz:dashboard:{user_id}:{generation}:{timezone.localdate().isoformat()}'
+
+
+def bump_dashboard_generation(user_id):
+    """Invalidates the user's cached dashboard, in every process."""
+    bump_versions([_generation_name(user_id)])
+
+
+def _count(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def get_dashboard_context(user_id, build):
+    """Returns the user's cached dashboard context, calling build(user_id) to compute it on a miss."""
+    key = _context_key(user_id, get_version(_generation_name(user_id)))
+    context = cache.get(key)
+    if context is not None:
+        _count(DASHBOARD_HITS_KEY)
+        return context
+
+    _count(DASHBOARD_MISSES_KEY)
+    context = build(user_id)
+    cache.set(key, context, DASHBOARD_CACHE_TIMEOUT)
+    return context
+
+
+def get_dashboard_cache_stats():
+    """Returns the dashboard cache's hit/miss counters since they were last reset."""
+    counts = cache.get_many([DASHBOARD_HITS_KEY, DASHBOARD_MISSES_KEY])
+    hits = counts.get(DASHBOARD_HITS_KEY, 0)
+    misses = counts.get(DASHBOARD_MISSES_KEY, 0)
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': hits / (hits + misses) * 100 if hits + misses else 0.0,
+    }
+
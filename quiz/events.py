@@ -0,0 +1,82 @@
+# quiz/events.py
+
+import logging
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+
+from .models import AnswerEvent, UserDailyStats
+from .stats import lock_users
+
+logger = logging.getLogger(__name__)
+
+# Retention and roll-up for the AnswerEvent log. Raw events are kept for ANSWER_EVENT_RETENTION_DAYS
+# (comfortably more than the 30-day charts read); each day is summarised into UserDailyStats, which is
+# kept indefinitely. Run `manage.py rollup_answer_events` daily. Days are rolled up again for
+# ROLLUP_LOOKBACK_DAYS to pick up events the answer queue delivered late.
+ANSWER_EVENT_RETENTION_DAYS = 90
+ROLLUP_LOOKBACK_DAYS = 2
+ROLLUP_BATCH_SIZE = 500  # Users per roll-up transaction (one IN list each; SQLite allows 999 parameters)
+
+
+def _day_bounds(date):
+    """Returns the [start, end) datetimes of a local calendar day."""
+    start = timezone.make_aware(datetime.combine(date, time.min))
+    return start, start + timedelta(days=1)
+
+
+def rollup_answer_events(date):
+    """(Re)computes every user's UserDailyStats row for one day from AnswerEvent. Returns the row count."""
+    start, end = _day_bounds(date)
+    day_events = AnswerEvent.objects.filter(created_at__gte=start, created_at__lt=end)
+    user_ids = list(day_events.order_by('user_id').values_list('user_id', flat=True).distinct())
+    written = 0
+    for offset in range(0, len(user_ids), ROLLUP_BATCH_SIZE):
+        # Users are locked before their events are counted, like the drain that increments the same
+        # rows (see quiz/stats.py), so a batch drained meanwhile is either counted or added afterwards
+        with transaction.atomic():
+            locked = lock_users(user_ids[offset:offset + ROLLUP_BATCH_SIZE])
+            totals = (day_events.filter(user_id__in=locked)
+                      .values('user_id')
+                      .annotate(answered=Count('id'), correct=Count('id', filter=Q(is_correct=True))))
+            stats = [
+                UserDailyStats(user_id=row['user_id'], date=date, answered=row['answered'], correct=row['correct'])
+                for row in totals
+            ]
+            UserDailyStats.objects.bulk_create(
+                stats,
+                update_conflicts=True,
+                unique_fields=['user', 'date'],
+                update_fields=['answered', 'correct'],
+            )
+        written += len(stats)
+    return written
+
+
+def rollup_recent_days(days=ROLLUP_LOOKBACK_DAYS):
+    """Rolls up the last `days` complete days. Returns the number of UserDailyStats rows written."""
+    today = timezone.localdate()
+    return sum(rollup_answer_events(today - timedelta(days=offset)) for offset in range(days, 0, -1))
+
+
+def prune_answer_events(retention_days=ANSWER_EVENT_RETENTION_DAYS):
+    """Deletes events older than the retention window, a whole day at a time, rolling each day up in the
+    same transaction first so no answer is lost from the daily stats. Returns the number deleted."""
+    cutoff, _ = _day_bounds(timezone.localdate() - timedelta(days=retention_days))
+    oldest = AnswerEvent.objects.filter(created_at__lt=cutoff).aggregate(oldest=Min('created_at'))['oldest']
+    if oldest is None:
+        return 0
+
+    deleted = 0
+    date = timezone.localtime(oldest).date()
+    while date < cutoff.date():
+        start, end = _day_bounds(date)
+        with transaction.atomic():
+            rollup_answer_events(date)
+            day_deleted, _ = AnswerEvent.objects.filter(created_at__gte=start, created_at__lt=end).delete()
+        deleted += day_deleted
+        date += timedelta(days=1)
+    logger.info(f"Pruned {deleted} answer events older than {cutoff:%Y-%m-%d}")
+    return deleted
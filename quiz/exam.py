@@ -0,0 +1,109 @@
+# quiz/exam.py
+
+import random
+import logging
+from decimal import Decimal
+
+from django.core.cache import cache
+
+from .models import ExamBlueprint
+from .sampling import get_subtopic_pools, sample_question_ids
+from .taxonomy import get_taxonomy_snapshot
+
+logger = logging.getLogger(__name__)
+
+BLUEPRINTS_CACHE_KEY = 'quiz:exam_blueprints'
+BLUEPRINTS_CACHE_TIMEOUT = 60 * 60  # 1 hour (also invalidated by quiz/signals.py)
+
+
+def get_active_blueprints():
+    """Returns the active blueprints offered on the quiz setup page, cached as plain dicts."""
+    blueprints = cache.get(BLUEPRINTS_CACHE_KEY)
+    if blueprints is None:
+        blueprints = list(ExamBlueprint.objects.filter(is_active=True)
+                          .order_by('name')
+                          .values('id', 'name', 'description', 'total_questions', 'time_limit_minutes'))
+        cache.set(BLUEPRINTS_CACHE_KEY, blueprints, BLUEPRINTS_CACHE_TIMEOUT)
+    return blueprints
+
+
+def invalidate_blueprints():
+    cache.delete(BLUEPRINTS_CACHE_KEY)
+
+
+def allocate_quotas(percentages, total):
+    """Splits `total` questions across strata by percentage using the largest remainder method."""
+    weight_sum = sum(percentages)
+    if weight_sum <= 0 or total <= 0:
+        return [0] * len(percentages)
+    exact = [Decimal(total) * Decimal(p) / Decimal(weight_sum) for p in percentages]
+    quotas = [int(share) for share in exact]
+    leftover = total - sum(quotas)
+    by_remainder = sorted(range(len(exact)), key=lambda i: exact[i] - quotas[i], reverse=True)
+    for i in by_remainder[:leftover]:
+        quotas[i] += 1
+    return quotas
+
+
+def generate_exam_question_ids(blueprint, max_questions, rng=None):
+    """Generates a shuffled list of at most `min(blueprint.total_questions, max_questions)` question
+    IDs following the blueprint's per-stratum quotas.
+
+    Strata are resolved to live subtopics through the cached taxonomy snapshot and every pool is
+    loaded in one call, so the query count is bounded (strata + at most one pool query) no matter
+    how many strata the blueprint has. Each stratum first takes up to `min_per_subtopic` questions
+    from every subtopic it covers, then fills the rest of its quota from its combined pools. The
+    minimums come out of the stratum's quota: when they don't all fit, they go to a random subset
+    of its subtopics, so the paper never exceeds the total.
+    """
+    rng = rng or random
+    strata = list(blueprint.strata.all())
+    subtopics = get_taxonomy_snapshot()['subtopics']
+
+    # Resolve each stratum to the live subtopics it covers (no queries)
+    stratum_subtopics = []
+    for stratum in strata:
+        if stratum.topic_id:
+            covered = [sid for sid, info in subtopics.items() if info['topic_id'] == stratum.topic_id]
+        else:
+            covered = [sid for sid, info in subtopics.items() if info['category_id'] == stratum.category_id]
+        stratum_subtopics.append(sorted(covered))
+
+    pools = get_subtopic_pools({sid for covered in stratum_subtopics for sid in covered})
+    total = min(blueprint.total_questions, max_questions)
+    quotas = allocate_quotas([stratum.percentage for stratum in strata], total)
+
+    picked = set()
+    question_ids = []
+
+    def take(subtopic_ids, count):
+        # Never past the total, even if strata overlap
+        count = min(count, total - len(question_ids))
+        if count <= 0:
+            return 0
+        chosen = sample_question_ids(subtopic_ids, count, accept=lambda q_id: q_id not in picked, rng=rng, pools=pools)
+        picked.update(chosen)
+        question_ids.extend(chosen)
+        return len(chosen)
+
+    for stratum, covered, quota in zip(strata, stratum_subtopics, quotas):
+        taken = 0
+        # Per-subtopic minimums take precedence within the stratum quota
+        if blueprint.min_per_subtopic:
+            if blueprint.min_per_subtopic * len(covered) > quota:
+                logger.info(f"Blueprint {blueprint.id}: stratum {stratum.id} minimums exceed its quota of {quota}; "
+                            f"applying them to a random subset of its {len(covered)} subtopics.")
+                covered_order = rng.sample(covered, len(covered))
+            else:
+                covered_order = covered
+            for subtopic_id in covered_order:
+                if taken >= quota:
+                    break
+                taken += take([subtopic_id], min(blueprint.min_per_subtopic, quota - taken))
+        if quota > taken:
+            taken += take(covered, quota - taken)
+        if taken < quota:
+            logger.info(f"Blueprint {blueprint.id}: stratum {stratum.id} filled {taken}/{quota} questions (pool exhausted).")
+
+    rng.shuffle(question_ids)
+    return question_ids
@@ -0,0 +1,214 @@
+# quiz/flags.py
+
+import logging
+
+from django.db import transaction
+
+from .models import FlaggedQuestion, Question
+from .redis_store import get_redis, redis_key
+
+logger = logging.getLogger(__name__)
+
+# With REDIS_URL, flagged questions are read and toggled through a per-user Redis set. A toggle
+# updates the set immediately and is journalled as a pending change ({question_id: flagged}) in one
+# Lua script, which refuses to toggle a set that isn't loaded (so it can't recreate an expired set
+# holding only that flag). A write-behind flush persists the journal to FlaggedQuestion in one batch
+# (when a quiz finishes, and periodically via `manage.py flush_flagged_questions`).
+#
+# Recovery: a flush first moves the pending journal to a "processing" key and only deletes it once
+# the database write has committed, so a worker dying mid-flush leaves the batch in place for the
+# next flush to retry. An evicted flag set is rebuilt from FlaggedQuestion plus both journals.
+#
+# Without Redis there is no store shared by every worker except the database (the cache is per-process
+# LocMemCache, invisible to the flush command and lost on restart), so toggles are written straight
+# through to FlaggedQuestion and reads query it.
+FLAG_SET_TIMEOUT = 60 * 60 * 24  # 24 hours (journals never expire; they are deleted by the flush)
+DIRTY_USERS_KEY = 'quiz:flags_dirty'
+
+# Redis can't tell an empty set from a missing one, so loaded sets always contain this member
+LOADED_MARKER = 0
+
+# Atomically merges the pending journal into the processing journal and returns the batch to write
+_TAKE_PENDING_SCRIPT = """
+local pending = redis.call('HGETALL', KEYS[1])
+if #pending > 0 then
+    redis.call('HSET', KEYS[2], unpack(pending))
+    redis.call('DEL', KEYS[1])
+end
+redis.call('SREM', KEYS[3], ARGV[1])
+return redis.call('HGETALL', KEYS[2])
+"""
+
+# Atomically flips one flag in a loaded set and journals the change; returns the new state, or -1 if
+# the set isn't loaded (missing or expired), so the toggle can't recreate it without the other flags
+_TOGGLE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return -1
+end
+local flagged = 1
+if redis.call('SISMEMBER', KEYS[1], ARGV[1]) == 1 then
+    redis.call('SREM', KEYS[1], ARGV[1])
+    flagged = 0
+else
+    redis.call('SADD', KEYS[1], ARGV[1])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+redis.call('HSET', KEYS[2], ARGV[1], flagged)
+redis.call('SADD', KEYS[3], ARGV[3])
+return flagged
+"""
+
+# Loads a rebuilt flag set unless another request loaded it first (and may have toggled it since)
+_LOAD_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return 0
+end
+redis.call('SADD', KEYS[1], unpack(ARGV, 2))
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return 1
+"""
+_scripts = {}
+
+
+def _run_script(client, source, keys, args):
+    """Runs a Lua script on the client, registering it on first use."""
+    if source not in _scripts:
+        _scripts[source] = client.register_script(source)
+    return _scripts[source](keys=keys, args=args, client=client)
+
+
+def _set_key(user_id):
+    return redis_key(f'quiz:flags:{user_id}')
+
+
+def _pending_key(user_id):
+    return redis_key(f'quiz:flags_pending:{user_id}')
+
+
+def _processing_key(user_id):
+    return redis_key(f'quiz:flags_processing:{user_id}')
+
+
+def _decode_journal(raw):
+    """Decodes a Redis journal hash (flat HGETALL reply or dict) into {question_id: flagged}."""
+    if isinstance(raw, list):
+        raw = dict(zip(raw[::2], raw[1::2]))
+    return {int(question_id): value in (b'1', '1') for question_id, value in raw.items()}
+
+
+def _apply_journal(flags, journal):
+    for question_id, flagged in journal.items():
+        if flagged:
+            flags.add(question_id)
+        else:
+            flags.discard(question_id)
+
+
+def _load_flags(client, user_id):
+    """Rebuilds a user's flag set from FlaggedQuestion plus the changes that haven't been flushed yet."""
+    flags = set(FlaggedQuestion.objects.filter(user_id=user_id).values_list('question_id', flat=True))
+    _apply_journal(flags, _decode_journal(client.hgetall(_processing_key(user_id))))
+    _apply_journal(flags, _decode_journal(client.hgetall(_pending_key(user_id))))
+    return flags
+
+
+def get_flagged_ids(user_id):
+    """Returns the set of question IDs the user has flagged (including unflushed toggles)."""
+    client = get_redis()
+    if client is None:
+        return set(FlaggedQuestion.objects.filter(user_id=user_id).values_list('question_id', flat=True))
+
+    members = client.smembers(_set_key(user_id))
+    if members:
+        return {int(member) for member in members} - {LOADED_MARKER}
+
+    flags = _load_flags(client, user_id)
+    if not _run_script(client, _LOAD_SCRIPT, [_set_key(user_id)], [FLAG_SET_TIMEOUT, LOADED_MARKER, *flags]):
+        return {int(member) for member in client.smembers(_set_key(user_id))} - {LOADED_MARKER}
+    return flags
+
+
+def toggle_flag(user_id, question_id):
+    """Flags or unflags a question for the user and returns the new flagged state."""
+    client = get_redis()
+    if client is None:
+        with transaction.atomic():
+            unflagged, _ = FlaggedQuestion.objects.filter(user_id=user_id, question_id=question_id).delete()
+            if unflagged:
+                return False
+            # Skip a question deleted since the quiz started
+            if not Question.objects.filter(pk=question_id).exists():
+                return False
+            FlaggedQuestion.objects.bulk_create([FlaggedQuestion(user_id=user_id, question_id=question_id)], ignore_conflicts=True)
+        return True
+
+    # The membership check and the flip are one script, so concurrent toggles can't both flag a question
+    keys = [_set_key(user_id), _pending_key(user_id), redis_key(DIRTY_USERS_KEY)]
+    while True:
+        flagged = _run_script(client, _TOGGLE_SCRIPT, keys, [question_id, FLAG_SET_TIMEOUT, user_id])
+        if flagged != -1:
+            return bool(flagged)
+        get_flagged_ids(user_id)  # Load the set (it expired or was evicted) and try again
+
+
+def _take_journal(client, user_id):
+    """Moves the pending journal into the processing journal and returns the whole batch."""
+    raw = _run_script(client, _TAKE_PENDING_SCRIPT,
+                      [_pending_key(user_id), _processing_key(user_id), redis_key(DIRTY_USERS_KEY)], [user_id])
+    return _decode_journal(raw)
+
+
+def flush_user_flags(user_id):
+    """Persists the user's journalled flag toggles to FlaggedQuestion. Returns the number of changes
+    (always 0 without Redis, where toggles are written through)."""
+    client = get_redis()
+    if client is None:
+        return 0
+    journal = _take_journal(client, user_id)
+    if not journal:
+        return 0
+
+    try:
+        added = [question_id for question_id, flagged in journal.items() if flagged]
+        removed = [question_id for question_id, flagged in journal.items() if not flagged]
+        with transaction.atomic():
+            if removed:
+                FlaggedQuestion.objects.filter(user_id=user_id, question_id__in=removed).delete()
+            if added:
+                # Skip questions deleted since they were flagged
+                existing = Question.objects.filter(id__in=added).values_list('id', flat=True)
+                FlaggedQuestion.objects.bulk_create(
+                    [FlaggedQuestion(user_id=user_id, question_id=question_id) for question_id in existing],
+                    ignore_conflicts=True,
+                )
+    except Exception as e:
+        # The batch stays in the processing journal; mark the user dirty so the next flush retries
+        logger.error(f"Error flushing flagged questions for user {user_id}: {e}", exc_info=True)
+        client.sadd(redis_key(DIRTY_USERS_KEY), user_id)
+        return 0
+
+    client.delete(_processing_key(user_id))
+    return len(journal)
+
+
+def flush_dirty_flags():
+    """Flushes every user with unsaved toggles, plus batches left behind by an interrupted flush.
+    Returns the number of users flushed."""
+    client = get_redis()
+    if client is None:
+        return 0
+
+    user_ids = {int(user_id) for user_id in client.smembers(redis_key(DIRTY_USERS_KEY))}
+    for key in client.scan_iter(match=_processing_key('*')):
+        user_ids.add(int(key.rsplit(b':', 1)[1]))
+    for user_id in user_ids:
+        flush_user_flags(user_id)
+    return len(user_ids)
+
+
+def reset_user_flags(user_id):
+    """Clears all of the user's flags, including unflushed toggles (after reset_performance)."""
+    client = get_redis()
+    if client is not None:
+        client.delete(_pending_key(user_id), _processing_key(user_id), _set_key(user_id))
+    FlaggedQuestion.objects.filter(user_id=user_id).delete()
@@ -0,0 +1,326 @@
+# quiz/ingest.py
+
+import json
+import os
+import time
+import uuid
+import socket
+import logging
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import F
+
+from .bitsets import record_user_answers
+from .dashboard import bump_dashboard_generation
+from .models import AnswerEvent, AnswerOutbox, Question, UserAnswer
+from .question_stats import apply_question_changes
+from .redis_store import get_redis, redis_key
+from .stats import apply_answer_changes, lock_users, record_daily_activity
+
+logger = logging.getLogger(__name__)
+
+# Write-behind ingestion of finished quizzes. quiz_results appends the attempt's results to a durable
+# queue (a Redis stream with REDIS_URL, otherwise the AnswerOutbox table); `manage.py drain_answer_queue`
+# consumes the queue and upserts UserAnswer rows for many users per statement, appending every answer
+# to the AnswerEvent log and updating the stats rollups in the same transaction. Unless a drain worker
+# is deployed (settings.ANSWER_QUEUE_WORKER), quiz_results writes its own entry inline right after
+# queueing it (never other users' entries, so the page only waits on its own write). An entry whose
+# inline write fails stays queued for the next `manage.py drain_answer_queue` run.
+#
+# Entries are only acknowledged/deleted after their batch commits, so a consumer that dies mid-batch
+# leaves them to be re-delivered (Redis: claimed after ANSWER_CLAIM_IDLE_MS); attempts already in the
+# event log are skipped, so a re-delivered entry isn't logged or counted twice. A batch that fails is
+# retried one entry at a time, and an entry that fails ANSWER_MAX_FAILURES times is dead-lettered (left
+# in the outbox with its error, or moved to ANSWER_DEAD_LETTER_KEY) instead of failing every later
+# drain; `manage.py drain_answer_queue --requeue-dead-letters` retries them once fixed.
+#
+# Until an entry is written, its results are also readable per user (get_pending_results: the user's
+# outbox rows, or a Redis hash next to the stream), so a rebuild of the user's cached answer history
+# from the lagging UserAnswer table still includes them (see build_user_bitsets).
+ANSWER_STREAM_KEY = 'quiz:answer_stream'
+ANSWER_CONSUMER_GROUP = 'answer-writers'
+ANSWER_CLAIM_IDLE_MS = 5 * 60 * 1000  # Re-deliver entries a consumer hasn't acknowledged in 5 minutes
+ANSWER_FAILURES_KEY = 'quiz:answer_stream_failures'  # {entry ID: failed drains}
+ANSWER_DEAD_LETTER_KEY = 'quiz:answer_stream_dead'
+ANSWER_MAX_FAILURES = 5  # Failed drains before an entry is dead-lettered
+ANSWER_PENDING_KEY = 'quiz:answer_pending'  # Per user: {pending ID: results} of the entries not yet written
+ANSWER_PENDING_TTL = 7 * 24 * 60 * 60  # Refreshed on every enqueue; only outlived by a drain outage
+DRAIN_BATCH_SIZE = 200  # Finished quizzes per drain batch
+USER_ANSWER_BATCH_SIZE = 5000  # Rows per upsert statement (SQLite splits further by its parameter limit)
+
+
+def enqueue_results(user_id, results, attempt_id=None):
+    """Queues a finished quiz's (question_id, is_correct, answer_id) results for writing to UserAnswer
+    and the AnswerEvent log. Without a drain worker this entry is written inline straight away."""
+    results = [[q_id, bool(is_correct), answer_id] for q_id, is_correct, answer_id in results]
+    client = get_redis()
+    if client is None:
+        entry = AnswerOutbox.objects.create(user_id=user_id, attempt_id=attempt_id, results=results)
+    else:
+        # Pending IDs sort in queue order
+        pending_id = f'{time.time_ns()}-{uuid.uuid4().hex}'
+        fields = {'user_id': user_id, 'attempt_id': attempt_id or '', 'results': json.dumps(results), 'pending_id': pending_id}
+        with client.pipeline() as pipe:
+            pipe.xadd(redis_key(ANSWER_STREAM_KEY), fields)
+            pipe.hset(_pending_key(user_id), pending_id, fields['results'])
+            pipe.expire(_pending_key(user_id), ANSWER_PENDING_TTL)
+            entry_id = pipe.execute()[0]
+
+    if not settings.ANSWER_QUEUE_WORKER:
+        try:
+            if client is None:
+                _drain_outbox(1, entry_ids=[entry.id])
+            else:
+                _write_stream_entry(client, entry_id, {key.encode(): str(value).encode() for key, value in fields.items()})
+        except Exception as e:
+            # The results stay queued for the next drain
+            logger.error(f"Error writing queued answers for user {user_id} inline: {e}", exc_info=True)
+
+
+def _pending_key(user_id):
+    return redis_key(f'{ANSWER_PENDING_KEY}:{user_id}')
+
+
+def get_pending_results(user_id):
+    """Returns the user's (question_id, is_correct) results that are queued but not written yet, oldest
+    first. Dead-lettered entries are left out, as they won't be written until requeued."""
+    client = get_redis()
+    if client is None:
+        batches = (AnswerOutbox.objects.filter(user_id=user_id, failures__lt=ANSWER_MAX_FAILURES)
+                   .order_by('id').values_list('results', flat=True))
+    else:
+        pending = client.hgetall(_pending_key(user_id))
+        batches = [json.loads(pending[pending_id]) for pending_id in sorted(pending)]
+    return [(result[0], result[1]) for results in batches for result in results]
+
+
+def _entry_rows(user_id, attempt_id, finished_at, results):
+    """Expands one queued quiz into (user_id, question_id, is_correct, answer_id, attempt_id, finished_at) rows."""
+    # Entries queued before answer IDs were recorded hold [question_id, is_correct] pairs
+    return [(user_id, result[0], result[1], result[2] if len(result) > 2 else None, attempt_id, finished_at)
+            for result in results]
+
+
+def upsert_user_answers(rows):
+    """Upserts (user_id, question_id, is_correct, answer_id) rows into UserAnswer, later rows winning, and
+    applies the changes to UserSubtopicStats and QuestionStats. Call inside a transaction. Returns the row count."""
+    # Postgres rejects an upsert that touches the same row twice, so keep the last result per (user, question)
+    latest = {(user_id, q_id): (is_correct, answer_id) for user_id, q_id, is_correct, answer_id in rows}
+    if not latest:
+        return 0
+    # Skip questions/users deleted while their results were queued (they would fail the whole batch)
+    subtopic_ids = dict(Question.objects.filter(id__in={q_id for _, q_id in latest}).values_list('id', 'subtopic_id'))
+    # The users are locked first, like every other writer of their rollups (see quiz/stats.py)
+    user_ids = lock_users({user_id for user_id, _ in latest})
+    latest = {key: value for key, value in latest.items() if key[0] in user_ids and key[1] in subtopic_ids}
+
+    # The rows' previous results, for the subtopic rollup deltas (locked until the batch commits)
+    previous = {
+        (user_id, q_id): is_correct
+        for user_id, q_id, is_correct in UserAnswer.objects.select_for_update()
+        .filter(user_id__in={user_id for user_id, _ in latest}, question_id__in={q_id for _, q_id in latest})
+        .values_list('user_id', 'question_id', 'is_correct')
+    }
+
+    # OPTIMIZATION: One INSERT ... ON CONFLICT DO UPDATE per batch instead of a SELECT of the existing
+    # rows followed by a bulk_create and a CASE-per-row bulk_update.
+    UserAnswer.objects.bulk_create(
+        [UserAnswer(user_id=user_id, question_id=q_id, is_correct=is_correct, answer_id=answer_id)
+         for (user_id, q_id), (is_correct, answer_id) in latest.items()],
+        update_conflicts=True,
+        unique_fields=['user', 'question'],
+        update_fields=['is_correct', 'answer_id', 'timestamp'],
+        batch_size=USER_ANSWER_BATCH_SIZE,
+    )
+    apply_answer_changes([
+        (user_id, subtopic_ids[q_id], previous.get((user_id, q_id)), is_correct)
+        for (user_id, q_id), (is_correct, _) in latest.items()
+    ])
+    apply_question_changes([(q_id, previous.get((user_id, q_id)), is_correct) for (user_id, q_id), (is_correct, _) in latest.items()])
+    return len(latest)
+
+
+def _write_rows(rows):
+    """Writes drained rows to UserAnswer, AnswerEvent and the stats rollups (call inside a transaction).
+    Returns the rows written."""
+    # Skip attempts that are already logged: an entry re-delivered after its batch committed but before
+    # it was acknowledged must not count its answers twice
+    attempt_ids = {str(row[4]) for row in rows if row[4]}
+    if attempt_ids:
+        written = {str(attempt_id) for attempt_id in AnswerEvent.objects.filter(attempt_id__in=attempt_ids)
+                   .values_list('attempt_id', flat=True).distinct()}
+        rows = [row for row in rows if not row[4] or str(row[4]) not in written]
+
+    upsert_user_answers([(user_id, q_id, is_correct, answer_id) for user_id, q_id, is_correct, answer_id, *_ in rows])
+    user_ids = set(User.objects.filter(id__in={row[0] for row in rows}).values_list('id', flat=True))
+    rows = [row for row in rows if row[0] in user_ids]
+    AnswerEvent.objects.bulk_create(
+        [AnswerEvent(user_id=user_id, question_id=q_id, is_correct=is_correct, answer_id=answer_id,
+                     attempt_id=attempt_id, created_at=finished_at)
+         for user_id, q_id, is_correct, answer_id, attempt_id, finished_at in rows],
+        ignore_conflicts=True,
+        batch_size=USER_ANSWER_BATCH_SIZE,
+    )
+    record_daily_activity([(user_id, finished_at, is_correct) for user_id, _, is_correct, _, _, finished_at in rows])
+    return rows
+
+
+def _record_drained(rows):
+    """Re-applies written results to the users' cached bitsets (quiz_results already applied them; this
+    covers a rebuild that read the queue just before they were queued) and invalidates their dashboards."""
+    by_user = {}
+    for user_id, q_id, is_correct, *_ in rows:
+        by_user.setdefault(user_id, []).append((q_id, is_correct))
+    for user_id, results in by_user.items():
+        record_user_answers(user_id, results)
+        bump_dashboard_generation(user_id)
+
+
+def _write_entries(entries, entry_rows):
+    """Writes a batch of queue entries (call inside a transaction). If the batch fails, each entry is
+    retried in its own savepoint so one bad entry can't hold up the rest.
+    Returns (rows written, [(entry, error)] for the entries that failed)."""
+    try:
+        with transaction.atomic():
+            return _write_rows([row for entry in entries for row in entry_rows(entry)]), []
+    except Exception as e:
+        logger.warning(f"Answer queue batch of {len(entries)} failed ({e}); retrying entries one at a time")
+
+    rows = []
+    failed = []
+    for entry in entries:
+        try:
+            with transaction.atomic():
+                rows.extend(_write_rows(entry_rows(entry)))
+        except Exception as e:
+            failed.append((entry, e))
+    return rows, failed
+
+
+def _drain_outbox(batch_size, entry_ids=None):
+    with transaction.atomic():
+        # skip_locked lets several consumers drain the outbox in parallel (ignored by SQLite)
+        entries = AnswerOutbox.objects.select_for_update(skip_locked=True).filter(failures__lt=ANSWER_MAX_FAILURES)
+        if entry_ids is not None:
+            entries = entries.filter(id__in=entry_ids)
+        entries = list(entries.order_by('id')[:batch_size])
+        if not entries:
+            return 0
+        rows, failed = _write_entries(
+            entries, lambda entry: _entry_rows(entry.user_id, entry.attempt_id, entry.created_at, entry.results))
+        for entry, error in failed:
+            logger.error(f"Failed to write queued answers {entry.id} (failure {entry.failures + 1}/{ANSWER_MAX_FAILURES}): {error}")
+            AnswerOutbox.objects.filter(pk=entry.pk).update(failures=F('failures') + 1, last_error=str(error))
+        failed_ids = {entry.id for entry, _ in failed}
+        AnswerOutbox.objects.filter(id__in=[entry.id for entry in entries if entry.id not in failed_ids]).delete()
+    _record_drained(rows)
+    return len(entries) - len(failed)
+
+
+def _consumer_name():
+    return f'{socket.gethostname()}-{os.getpid()}'
+
+
+def _ensure_group(client):
+    import redis
+    try:
+        client.xgroup_create(redis_key(ANSWER_STREAM_KEY), ANSWER_CONSUMER_GROUP, id='0', mkstream=True)
+    except redis.ResponseError as e:
+        if 'BUSYGROUP' not in str(e):
+            raise
+
+
+def _stream_entry_rows(entry):
+    entry_id, fields = entry
+    # Stream entry IDs start with the millisecond timestamp they were added at (when the quiz
+    # finished); requeued dead letters carry their original one
+    added_at = fields.get(b'finished_at', entry_id)
+    finished_at = datetime.fromtimestamp(int(added_at.split(b'-')[0]) / 1000, tz=dt_timezone.utc)
+    attempt_id = fields.get(b'attempt_id', b'').decode() or None
+    return _entry_rows(int(fields[b'user_id']), attempt_id, finished_at, json.loads(fields[b'results']))
+
+
+def _write_stream_entry(client, entry_id, fields):
+    """Writes one stream entry that no consumer has read yet, then deletes it (the inline path)."""
+    with transaction.atomic():
+        rows = _write_rows(_stream_entry_rows((entry_id, fields)))
+    _record_drained(rows)
+    # Never delivered to the consumer group, so there is nothing to acknowledge. A drain that read the
+    # entry in the meantime skips its attempt, which is already in the event log.
+    with client.pipeline() as pipe:
+        pipe.xdel(redis_key(ANSWER_STREAM_KEY), entry_id)
+        pipe.hdel(_pending_key(int(fields[b'user_id'])), fields[b'pending_id'])
+        pipe.execute()
+
+
+def _drain_stream(client, batch_size, block_ms):
+    _ensure_group(client)
+    consumer = _consumer_name()
+    # Recovery: take over entries left unacknowledged by a consumer that died mid-batch
+    _, entries, *_ = client.xautoclaim(redis_key(ANSWER_STREAM_KEY), ANSWER_CONSUMER_GROUP, consumer,
+                                       min_idle_time=ANSWER_CLAIM_IDLE_MS, count=batch_size)
+    if not entries:
+        response = client.xreadgroup(ANSWER_CONSUMER_GROUP, consumer, {redis_key(ANSWER_STREAM_KEY): '>'},
+                                     count=batch_size, block=block_ms)
+        entries = response[0][1] if response else []
+    if not entries:
+        return 0
+
+    with transaction.atomic():
+        rows, failed = _write_entries(entries, _stream_entry_rows)
+    _record_drained(rows)
+
+    retry_ids = set()
+    for (entry_id, fields), error in failed:
+        failures = client.hincrby(redis_key(ANSWER_FAILURES_KEY), entry_id, 1)
+        logger.error(f"Failed to write queued answers {entry_id.decode()} (failure {failures}/{ANSWER_MAX_FAILURES}): {error}")
+        if failures < ANSWER_MAX_FAILURES:
+            retry_ids.add(entry_id)  # Left unacknowledged: re-delivered after ANSWER_CLAIM_IDLE_MS
+        else:
+            dead_letter = {key: value for key, value in fields.items() if key != b'finished_at'}
+            client.xadd(redis_key(ANSWER_DEAD_LETTER_KEY), {**dead_letter, b'finished_at': fields.get(b'finished_at', entry_id), b'error': str(error)})
+
+    done = [(entry_id, fields) for entry_id, fields in entries if entry_id not in retry_ids]
+    if done:
+        entry_ids = [entry_id for entry_id, _ in done]
+        with client.pipeline() as pipe:
+            pipe.xack(redis_key(ANSWER_STREAM_KEY), ANSWER_CONSUMER_GROUP, *entry_ids)
+            pipe.xdel(redis_key(ANSWER_STREAM_KEY), *entry_ids)
+            pipe.hdel(redis_key(ANSWER_FAILURES_KEY), *entry_ids)
+            # Written (or dead-lettered): no longer pending
+            for _, fields in done:
+                if b'pending_id' in fields:
+                    pipe.hdel(_pending_key(int(fields[b'user_id'])), fields[b'pending_id'])
+            pipe.execute()
+    return len(entries) - len(failed)
+
+
+def drain_answer_queue(batch_size=DRAIN_BATCH_SIZE, block_ms=None):
+    """Writes up to `batch_size` queued quizzes to UserAnswer. Returns the number of quizzes written."""
+    client = get_redis()
+    if client is None:
+        return _drain_outbox(batch_size)
+    return _drain_stream(client, batch_size, block_ms)
+
+
+def requeue_dead_letters():
+    """Gives dead-lettered entries another ANSWER_MAX_FAILURES drains. Returns the number requeued."""
+    client = get_redis()
+    if client is None:
+        return AnswerOutbox.objects.filter(failures__gte=ANSWER_MAX_FAILURES).update(failures=0, last_error='')
+
+    requeued = 0
+    for entry_id, fields in client.xrange(redis_key(ANSWER_DEAD_LETTER_KEY)):
+        fields.pop(b'error', None)
+        with client.pipeline() as pipe:
+            pipe.xadd(redis_key(ANSWER_STREAM_KEY), fields)
+            pipe.xdel(redis_key(ANSWER_DEAD_LETTER_KEY), entry_id)
+            if b'pending_id' in fields:
+                pipe.hset(_pending_key(int(fields[b'user_id'])), fields[b'pending_id'], fields[b'results'])
+                pipe.expire(_pending_key(int(fields[b'user_id'])), ANSWER_PENDING_TTL)
+            pipe.execute()
+        requeued += 1
+    return requeued
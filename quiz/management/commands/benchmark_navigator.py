@@ -0,0 +1,123 @@
+# quiz/management/commands/benchmark_navigator.py
+
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.template import Context, Template
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+from django.contrib.auth.models import AnonymousUser
+from django.utils.html import json_script
+
+from quiz.views import QUIZ_API_PAGE_SIZE, encode_navigator_state
+
+# The per-question navigator markup the player rendered before the navigator moved client-side
+LEGACY_NAVIGATOR_TEMPLATE = Template('''
+{% for item in navigator_items %}
+<button type="submit" name="navigate_to" value="{{ item.index }}"
+        class="btn {{ item.class }} m-1 position-relative d-flex justify-content-center align-items-center"
+        style="width: 40px; height: 40px; padding: 0;">
+    {{ item.index }}
+    {% if item.is_flagged %}
+    <span class="position-absolute top-0 start-100 translate-middle p-1 bg-warning border border-light rounded-circle">
+        <span class="visually-hidden">Flagged</span>
+    </span>
+    {% endif %}
+</button>
+{% endfor %}''')
+
+
+def legacy_navigator_items(question_ids, user_answers, flagged_ids, quiz_mode, question_index):
+    navigator_items = []
+    for i, q_id in enumerate(question_ids):
+        idx = i + 1
+        answer_info = user_answers.get(q_id)
+        btn_class = 'btn-outline-secondary'
+        if answer_info:
+            if quiz_mode == 'test':
+                btn_class = 'btn-primary'
+            elif quiz_mode == 'quiz':
+                if answer_info.get('is_submitted'):
+                    btn_class = 'btn-success' if answer_info.get('is_correct') else 'btn-danger'
+                else:
+                    btn_class = 'btn-primary'
+        if idx == question_index:
+            btn_class = btn_class.replace('btn-outline-', 'btn-') + ' active'
+        navigator_items.append({'index': idx, 'class': btn_class, 'is_flagged': q_id in flagged_ids})
+    return navigator_items
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks quiz player navigator rendering (legacy per-question markup vs compact client-side state).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[50, 200, 500], help='Quiz lengths to benchmark.')
+        parser.add_argument('--runs', type=int, default=20, help='Timed runs per path (best is reported).')
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        self.stdout.write(f"{'questions':>10} {'path':<26} {'best ms':>10} {'bytes':>10}")
+        for size in options['sizes']:
+            question_ids = rng.sample(range(1, size * 100), size)
+            # Half-way through a quiz-mode session with a few flags
+            user_answers = {
+                q_id: {'answer_id': q_id, 'is_correct': rng.random() < 0.6, 'is_submitted': True}
+                for q_id in question_ids[:size // 2]
+            }
+            flagged_ids = set(rng.sample(question_ids, size // 10))
+            question_index = size // 2
+
+            def legacy():
+                items = legacy_navigator_items(question_ids, user_answers, flagged_ids, 'quiz', question_index)
+                return LEGACY_NAVIGATOR_TEMPLATE.render(Context({'navigator_items': items}))
+
+            def compact():
+                state = encode_navigator_state(question_ids, user_answers, flagged_ids, 'quiz')
+                return json_script({'navigator': state}, 'player-config')
+
+            def full_page():
+                return self.render_player(question_ids, user_answers, flagged_ids, question_index)
+
+            for label, func in (('legacy navigator markup', legacy),
+                                ('compact navigator state', compact),
+                                ('full player page', full_page)):
+                best_ms, size_bytes = self.measure(func, options['runs'])
+                self.stdout.write(f"{size:>10} {label:<26} {best_ms:>10.3f} {size_bytes:>10}")
+
+    def render_player(self, question_ids, user_answers, flagged_ids, question_index):
+        request = RequestFactory().get('/quiz/play/1/')
+        request.user = AnonymousUser()
+        question = {
+            'id': question_ids[0], 'question_text': 'Benchmark question', 'image_url': None, 'explanation': 'Benchmark explanation',
+            'answers': [{'id': i, 'answer_text': f'Answer {i}', 'is_correct': i == 0} for i in range(5)],
+        }
+        context = {
+            'question': question,
+            'question_index': question_index,
+            'total_questions': len(question_ids),
+            'progress_percentage': 50,
+            'quiz_context': {'mode': 'quiz'},
+            'is_feedback_mode': False,
+            'is_flagged': False,
+            'seconds_remaining': None,
+            'penalty_value': 0,
+            'player_config': {
+                'index': question_index,
+                'total': len(question_ids),
+                'mode': 'quiz',
+                'page_size': QUIZ_API_PAGE_SIZE,
+                'navigator': encode_navigator_state(question_ids, user_answers, flagged_ids, 'quiz'),
+                'urls': {},
+            },
+        }
+        return render_to_string('quiz/quiz_player.html', context, request=request)
+
+    def measure(self, func, runs):
+        best = float('inf')
+        output = ''
+        for _ in range(runs):
+            started = time.perf_counter()
+            output = func()
+            best = min(best, time.perf_counter() - started)
+        return best * 1000, len(output.encode())
@@ -0,0 +1,75 @@
+# quiz/management/commands/benchmark_results.py
+
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+from django.contrib.auth.models import AnonymousUser
+
+from quiz.views import REVIEW_PAGE_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks the results page (full inline review vs score summary plus a lazily loaded review page).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[50, 200, 500], help='Quiz lengths to benchmark.')
+        parser.add_argument('--runs', type=int, default=10, help='Timed runs per path (best is reported).')
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        self.stdout.write(f"{'questions':>10} {'path':<34} {'best ms':>10} {'bytes':>10}")
+        for size in options['sizes']:
+            review_items = [self.review_item(rng, number) for number in range(1, size + 1)]
+            summary = {
+                'final_score': size // 2, 'total_questions': size, 'percentage_score': 50, 'penalty_applied': False,
+                'correct_count': size // 2, 'incorrect_count': size - size // 2, 'incorrect_review_count': size - size // 2,
+            }
+
+            def full_review():
+                # Before: every question's answers and explanation rendered into the results response
+                return self.render('quiz/results.html', summary) + self.render_review(review_items, size)
+
+            def summary_only():
+                return self.render('quiz/results.html', summary)
+
+            def first_review_page():
+                return self.render_review(review_items, REVIEW_PAGE_SIZE)
+
+            for label, func in (('before: results with full review', full_review),
+                                ('after: results summary', summary_only),
+                                ('after: first review fragment', first_review_page)):
+                best_ms, size_bytes = self.measure(func, options['runs'])
+                self.stdout.write(f"{size:>10} {label:<34} {best_ms:>10.3f} {size_bytes:>10}")
+
+    def review_item(self, rng, number):
+        answers = [{'id': number * 10 + i, 'answer_text': f'Answer option {i} ' * 4, 'is_correct': i == 0} for i in range(5)]
+        return {
+            'number': number,
+            'question': {
+                'id': number, 'question_text': 'A patient presents with the following findings. ' * 8, 'image_url': None,
+                'explanation': 'The correct answer is explained in detail here. ' * 30, 'answers': answers,
+            },
+            'user_answer': rng.choice(answers + [None]),
+        }
+
+    def render(self, template_name, context):
+        request = RequestFactory().get('/quiz/results/')
+        request.user = AnonymousUser()
+        return render_to_string(template_name, context, request=request)
+
+    def render_review(self, review_items, count):
+        page_obj = Paginator(review_items, count).get_page(1)
+        return self.render('quiz/review_items.html', {'review_items': list(page_obj), 'page_obj': page_obj, 'review_filter': 'all'})
+
+    def measure(self, func, runs):
+        best = float('inf')
+        output = ''
+        for _ in range(runs):
+            started = time.perf_counter()
+            output = func()
+            best = min(best, time.perf_counter() - started)
+        return best * 1000, len(output.encode())
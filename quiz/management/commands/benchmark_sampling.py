@@ -0,0 +1,81 @@
+# quiz/management/commands/benchmark_sampling.py
+
+import random
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from quiz.models import Category, Topic, Subtopic, Question
+from quiz.sampling import get_subtopic_pools, sample_question_ids
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks quiz question sampling against the legacy load-and-shuffle path. All data is rolled back.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[10_000, 100_000, 1_000_000],
+                            help='Question bank sizes to benchmark.')
+        parser.add_argument('--subtopics', type=int, default=20, help='Number of subtopics to spread questions over.')
+        parser.add_argument('--count', type=int, default=500, help='Questions drawn per simulated quiz.')
+        parser.add_argument('--runs', type=int, default=5, help='Timed runs per path (best is reported).')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'questions':>10} {'path':<22} {'best ms':>10} {'peak KiB':>10}")
+        for size in options['sizes']:
+            # Everything is created inside a transaction that is always rolled back
+            with transaction.atomic():
+                subtopic_ids = self.create_bank(size, options['subtopics'])
+                count = options['count']
+
+                def legacy():
+                    question_ids = list(Question.objects.filter(subtopic_id__in=subtopic_ids, status='LIVE')
+                                        .values_list('id', flat=True).distinct())
+                    random.shuffle(question_ids)
+                    return question_ids[:count]
+
+                def sampled_cold():
+                    # Simulates a question bank version bump: pools are rebuilt from the database
+                    pools = get_subtopic_pools(subtopic_ids, version=f'bench-{time.monotonic_ns()}')
+                    return sample_question_ids(subtopic_ids, count, pools=pools)
+
+                def sampled_warm():
+                    return sample_question_ids(subtopic_ids, count)
+
+                for label, func in (('legacy load+shuffle', legacy),
+                                    ('sampled (cold pools)', sampled_cold),
+                                    ('sampled (cached pools)', sampled_warm)):
+                    best_ms, peak_kib = self.measure(func, options['runs'])
+                    self.stdout.write(f"{size:>10} {label:<22} {best_ms:>10.2f} {peak_kib:>10.0f}")
+
+                transaction.set_rollback(True)
+
+    def create_bank(self, size, subtopic_count):
+        category = Category.objects.create(name=f'Benchmark {time.monotonic_ns()}')
+        topic = Topic.objects.create(category=category, name='Benchmark')
+        subtopics = Subtopic.objects.bulk_create(
+            [Subtopic(topic=topic, name=f'Benchmark {i}') for i in range(subtopic_count)]
+        )
+        batch = []
+        for i in range(size):
+            batch.append(Question(subtopic=subtopics[i % subtopic_count], question_text='Benchmark question',
+                                  explanation='Benchmark explanation', status='LIVE'))
+            if len(batch) == 10_000:
+                Question.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            Question.objects.bulk_create(batch)
+        return [subtopic.id for subtopic in subtopics]
+
+    def measure(self, func, runs):
+        best = float('inf')
+        peak = 0
+        for _ in range(runs):
+            tracemalloc.start()
+            started = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - started)
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+        return best * 1000, peak / 1024
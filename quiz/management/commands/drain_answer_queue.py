@@ -0,0 +1,35 @@
+# quiz/management/commands/drain_answer_queue.py
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from quiz.ingest import DRAIN_BATCH_SIZE, drain_answer_queue, requeue_dead_letters
+
+
+class Command(BaseCommand):
+    help = ('Writes queued quiz results to UserAnswer in batches (run continuously with --follow as a worker and set '
+            'ANSWER_QUEUE_WORKER=True; otherwise finished quizzes drain the queue inline).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DRAIN_BATCH_SIZE, help='Finished quizzes per batch.')
+        parser.add_argument('--follow', action='store_true', help='Keep draining until interrupted.')
+        parser.add_argument('--idle-sleep', type=float, default=1.0, help='Seconds to wait when the queue is empty (--follow).')
+        parser.add_argument('--requeue-dead-letters', action='store_true',
+                            help='First give entries that were dead-lettered after repeated failures another try.')
+
+    def handle(self, *args, **options):
+        if options['requeue_dead_letters']:
+            self.stdout.write(f'Requeued {requeue_dead_letters()} dead-lettered entries.')
+        total = 0
+        while True:
+            # Blocks on the Redis stream for up to idle-sleep seconds when following
+            block_ms = int(options['idle_sleep'] * 1000) if options['follow'] else None
+            written = drain_answer_queue(options['batch_size'], block_ms=block_ms)
+            total += written
+            if written:
+                continue
+            if not options['follow']:
+                break
+            time.sleep(options['idle_sleep'])
+        self.stdout.write(self.style.SUCCESS(f'Wrote {total} queued quiz results to UserAnswer.'))
@@ -0,0 +1,13 @@
+# quiz/management/commands/flush_flagged_questions.py
+
+from django.core.management.base import BaseCommand
+
+from quiz.flags import flush_dirty_flags
+
+
+class Command(BaseCommand):
+    help = 'Persists flag toggles journalled in Redis to FlaggedQuestion (run periodically, e.g. every minute from cron; a no-op without REDIS_URL).'
+
+    def handle(self, *args, **options):
+        flushed = flush_dirty_flags()
+        self.stdout.write(self.style.SUCCESS(f'Flushed flagged questions for {flushed} users.'))
@@ -9,6 +9,10 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument('csv_file', type=str, help='The path to the CSV file to import.')
 
+    # OPTIMIZATION: One outer transaction, so the question bank caches are invalidated once for the
+    # whole import (quiz/signals.py) rather than once per row. Each row still runs in its own
+    # savepoint, so a bad row is rolled back and skipped on its own.
+    @transaction.atomic
     def handle(self, *args, **options):
         csv_file_path = options['csv_file']
         
@@ -35,7 +39,7 @@ class Command(BaseCommand):
                     # +1 for header, +1 for 1-based indexing
                     line_num = i + 2 
                     try:
-                        # CRITICAL: Use a transaction to ensure atomicity.
+                        # CRITICAL: Use a savepoint to ensure atomicity.
                         # Either the question and all answers are imported, or none are.
                         with transaction.atomic():
                             self.process_row(row, line_num)
@@ -0,0 +1,13 @@
+# quiz/management/commands/prune_quiz_attempts.py
+
+from django.core.management.base import BaseCommand
+
+from quiz.attempts import prune_attempts
+
+
+class Command(BaseCommand):
+    help = 'Deletes abandoned database-backed quiz attempts (Redis-backed attempts expire automatically).'
+
+    def handle(self, *args, **options):
+        deleted = prune_attempts()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired quiz attempt records.'))
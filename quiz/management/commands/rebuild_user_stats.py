@@ -0,0 +1,24 @@
+# quiz/management/commands/rebuild_user_stats.py
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from quiz.dashboard import bump_dashboard_generation
+from quiz.stats import rebuild_user_stats
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the per-user dashboard rollups (UserSubtopicStats, UserDailyStats) from the answer tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help='Only rebuild this user ID (repeatable). Defaults to every user.')
+
+    def handle(self, *args, **options):
+        user_ids = options['user_ids'] or list(User.objects.order_by('id').values_list('id', flat=True))
+        rebuilt = 0
+        for user_id in user_ids:
+            rebuild_user_stats(user_id)
+            bump_dashboard_generation(user_id)
+            rebuilt += 1
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt stats for {rebuilt} users.'))
@@ -0,0 +1,16 @@
+# quiz/management/commands/recompute_question_stats.py
+
+from django.core.management.base import BaseCommand
+
+from quiz.question_stats import QUESTION_STATS_BATCH_SIZE, recompute_question_stats
+
+
+class Command(BaseCommand):
+    help = 'Recomputes QuestionStats (attempts, p-value, point-biserial discrimination) from UserAnswer (run nightly).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=QUESTION_STATS_BATCH_SIZE, help='Questions per transaction.')
+
+    def handle(self, *args, **options):
+        questions = recompute_question_stats(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Recomputed stats for {questions} questions.'))
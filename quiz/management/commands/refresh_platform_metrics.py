@@ -0,0 +1,20 @@
+# quiz/management/commands/refresh_platform_metrics.py
+
+from django.core.management.base import BaseCommand
+
+from quiz.platform_metrics import METRICS_LOOKBACK_DAYS, backfill_platform_metrics, refresh_recent_platform_metrics
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the admin dashboard DailyPlatformMetrics for today and yesterday (run every few minutes).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=METRICS_LOOKBACK_DAYS, help='Days to recompute, including today.')
+        parser.add_argument('--backfill', action='store_true', help='Recompute every day since the first signup.')
+
+    def handle(self, *args, **options):
+        if options['backfill']:
+            rows = backfill_platform_metrics()
+        else:
+            rows = refresh_recent_platform_metrics(options['days'])
+        self.stdout.write(self.style.SUCCESS(f'Refreshed platform metrics for {rows} days.'))
@@ -0,0 +1,20 @@
+# quiz/management/commands/rescore_answers.py
+
+from django.core.management.base import BaseCommand
+
+from quiz.rescoring import RESCORE_CHUNK_SIZE, queue_rescore, rescore_pending
+
+
+class Command(BaseCommand):
+    help = 'Recomputes UserAnswer correctness for questions whose answer key changed (run periodically, resumable).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=RESCORE_CHUNK_SIZE, help='UserAnswer rows per transaction.')
+        parser.add_argument('--question', type=int, action='append', default=[],
+                            help='Also queue this question ID (repeatable), e.g. after a raw SQL fix.')
+
+    def handle(self, *args, **options):
+        for question_id in options['question']:
+            queue_rescore(question_id)
+        questions, changed = rescore_pending(options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rescored {questions} questions; {changed} answers changed correctness.'))
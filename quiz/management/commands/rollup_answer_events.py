@@ -0,0 +1,19 @@
+# quiz/management/commands/rollup_answer_events.py
+
+from django.core.management.base import BaseCommand
+
+from quiz.events import ANSWER_EVENT_RETENTION_DAYS, ROLLUP_LOOKBACK_DAYS, prune_answer_events, rollup_recent_days
+
+
+class Command(BaseCommand):
+    help = 'Rolls recent AnswerEvent days up into UserDailyStats and deletes events past the retention window (run daily).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=ROLLUP_LOOKBACK_DAYS, help='Complete days to (re)roll up.')
+        parser.add_argument('--retention-days', type=int, default=ANSWER_EVENT_RETENTION_DAYS,
+                            help='Days of raw events to keep.')
+
+    def handle(self, *args, **options):
+        rows = rollup_recent_days(options['days'])
+        deleted = prune_answer_events(options['retention_days'])
+        self.stdout.write(self.style.SUCCESS(f'Rolled up {rows} user-days; pruned {deleted} expired answer events.'))
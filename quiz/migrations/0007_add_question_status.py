@@ -7,7 +7,7 @@ class Migration(migrations.Migration):
 
     # Ensure this migration runs after the migration that introduced Historical models (0006)
     dependencies = [
-        ('quiz', '0006_historicalanswer_historicalcategory_historicalcontactinquiry_historicalquestion_historicalquestionreport_historicalsubtopic_historicaltopic'),
+        ('quiz', '0006_historicalanswer_historicalcategory_and_more'),
     ]
 
     operations = [
@@ -0,0 +1,78 @@
+# Generated by Django 5.2.4 on 2026-10-17 01:51
+
+import django.core.validators
+import django.db.models.deletion
+import quiz.models
+import simple_history.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0008_set_existing_questions_live'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExamBlueprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('description', models.TextField(blank=True)),
+                ('total_questions', models.PositiveIntegerField(default=100, help_text='Target paper length (capped at the quiz maximum).')),
+                ('min_per_subtopic', models.PositiveIntegerField(default=0, help_text='Minimum questions drawn from every live subtopic covered by a stratum.')),
+                ('time_limit_minutes', models.PositiveIntegerField(blank=True, help_text='Optional exam timer.', null=True)),
+                ('is_active', models.BooleanField(default=True, help_text='Only active blueprints are offered to users.')),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='historicalquestion',
+            name='question_image',
+            field=models.TextField(blank=True, help_text='Max file size: 2MB. Allowed formats: JPG, PNG, GIF, WebP', max_length=100, null=True, validators=[django.core.validators.FileExtensionValidator(allowed_extensions=['jpg', 'jpeg', 'png', 'gif', 'webp']), quiz.models.validate_image_file]),
+        ),
+        migrations.AlterField(
+            model_name='question',
+            name='question_image',
+            field=models.ImageField(blank=True, help_text='Max file size: 2MB. Allowed formats: JPG, PNG, GIF, WebP', null=True, upload_to='question_images/', validators=[django.core.validators.FileExtensionValidator(allowed_extensions=['jpg', 'jpeg', 'png', 'gif', 'webp']), quiz.models.validate_image_file]),
+        ),
+        migrations.CreateModel(
+            name='BlueprintStratum',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('percentage', models.DecimalField(decimal_places=2, help_text='Share of the paper, e.g. 30 for 30%.', max_digits=5)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='quiz.category')),
+                ('topic', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='quiz.topic')),
+                ('blueprint', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='strata', to='quiz.examblueprint')),
+            ],
+            options={
+                'verbose_name_plural': 'Blueprint strata',
+            },
+        ),
+        migrations.CreateModel(
+            name='HistoricalExamBlueprint',
+            fields=[
+                ('id', models.BigIntegerField(auto_created=True, blank=True, db_index=True, verbose_name='ID')),
+                ('name', models.CharField(db_index=True, max_length=100)),
+                ('description', models.TextField(blank=True)),
+                ('total_questions', models.PositiveIntegerField(default=100, help_text='Target paper length (capped at the quiz maximum).')),
+                ('min_per_subtopic', models.PositiveIntegerField(default=0, help_text='Minimum questions drawn from every live subtopic covered by a stratum.')),
+                ('time_limit_minutes', models.PositiveIntegerField(blank=True, help_text='Optional exam timer.', null=True)),
+                ('is_active', models.BooleanField(default=True, help_text='Only active blueprints are offered to users.')),
+                ('history_id', models.AutoField(primary_key=True, serialize=False)),
+                ('history_date', models.DateTimeField(db_index=True)),
+                ('history_change_reason', models.CharField(max_length=100, null=True)),
+                ('history_type', models.CharField(choices=[('+', 'Created'), ('~', 'Changed'), ('-', 'Deleted')], max_length=1)),
+                ('history_user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'historical exam blueprint',
+                'verbose_name_plural': 'historical exam blueprints',
+                'ordering': ('-history_date', '-history_id'),
+                'get_latest_by': ('history_date', 'history_id'),
+            },
+            bases=(simple_history.models.HistoricalChanges, models.Model),
+        ),
+    ]
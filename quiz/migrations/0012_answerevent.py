@@ -0,0 +1,57 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:15
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0011_answeroutbox'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='answeroutbox',
+            name='attempt_id',
+            field=models.UUIDField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='answeroutbox',
+            name='results',
+            field=models.JSONField(help_text='[question_id, is_correct, answer_id] triples from one finished quiz.'),
+        ),
+        migrations.CreateModel(
+            name='AnswerEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('question_id', models.PositiveIntegerField()),
+                ('answer_id', models.PositiveIntegerField(blank=True, null=True)),
+                ('is_correct', models.BooleanField()),
+                ('attempt_id', models.UUIDField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['created_at'], name='quiz_answerevent_created_idx'), models.Index(fields=['user', 'created_at'], name='quiz_answerevent_user_idx')],
+                'constraints': [models.UniqueConstraint(fields=('attempt_id', 'question_id'), name='quiz_answerevent_attempt_question_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='UserDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('answered', models.PositiveIntegerField(default=0)),
+                ('correct', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'User daily stats',
+                'unique_together': {('user', 'date')},
+            },
+        ),
+    ]
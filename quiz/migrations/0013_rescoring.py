@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0012_answerevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionRescore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('question_id', models.PositiveIntegerField(unique=True)),
+                ('last_user_answer_id', models.BigIntegerField(default=0, help_text='Resume point: UserAnswer rows up to this ID are rescored.')),
+                ('queued_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='useranswer',
+            name='answer_id',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0013_rescoring'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSubtopicStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('answered', models.IntegerField(default=0)),
+                ('correct', models.IntegerField(default=0)),
+                ('subtopic', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='quiz.subtopic')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'User subtopic stats',
+                'unique_together': {('user', 'subtopic')},
+            },
+        ),
+    ]
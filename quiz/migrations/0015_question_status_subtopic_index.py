@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0014_usersubtopicstats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['status', 'subtopic'], name='quiz_question_status_sub_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0015_question_status_subtopic_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyPlatformMetrics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('new_users', models.PositiveIntegerField(default=0)),
+                ('active_users', models.PositiveIntegerField(default=0, help_text='Users who answered at least one question.')),
+                ('answers', models.PositiveIntegerField(default=0)),
+                ('correct_answers', models.PositiveIntegerField(default=0)),
+                ('total_users', models.PositiveIntegerField(blank=True, null=True)),
+                ('monthly_subscriptions', models.PositiveIntegerField(blank=True, null=True)),
+                ('annual_subscriptions', models.PositiveIntegerField(blank=True, null=True)),
+                ('total_questions', models.PositiveIntegerField(blank=True, null=True)),
+                ('live_questions', models.PositiveIntegerField(blank=True, null=True)),
+                ('draft_questions', models.PositiveIntegerField(blank=True, null=True)),
+                ('open_reports', models.PositiveIntegerField(blank=True, null=True)),
+                ('answered_total', models.PositiveIntegerField(blank=True, null=True)),
+                ('correct_total', models.PositiveIntegerField(blank=True, null=True)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Daily platform metrics',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='userdailystats',
+            index=models.Index(fields=['date'], name='quiz_userdailystats_date_idx'),
+        ),
+    ]
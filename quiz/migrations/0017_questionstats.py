@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0016_dailyplatformmetrics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionStats',
+            fields=[
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='quiz.question')),
+                ('attempts', models.IntegerField(default=0)),
+                ('correct', models.IntegerField(default=0)),
+                ('p_value', models.FloatField(blank=True, help_text='Proportion of attempts answered correctly (difficulty).', null=True)),
+                ('discrimination', models.FloatField(blank=True, help_text="Point-biserial correlation between answering correctly and the user's overall score.", null=True)),
+                ('computed_at', models.DateTimeField(blank=True, help_text='When discrimination was last recomputed.', null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Question stats',
+                'indexes': [models.Index(fields=['p_value'], name='quiz_questionstats_p_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0017_questionstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='answeroutbox',
+            name='failures',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='answeroutbox',
+            name='last_error',
+            field=models.TextField(blank=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-17 03:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0019_cacheversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailyplatformmetrics',
+            name='logged_in_users',
+            field=models.PositiveIntegerField(blank=True, help_text='Users who logged in on the day.', null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-17 03:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0021_answerratebucket'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='cacheversion',
+            name='version',
+            field=models.BigIntegerField(db_index=True, default=0),
+        ),
+    ]
@@ -5,7 +5,9 @@ from simple_history.models import HistoricalRecords
 from django.utils.text import Truncator
 from django.core.exceptions import ValidationError
 from django.core.validators import FileExtensionValidator
+from django.utils import timezone
 import os
+import uuid
 
 def validate_image_file(file):
     """Validate uploaded image files for security"""
@@ -82,6 +84,12 @@ class Question(models.Model):
     )
     history = HistoricalRecords()
     
+    class Meta:
+        indexes = [
+            # Live questions per subtopic (question pools, taxonomy counts): status equality, then subtopic
+            models.Index(fields=['status', 'subtopic'], name='quiz_question_status_sub_idx'),
+        ]
+    
     def __str__(self):
         return Truncator(self.question_text).chars(50)
     
@@ -108,6 +116,9 @@ class Answer(models.Model):
 class UserAnswer(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
+    # The chosen Answer's ID (not a FK, so answer edits and deletes never touch this table); used to
+    # rescore is_correct when the answer key changes. Null for blank submissions and older rows.
+    answer_id = models.PositiveIntegerField(null=True, blank=True)
     is_correct = models.BooleanField()
     timestamp = models.DateTimeField(auto_now=True)
     
@@ -170,4 +181,229 @@ class FlaggedQuestion(models.Model):
         unique_together = ('user', 'question')
     
     def __str__(self):
-        return f"{self.user.username} flagged Q:{self.question.id}"
\ No newline at end of file
+        return f"{self.user.username} flagged Q:{self.question.id}"
+
+# Model for exam-style mock papers with a fixed mix of categories/topics
+class ExamBlueprint(models.Model):
+    name = models.CharField(max_length=100, unique=True)
+    description = models.TextField(blank=True)
+    total_questions = models.PositiveIntegerField(default=100, help_text="Target paper length (capped at the quiz maximum).")
+    min_per_subtopic = models.PositiveIntegerField(
+        default=0,
+        help_text="Minimum questions drawn from every live subtopic covered by a stratum."
+    )
+    time_limit_minutes = models.PositiveIntegerField(null=True, blank=True, help_text="Optional exam timer.")
+    is_active = models.BooleanField(default=True, help_text="Only active blueprints are offered to users.")
+    history = HistoricalRecords()
+
+    def __str__(self):
+        return self.name
+
+# Model for one stratum (share of the paper) of an exam blueprint
+class BlueprintStratum(models.Model):
+    blueprint = models.ForeignKey(ExamBlueprint, on_delete=models.CASCADE, related_name='strata')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, null=True, blank=True)
+    topic = models.ForeignKey(Topic, on_delete=models.CASCADE, null=True, blank=True)
+    percentage = models.DecimalField(max_digits=5, decimal_places=2, help_text="Share of the paper, e.g. 30 for 30%.")
+
+    class Meta:
+        verbose_name_plural = "Blueprint strata"
+
+    def __str__(self):
+        return f"{self.percentage}% {self.topic or self.category}"
+
+    def clean(self):
+        """A stratum covers exactly one category or one topic"""
+        super().clean()
+        if bool(self.category_id) == bool(self.topic_id):
+            raise ValidationError("Select either a category or a topic for each stratum.")
+        if self.percentage is not None and self.percentage <= 0:
+            raise ValidationError({'percentage': "Percentage must be greater than zero."})
+
+# Server-side quiz attempt (DB fallback for quiz/attempts.py when Redis is not configured)
+class QuizAttempt(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='quiz_attempts')
+    meta = models.JSONField(default=dict, help_text="Quiz settings: question IDs, mode, timer and penalty.")
+    current_index = models.PositiveIntegerField(default=1)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Quiz attempt {self.id} by {self.user.username}"
+
+# One answer within a quiz attempt (one row per question, written individually)
+class QuizAttemptAnswer(models.Model):
+    attempt = models.ForeignKey(QuizAttempt, on_delete=models.CASCADE, related_name='answers')
+    question_id = models.PositiveIntegerField()
+    answer_id = models.PositiveIntegerField(null=True, blank=True)
+    is_correct = models.BooleanField(default=False)
+    is_submitted = models.BooleanField(default=False)
+
+    class Meta:
+        unique_together = ('attempt', 'question_id')
+
+    def __str__(self):
+        return f"Attempt {self.attempt_id} answer to Q:{self.question_id}"
+
+# Finished-quiz results waiting to be written to UserAnswer (DB fallback for quiz/ingest.py when Redis is not configured)
+class AnswerOutbox(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    attempt_id = models.UUIDField(null=True, blank=True)
+    results = models.JSONField(help_text="[question_id, is_correct, answer_id] triples from one finished quiz.")
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Entries that failed ANSWER_MAX_FAILURES drains are dead-lettered: skipped by the drain, kept for inspection
+    failures = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        verbose_name_plural = "Answer outbox"
+
+    def __str__(self):
+        return f"{len(self.results)} queued answers for {self.user_id}"
+
+# Append-only log of every answer submitted (UserAnswer only keeps the latest result per question).
+# Kept compact for high volume: plain integer question/answer IDs (events outlive edited or deleted
+# questions and inserts skip FK checks), indexed by time; old days are rolled up into UserDailyStats.
+class AnswerEvent(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+', db_index=False)
+    question_id = models.PositiveIntegerField()
+    answer_id = models.PositiveIntegerField(null=True, blank=True)
+    is_correct = models.BooleanField()
+    attempt_id = models.UUIDField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], name='quiz_answerevent_created_idx'),
+            models.Index(fields=['user', 'created_at'], name='quiz_answerevent_user_idx'),
+        ]
+        constraints = [
+            # Makes re-delivered queue entries idempotent: one event per question per attempt
+            models.UniqueConstraint(fields=['attempt_id', 'question_id'], name='quiz_answerevent_attempt_question_uniq'),
+        ]
+
+    def __str__(self):
+        return f"User {self.user_id} answered Q:{self.question_id} at {self.created_at:%Y-%m-%d %H:%M}"
+
+# Per-user daily answer counts over AnswerEvent, maintained incrementally by the answer queue and
+# re-rolled up from the events daily (kept after the raw events expire)
+class UserDailyStats(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    date = models.DateField()
+    answered = models.PositiveIntegerField(default=0)
+    correct = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('user', 'date')
+        indexes = [
+            # Platform-wide totals per day (see quiz/platform_metrics.py)
+            models.Index(fields=['date'], name='quiz_userdailystats_date_idx'),
+        ]
+        verbose_name_plural = "User daily stats"
+
+    def __str__(self):
+        return f"{self.user_id} on {self.date}: {self.correct}/{self.answered}"
+
+# A question whose answer key changed and whose UserAnswer rows still need rescoring (see quiz/rescoring.py)
+class QuestionRescore(models.Model):
+    question_id = models.PositiveIntegerField(unique=True)
+    last_user_answer_id = models.BigIntegerField(default=0, help_text="Resume point: UserAnswer rows up to this ID are rescored.")
+    queued_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Rescore Q:{self.question_id} from UserAnswer {self.last_user_answer_id}"
+
+# Per-user per-subtopic totals over UserAnswer (latest answer per question), maintained incrementally
+# by the answer queue and rescoring so the dashboard reads one small row per subtopic (see quiz/stats.py)
+class UserSubtopicStats(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    subtopic = models.ForeignKey(Subtopic, on_delete=models.CASCADE, related_name='+')
+    # Signed: rescoring applies -1 deltas, which must not trip a CHECK on a row that was never backfilled
+    answered = models.IntegerField(default=0)
+    correct = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('user', 'subtopic')
+        verbose_name_plural = "User subtopic stats"
+
+    def __str__(self):
+        return f"{self.user_id} in subtopic {self.subtopic_id}: {self.correct}/{self.answered}"
+
+# Platform-wide metrics per local day for the custom admin dashboard, materialised by
+# `manage.py refresh_platform_metrics` (see quiz/platform_metrics.py). The activity columns are exact
+# for every day; the totals are a snapshot taken when the row was last refreshed, so they are only
+# filled in for days the job ran on (not for backfilled days).
+class DailyPlatformMetrics(models.Model):
+    date = models.DateField(unique=True)
+    new_users = models.PositiveIntegerField(default=0)
+    active_users = models.PositiveIntegerField(default=0, help_text="Users who answered at least one question.")
+    answers = models.PositiveIntegerField(default=0)
+    correct_answers = models.PositiveIntegerField(default=0)
+
+    total_users = models.PositiveIntegerField(null=True, blank=True)
+    monthly_subscriptions = models.PositiveIntegerField(null=True, blank=True)
+    annual_subscriptions = models.PositiveIntegerField(null=True, blank=True)
+    total_questions = models.PositiveIntegerField(null=True, blank=True)
+    live_questions = models.PositiveIntegerField(null=True, blank=True)
+    draft_questions = models.PositiveIntegerField(null=True, blank=True)
+    open_reports = models.PositiveIntegerField(null=True, blank=True)
+    # last_login only holds each user's latest login, so logins per day can only be snapshotted
+    logged_in_users = models.PositiveIntegerField(null=True, blank=True, help_text="Users who logged in on the day.")
+    # Latest answer per user and question, across all users (the platform average score)
+    answered_total = models.PositiveIntegerField(null=True, blank=True)
+    correct_total = models.PositiveIntegerField(null=True, blank=True)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "Daily platform metrics"
+
+    def __str__(self):
+        return f"Platform metrics for {self.date}"
+
+# Per-question item statistics over UserAnswer (each user's latest answer). attempts, correct and
+# p_value are maintained incrementally by the answer queue and rescoring; discrimination depends on
+# every taker's overall score, so it is only recomputed by `manage.py recompute_question_stats`
+# (see quiz/question_stats.py), which also repairs the counts.
+class QuestionStats(models.Model):
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    # Signed for the same reason as UserSubtopicStats
+    attempts = models.IntegerField(default=0)
+    correct = models.IntegerField(default=0)
+    p_value = models.FloatField(null=True, blank=True, help_text="Proportion of attempts answered correctly (difficulty).")
+    discrimination = models.FloatField(null=True, blank=True,
+                                       help_text="Point-biserial correlation between answering correctly and the user's overall score.")
+    computed_at = models.DateTimeField(null=True, blank=True, help_text="When discrimination was last recomputed.")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['p_value'], name='quiz_questionstats_p_idx'),
+        ]
+        verbose_name_plural = "Question stats"
+
+    def __str__(self):
+        return f"Q:{self.question_id} p={self.p_value} r={self.discrimination}"
+
+# Version counters embedded in cache keys (see quiz/taxonomy.py and quiz/versions.py). They live in
+# the database rather than the cache: without Redis every worker has its own LocMemCache, so a counter
+# bumped in one process (the admin, `import_questions`, a shell) would never reach the others.
+class CacheVersion(models.Model):
+    name = models.CharField(max_length=50, primary_key=True)
+    # Indexed for the "stamped since" query each process runs when the record version sequence moves
+    version = models.BigIntegerField(default=0, db_index=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.version}"
+
+# Per-user answer counts per minute for the security dashboard (DB fallback for quiz/answer_rate.py
+# when Redis is not configured). Buckets older than the longest window are pruned as answers arrive.
+class AnswerRateBucket(models.Model):
+    minute = models.IntegerField(help_text="Minutes since the epoch.")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    answers = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('minute', 'user')
+
+    def __str__(self):
+        return f"{self.user_id} at minute {self.minute}: {self.answers}"
@@ -0,0 +1,117 @@
+# quiz/question_stats.py
+
+import logging
+import math
+
+from django.db import connection, transaction
+from django.db.models import Case, F, FloatField, When
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from .models import Question, QuestionStats, UserAnswer, UserSubtopicStats
+from .stats import _add, _increment
+
+logger = logging.getLogger(__name__)
+
+# Item statistics per question (QuestionStats), read by the admin instead of aggregating UserAnswer:
+#   p_value        - correct / attempts (classical item difficulty; low = hard)
+#   discrimination - point-biserial correlation between answering the question correctly and the
+#                    taker's overall score (correct / answered over all their questions); low or
+#                    negative values flag questions that strong students get wrong
+# The counts are updated incrementally with every UserAnswer write. `manage.py recompute_question_stats`
+# recomputes everything set-wise: one grouped query per QUESTION_STATS_BATCH_SIZE questions joins the
+# answer matrix to the users' scores and returns the sums the correlation needs, so no per-answer
+# rows are ever loaded into Python.
+QUESTION_STATS_BATCH_SIZE = 1000
+
+_MOMENTS_SQL = """
+WITH scores AS (
+    SELECT user_id, 1.0 * SUM(correct) / SUM(answered) AS score
+    FROM {user_stats}
+    GROUP BY user_id
+    HAVING SUM(answered) > 0
+)
+SELECT a.question_id,
+       COUNT(*),
+       SUM(CASE WHEN a.is_correct THEN 1 ELSE 0 END),
+       SUM(s.score),
+       SUM(s.score * s.score),
+       SUM(CASE WHEN a.is_correct THEN s.score ELSE 0 END)
+FROM {answers} a
+JOIN scores s ON s.user_id = a.user_id
+WHERE a.question_id >= %s AND a.question_id <= %s
+GROUP BY a.question_id
+"""
+
+
+def apply_question_changes(changes):
+    """Updates QuestionStats for UserAnswer writes given as (question_id, previous, is_correct) tuples,
+    where previous is None for a new row and is_correct is None for a deleted one. Call inside the
+    write's transaction."""
+    counts = {}
+    for question_id, previous, is_correct in changes:
+        if previous is None:
+            _add(counts, (question_id,), 1, int(is_correct))
+        elif is_correct is None:
+            _add(counts, (question_id,), -1, -int(previous))
+        elif previous != is_correct:
+            _add(counts, (question_id,), 0, 1 if is_correct else -1)
+    _increment(QuestionStats, ('question',), counts, count_fields=('attempts', 'correct'))
+    if counts:
+        QuestionStats.objects.filter(question_id__in=[key[0] for key in counts]).update(
+            p_value=Case(When(attempts__gt=0, then=Cast('correct', FloatField()) / F('attempts')), default=None))
+
+
+def _point_biserial(n, n_correct, score_sum, score_squares, correct_score_sum):
+    """Point-biserial correlation from the takers' score sums, or None when it is undefined."""
+    if n < 2 or n_correct in (0, n):
+        return None
+    variance = score_squares / n - (score_sum / n) ** 2
+    if variance <= 1e-12:
+        return None
+    mean_correct = correct_score_sum / n_correct
+    mean_incorrect = (score_sum - correct_score_sum) / (n - n_correct)
+    p = n_correct / n
+    return (mean_correct - mean_incorrect) / math.sqrt(variance) * math.sqrt(p * (1 - p))
+
+
+def _recompute_batch(question_ids):
+    """Recomputes the stats of a sorted batch of questions in one transaction."""
+    sql = _MOMENTS_SQL.format(user_stats=connection.ops.quote_name(UserSubtopicStats._meta.db_table),
+                              answers=connection.ops.quote_name(UserAnswer._meta.db_table))
+    now = timezone.now()
+    with transaction.atomic():
+        # Lock the existing rows first: a drain incrementing them waits and then adds on top of the
+        # recomputed counts, instead of the recompute overwriting its increment
+        list(QuestionStats.objects.select_for_update().filter(question_id__in=question_ids).values_list('pk'))
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [question_ids[0], question_ids[-1]])
+            moments = {row[0]: row[1:] for row in cursor.fetchall()}
+
+        stats = []
+        for question_id in question_ids:
+            n, n_correct, *sums = moments.get(question_id, (0, 0, 0, 0, 0))
+            stats.append(QuestionStats(
+                question_id=question_id,
+                attempts=n,
+                correct=n_correct,
+                p_value=n_correct / n if n else None,
+                discrimination=_point_biserial(n, n_correct, *(float(value or 0) for value in sums)),
+                computed_at=now,
+            ))
+        QuestionStats.objects.bulk_create(
+            stats,
+            update_conflicts=True,
+            unique_fields=['question'],
+            update_fields=['attempts', 'correct', 'p_value', 'discrimination', 'computed_at'],
+            batch_size=QUESTION_STATS_BATCH_SIZE,
+        )
+
+
+def recompute_question_stats(batch_size=QUESTION_STATS_BATCH_SIZE):
+    """Recomputes every question's stats from UserAnswer. Returns the number of questions processed."""
+    question_ids = list(Question.objects.order_by('id').values_list('id', flat=True))
+    for start in range(0, len(question_ids), batch_size):
+        _recompute_batch(question_ids[start:start + batch_size])
+    logger.info(f"Recomputed stats for {len(question_ids)} questions")
+    return len(question_ids)
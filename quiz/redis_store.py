@@ -0,0 +1,24 @@
+# quiz/redis_store.py
+
+from django.conf import settings
+
+# Raw Redis access for structures the Django cache API can't express atomically (hashes, sets).
+# Callers fall back to the Django cache or the database when REDIS_URL is not configured.
+_redis_client = None
+
+
+def get_redis():
+    """Returns a shared Redis client, or None when Redis is not configured."""
+    global _redis_client
+    if not getattr(settings, 'REDIS_URL', None):
+        return None
+    if _redis_client is None:
+        import redis
+        _redis_client = redis.Redis.from_url(settings.REDIS_URL)
+    return _redis_client
+
+
+def redis_key(key):
+    """Namespaces a raw Redis key with the cache KEY_PREFIX, like the keys the Django cache writes."""
+    prefix = settings.CACHES['default'].get('KEY_PREFIX', '')
+    return f'{prefix}:{key}' if prefix else key
@@ -0,0 +1,121 @@
+# quiz/rescoring.py
+
+import logging
+
+from django.db import transaction
+
+from .bitsets import record_user_answers
+from .dashboard import bump_dashboard_generation
+from .models import Answer, Question, QuestionRescore, UserAnswer
+from .question_stats import apply_question_changes
+from .stats import apply_answer_changes, lock_users
+
+logger = logging.getLogger(__name__)
+
+# Rescoring after an answer key correction. The history signal queues a QuestionRescore row whenever
+# an Answer's is_correct flips or an answer is deleted (import_questions replaces a question's answers),
+# and `manage.py rescore_answers` recomputes UserAnswer.is_correct from each row's chosen answer_id.
+# Rows are processed in ID order in small chunks, each its own short transaction touching only that
+# chunk's rows (and the UserSubtopicStats/QuestionStats rollups), and the job's cursor is saved after
+# every chunk so an interrupted run resumes there.
+RESCORE_CHUNK_SIZE = 1000
+
+
+def _normalize(text):
+    return ' '.join(text.split()).casefold()
+
+
+def queue_rescore(question_id):
+    """Queues a question for rescoring (restarting it if a rescore is already in progress)."""
+    QuestionRescore.objects.update_or_create(question_id=question_id, defaults={'last_user_answer_id': 0})
+
+
+def _replaced_answer_keys(question_id, answer_ids, key_by_text):
+    """Maps chosen answers that no longer exist to {old_answer_id: (new_answer_id, is_correct)} by matching
+    their last recorded text against the current answers (import_questions recreates answers)."""
+    texts = {}
+    for answer_id, answer_text in (Answer.history.filter(id__in=answer_ids, question_id=question_id)
+                                   .order_by('history_id').values_list('id', 'answer_text')):
+        texts[answer_id] = answer_text  # Later records win
+    return {answer_id: key_by_text[_normalize(text)] for answer_id, text in texts.items() if _normalize(text) in key_by_text}
+
+
+def _rescore_chunk(question_id, subtopic_id, cursor, chunk_size, key, key_by_text):
+    """Rescores one chunk of a question's UserAnswer rows after `cursor`.
+    Returns (new cursor or None when done, [(user_id, is_correct)] changes)."""
+    rows = list(UserAnswer.objects.filter(question_id=question_id, id__gt=cursor, answer_id__isnull=False)
+                .order_by('id').values_list('id', 'user_id', 'answer_id', 'is_correct')[:chunk_size])
+    if not rows:
+        return None, []
+
+    replaced = _replaced_answer_keys(question_id, {answer_id for _, _, answer_id, _ in rows if answer_id not in key}, key_by_text)
+    updates = {}  # (old answer_id, new answer_id, is_correct) -> row IDs
+    changes = []
+    for row_id, user_id, answer_id, is_correct in rows:
+        if answer_id in key:
+            new_answer_id, new_is_correct = answer_id, key[answer_id]
+        elif answer_id in replaced:
+            new_answer_id, new_is_correct = replaced[answer_id]
+        else:
+            continue  # The chosen answer was deleted with no matching replacement; keep the recorded result
+        if (new_answer_id, new_is_correct) != (answer_id, is_correct):
+            updates.setdefault((answer_id, new_answer_id, new_is_correct), []).append(row_id)
+        if new_is_correct != is_correct:
+            changes.append((user_id, new_is_correct))
+
+    # OPTIMIZATION: One UPDATE per chosen answer option instead of per row. The rows are re-read under a
+    # lock filtered on answer_id, so a row re-answered since it was read isn't overwritten and the
+    # subtopic rollups are adjusted by exactly the rows that flipped.
+    stats_changes = []
+    user_ids = {row_id: user_id for row_id, user_id, _, _ in rows}
+    with transaction.atomic():
+        # Users before UserAnswer rows, the same lock order as the drain (see quiz/stats.py)
+        lock_users({user_ids[row_id] for row_ids in updates.values() for row_id in row_ids})
+        for (answer_id, new_answer_id, new_is_correct), row_ids in updates.items():
+            locked = list(UserAnswer.objects.select_for_update().filter(id__in=row_ids, answer_id=answer_id)
+                          .values_list('id', 'user_id', 'is_correct'))
+            UserAnswer.objects.filter(id__in=[row_id for row_id, _, _ in locked]).update(
+                answer_id=new_answer_id, is_correct=new_is_correct)
+            stats_changes.extend((user_id, subtopic_id, is_correct, new_is_correct) for _, user_id, is_correct in locked)
+        apply_answer_changes(stats_changes)
+        apply_question_changes([(question_id, previous, is_correct) for _, _, previous, is_correct in stats_changes])
+    return rows[-1][0], changes
+
+
+def rescore_question(job, chunk_size=RESCORE_CHUNK_SIZE):
+    """Rescores every UserAnswer row of a queued question, resuming from the job's cursor.
+    Returns the number of rows whose correctness changed."""
+    answers = list(Answer.objects.filter(question_id=job.question_id).values_list('id', 'answer_text', 'is_correct'))
+    key = {answer_id: is_correct for answer_id, _, is_correct in answers}
+    key_by_text = {_normalize(text): (answer_id, is_correct) for answer_id, text, is_correct in answers}
+    subtopic_id = Question.objects.filter(id=job.question_id).values_list('subtopic_id', flat=True).first()
+
+    changed = 0
+    cursor = job.last_user_answer_id
+    while True:
+        cursor, changes = _rescore_chunk(job.question_id, subtopic_id, cursor, chunk_size, key, key_by_text)
+        if cursor is None:
+            break
+        QuestionRescore.objects.filter(pk=job.pk, queued_at=job.queued_at).update(last_user_answer_id=cursor)
+        # Keep the users' cached answer history (and the stats derived from it) in step
+        by_user = {}
+        for user_id, is_correct in changes:
+            by_user.setdefault(user_id, []).append((job.question_id, is_correct))
+        for user_id, results in by_user.items():
+            record_user_answers(user_id, results)
+            bump_dashboard_generation(user_id)
+        changed += len(changes)
+
+    # Only remove the job if it wasn't re-queued (which resets queued_at) while we were working
+    QuestionRescore.objects.filter(pk=job.pk, queued_at=job.queued_at).delete()
+    logger.info(f"Rescored question {job.question_id}: {changed} answers changed correctness")
+    return changed
+
+
+def rescore_pending(chunk_size=RESCORE_CHUNK_SIZE):
+    """Processes every queued rescore. Returns (questions processed, answers changed)."""
+    questions = changed = 0
+    for job in QuestionRescore.objects.order_by('queued_at'):
+        changed += rescore_question(job, chunk_size)
+        questions += 1
+    return questions, changed
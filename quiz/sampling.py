@@ -0,0 +1,116 @@
+# quiz/sampling.py
+
+import random
+import logging
+from array import array
+from bisect import bisect_right
+
+from django.core.cache import cache
+from django.db.utils import DatabaseError
+
+from .models import Question
+from .taxonomy import get_bank_version
+
+logger = logging.getLogger(__name__)
+
+POOL_CACHE_TIMEOUT = 60 * 60 * 24  # 24 hours (keys are versioned, so stale pools are never read)
+
+# How many random draws per requested question rejection sampling may spend
+# before falling back to a full reservoir pass over the pools.
+REJECTION_DRAWS_PER_PICK = 4
+
+
+def get_subtopic_pools(subtopic_ids, version=None):
+    """Returns {subtopic_id: array('q')} of live question IDs (ascending) for the given subtopics.
+
+    Pools are cached per subtopic under the question bank version, so only subtopics missing
+    from the cache are loaded, in a single query.
+    """
+    if version is None:
+        version = get_bank_version()
+    subtopic_ids = set(subtopic_ids)
+    keys = {f'quiz:pool:{version}:{subtopic_id}': subtopic_id for subtopic_id in subtopic_ids}
+    pools = {keys[key]: pool for key, pool in cache.get_many(keys).items()}
+
+    missing = subtopic_ids - pools.keys()
+    if missing:
+        fresh = {subtopic_id: array('q') for subtopic_id in missing}
+        rows = Question.objects.filter(subtopic_id__in=missing).order_by('subtopic_id', 'id')
+        try:
+            for subtopic_id, question_id in rows.filter(status='LIVE').values_list('subtopic_id', 'id').iterator():
+                fresh[subtopic_id].append(question_id)
+        except DatabaseError:
+            # Fallback if 'status' column is missing: Assume all questions are LIVE.
+            logger.warning("DatabaseError loading question pools. 'status' column likely missing. Assuming all questions are LIVE.")
+            fresh = {subtopic_id: array('q') for subtopic_id in missing}
+            for subtopic_id, question_id in rows.values_list('subtopic_id', 'id').iterator():
+                fresh[subtopic_id].append(question_id)
+
+        cache.set_many({f'quiz:pool:{version}:{subtopic_id}': pool for subtopic_id, pool in fresh.items()}, POOL_CACHE_TIMEOUT)
+        pools.update(fresh)
+
+    return pools
+
+
+def sample_question_ids(subtopic_ids, count, accept=None, rng=None, pools=None):
+    """Returns up to `count` distinct random live question IDs from the given subtopics, in random order.
+
+    The pools are treated as one virtual sequence indexed by position, so only the sampled
+    positions are ever resolved to IDs. `accept` is an optional predicate on question IDs used for
+    the user filters: candidates are drawn by rejection sampling, falling back to a reservoir pass
+    when too few of them pass.
+    """
+    rng = rng or random
+    if pools is None:
+        pools = get_subtopic_pools(subtopic_ids)
+
+    # Sort so the virtual sequence (and therefore a seeded sample) is deterministic
+    ordered_pools = [pools[subtopic_id] for subtopic_id in sorted(set(subtopic_ids)) if pools.get(subtopic_id)]
+    offsets = []
+    total = 0
+    for pool in ordered_pools:
+        offsets.append(total)
+        total += len(pool)
+
+    if total == 0 or count <= 0:
+        return []
+
+    def id_at(position):
+        index = bisect_right(offsets, position) - 1
+        return ordered_pools[index][position - offsets[index]]
+
+    if accept is None:
+        return [id_at(position) for position in rng.sample(range(total), min(count, total))]
+
+    picked = []
+    seen = set()
+    for _ in range(count * REJECTION_DRAWS_PER_PICK):
+        if len(picked) == count or len(seen) == total:
+            break
+        position = rng.randrange(total)
+        if position in seen:
+            continue
+        seen.add(position)
+        question_id = id_at(position)
+        if accept(question_id):
+            picked.append(question_id)
+
+    if len(picked) == count or len(seen) == total:
+        return picked
+
+    # Acceptance rate is too low for rejection sampling: reservoir-sample (Algorithm R) the eligible IDs
+    reservoir = []
+    eligible = 0
+    for pool in ordered_pools:
+        for question_id in pool:
+            if not accept(question_id):
+                continue
+            eligible += 1
+            if len(reservoir) < count:
+                reservoir.append(question_id)
+            else:
+                slot = rng.randrange(eligible)
+                if slot < count:
+                    reservoir[slot] = question_id
+    rng.shuffle(reservoir)
+    return reservoir
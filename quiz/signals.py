@@ -0,0 +1,113 @@
+# quiz/signals.py
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+from simple_history.signals import post_create_historical_record
+
+from .models import Category, Topic, Subtopic, Question, Answer, ExamBlueprint, BlueprintStratum
+from .taxonomy import bump_bank_version
+from .bundles import bump_content_versions
+from .exam import invalidate_blueprints
+from .rescoring import queue_rescore
+
+
+# Changes to the question bank tree, or to which questions are live (a question added, deleted,
+# published, unpublished or moved), bump the bank version and so every cached pool, bitset and
+# taxonomy snapshot. Editing a question's text or answers only bumps that question's content
+# version (quiz/bundles.py). Bumps run on commit so no reader can cache pre-commit data under the
+# new version, and the saves of one transaction (an admin form with its answer inlines, a whole
+# import_questions run) are collected so each version is bumped once.
+class _PendingInvalidations:
+    """The question bank changes of one transaction."""
+
+    def __init__(self):
+        self.bank = False
+        self.question_ids = set()
+        self.applied = False
+
+    def apply(self):
+        if self.applied:
+            return
+        self.applied = True
+        if self.bank:
+            # Bundles are keyed by the bank version too
+            bump_bank_version()
+        elif self.question_ids:
+            bump_content_versions(self.question_ids)
+
+
+def _queue_invalidation(bank=False, question_id=None):
+    # Each save registers its own callback, since a savepoint that is rolled back discards the ones
+    # registered in it, but they share the transaction's pending changes and the first to run
+    # applies them all. Changes from a rolled-back savepoint only invalidate a little more than needed.
+    pending = next((callback.__self__ for _, callback, _ in transaction.get_connection().run_on_commit
+                    if isinstance(getattr(callback, '__self__', None), _PendingInvalidations)
+                    and not callback.__self__.applied), None)
+    if pending is None:
+        pending = _PendingInvalidations()
+    pending.bank |= bank
+    if question_id is not None:
+        pending.question_ids.add(question_id)
+    transaction.on_commit(pending.apply)
+
+
+@receiver(pre_save, sender=Question)
+def remember_question_placement(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding:
+        instance._saved_placement = None
+        return
+    instance._saved_placement = Question.objects.filter(pk=instance.pk).values_list('status', 'subtopic_id').first()
+
+
+@receiver(post_save, sender=Question)
+def invalidate_question(sender, instance, created, **kwargs):
+    if created:
+        if instance.status == 'LIVE':
+            _queue_invalidation(bank=True)
+    elif getattr(instance, '_saved_placement', None) != (instance.status, instance.subtopic_id):
+        _queue_invalidation(bank=True)
+    else:
+        _queue_invalidation(question_id=instance.id)
+
+
+@receiver(post_save, sender=Answer)
+@receiver(post_delete, sender=Answer)
+def invalidate_question_answers(sender, instance, **kwargs):
+    _queue_invalidation(question_id=instance.question_id)
+
+
+@receiver(post_delete, sender=Question)
+@receiver(post_save, sender=Subtopic)
+@receiver(post_delete, sender=Subtopic)
+@receiver(post_save, sender=Topic)
+@receiver(post_delete, sender=Topic)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_question_bank(sender, instance, **kwargs):
+    _queue_invalidation(bank=True)
+
+
+# Blueprint edits refresh the mock exam list on the quiz setup page
+@receiver(post_save, sender=ExamBlueprint)
+@receiver(post_delete, sender=ExamBlueprint)
+@receiver(post_save, sender=BlueprintStratum)
+@receiver(post_delete, sender=BlueprintStratum)
+def invalidate_exam_blueprints(sender, instance, **kwargs):
+    invalidate_blueprints()
+
+
+# An Answer whose is_correct flipped, or that was deleted (import_questions replaces a question's
+# answers), leaves stored UserAnswer results stale; queue the question for `manage.py rescore_answers`
+@receiver(post_create_historical_record)
+def queue_answer_key_rescore(sender, instance, history_instance, **kwargs):
+    if not isinstance(instance, Answer):
+        return
+    if history_instance.history_type == '~':
+        previous = history_instance.prev_record
+        if previous is None or previous.is_correct == history_instance.is_correct:
+            return
+    elif history_instance.history_type != '-':
+        return
+    question_id = instance.question_id
+    transaction.on_commit(lambda: queue_rescore(question_id))
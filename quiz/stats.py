@@ -0,0 +1,140 @@
+# quiz/stats.py
+
+import logging
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import AnswerEvent, UserAnswer, UserDailyStats, UserSubtopicStats
+
+logger = logging.getLogger(__name__)
+
+# Per-user rollups read by the dashboard:
+#   UserSubtopicStats - answered/correct per subtopic over UserAnswer (the latest answer per question)
+#   UserDailyStats    - answers/correct per day over AnswerEvent (every answer submitted)
+# Both are kept up to date incrementally by the answer queue drain (and rescoring for correctness),
+# so the dashboard reads O(subtopics + 30) rows however long a user's history is. Increments are a
+# single INSERT ... ON CONFLICT DO UPDATE SET n = n + EXCLUDED.n (PostgreSQL and SQLite >= 3.24), so
+# concurrent drains add up instead of overwriting each other. `manage.py rebuild_user_stats` backfills
+# and repairs them from the source tables. Every writer of a user's UserAnswer rows and rollups (the
+# drain, rescoring, reset_performance, the rebuild and the daily event roll-up) first locks the user's
+# row with lock_users, so a recount can't interleave with increments and lose or double-count them.
+STATS_BATCH_SIZE = 200  # Rows per increment statement (4 parameters each; SQLite allows 999)
+
+
+def _increment(model, key_fields, counts, count_fields=('answered', 'correct')):
+    """Adds {key tuple: (answered, correct)} deltas to a stats table, creating missing rows."""
+    if not counts:
+        return
+    table = connection.ops.quote_name(model._meta.db_table)
+    columns = [model._meta.get_field(name).column for name in key_fields] + list(count_fields)
+    quoted = [connection.ops.quote_name(column) for column in columns]
+    updates = ', '.join(f'{column} = {table}.{column} + EXCLUDED.{column}' for column in quoted[-2:])
+    rows = [(*key, answered, correct) for key, (answered, correct) in counts.items() if answered or correct]
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), STATS_BATCH_SIZE):
+            batch = rows[start:start + STATS_BATCH_SIZE]
+            placeholders = ', '.join(['(' + ', '.join(['%s'] * len(columns)) + ')'] * len(batch))
+            cursor.execute(
+                f"INSERT INTO {table} ({', '.join(quoted)}) VALUES {placeholders} "
+                f"ON CONFLICT ({', '.join(quoted[:-2])}) DO UPDATE SET {updates}",
+                [value for row in batch for value in row],
+            )
+
+
+def _add(counts, key, answered, correct):
+    total_answered, total_correct = counts.get(key, (0, 0))
+    counts[key] = (total_answered + answered, total_correct + correct)
+
+
+def lock_users(user_ids):
+    """Locks the users' rows until the transaction ends, in ID order so concurrent writers can't
+    deadlock. Call inside a transaction. Returns the IDs of the users that still exist."""
+    return set(User.objects.select_for_update().filter(id__in=user_ids).order_by('id').values_list('id', flat=True))
+
+
+def apply_answer_changes(changes):
+    """Updates UserSubtopicStats for UserAnswer writes given as (user_id, subtopic_id, previous, is_correct)
+    tuples, where previous is the row's earlier is_correct or None for a new row. Call inside the write's
+    transaction."""
+    counts = {}
+    for user_id, subtopic_id, previous, is_correct in changes:
+        if previous is None:
+            _add(counts, (user_id, subtopic_id), 1, int(is_correct))
+        elif previous != is_correct:
+            _add(counts, (user_id, subtopic_id), 0, 1 if is_correct else -1)
+    _increment(UserSubtopicStats, ('user', 'subtopic'), counts)
+
+
+def record_daily_activity(events):
+    """Adds (user_id, answered_at, is_correct) answer events to UserDailyStats. Call inside the events'
+    transaction."""
+    counts = {}
+    for user_id, answered_at, is_correct in events:
+        _add(counts, (user_id, timezone.localtime(answered_at).date()), 1, int(is_correct))
+    _increment(UserDailyStats, ('user', 'date'), counts)
+
+
+def get_subtopic_stats(user_id):
+    """Returns the user's subtopic rollup rows with their subtopic and topic names."""
+    return (UserSubtopicStats.objects.filter(user_id=user_id, answered__gt=0)
+            .values('subtopic__topic__name', 'subtopic__name', 'answered', 'correct')
+            .order_by('subtopic__topic__name', 'subtopic__name'))
+
+
+def get_daily_stats(user_id, days=30, after=None):
+    """Returns the user's UserDailyStats rows for the last `days` days, oldest first, leaving out
+    `after` (a date, e.g. the day of a stats reset) and earlier days."""
+    since = timezone.localdate() - timedelta(days=days)
+    rows = UserDailyStats.objects.filter(user_id=user_id, date__gte=since, answered__gt=0)
+    if after is not None:
+        rows = rows.filter(date__gt=after)
+    return rows.order_by('date')
+
+
+def get_reset_day_stats(user_id, reset_at):
+    """Returns an unsaved UserDailyStats row counting the user's answers from `reset_at` to the end of
+    that day, from the AnswerEvent log (the day's rollup also counts the answers before the reset)."""
+    date = timezone.localtime(reset_at).date()
+    end = timezone.make_aware(datetime.combine(date + timedelta(days=1), time.min))
+    totals = (AnswerEvent.objects.filter(user_id=user_id, created_at__gte=reset_at, created_at__lt=end)
+              .aggregate(answered=Count('id'), correct=Count('id', filter=Q(is_correct=True))))
+    return UserDailyStats(user_id=user_id, date=date, answered=totals['answered'], correct=totals['correct'])
+
+
+def reset_user_stats(user_id):
+    """Deletes the user's subtopic rollups (inside reset_performance's transaction, under lock_users).
+    UserDailyStats is kept: like the AnswerEvent log it records platform activity, and the dashboard
+    skips the days before the reset instead."""
+    UserSubtopicStats.objects.filter(user_id=user_id).delete()
+
+
+@transaction.atomic
+def rebuild_user_stats(user_id):
+    """Recomputes a user's rollups from UserAnswer and AnswerEvent. Daily rows for days whose events
+    have been pruned are kept as they are."""
+    # Holds off the drain and rescoring for this user until the rollups are replaced
+    lock_users([user_id])
+    subtopic_totals = (UserAnswer.objects.filter(user_id=user_id)
+                       .values('question__subtopic_id')
+                       .annotate(answered=Count('id'), correct=Count('id', filter=Q(is_correct=True))))
+    UserSubtopicStats.objects.filter(user_id=user_id).delete()
+    UserSubtopicStats.objects.bulk_create([
+        UserSubtopicStats(user_id=user_id, subtopic_id=row['question__subtopic_id'], answered=row['answered'], correct=row['correct'])
+        for row in subtopic_totals
+    ], batch_size=STATS_BATCH_SIZE)
+
+    daily_totals = list(AnswerEvent.objects.filter(user_id=user_id)
+                        .annotate(date=TruncDate('created_at')).values('date')
+                        .annotate(answered=Count('id'), correct=Count('id', filter=Q(is_correct=True)))
+                        .order_by('date'))
+    if daily_totals:
+        UserDailyStats.objects.filter(user_id=user_id, date__gte=daily_totals[0]['date']).delete()
+        UserDailyStats.objects.bulk_create([
+            UserDailyStats(user_id=user_id, date=row['date'], answered=row['answered'], correct=row['correct'])
+            for row in daily_totals
+        ], batch_size=STATS_BATCH_SIZE)
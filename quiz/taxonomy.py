@@ -0,0 +1,130 @@
+# quiz/taxonomy.py
+
+import time
+import logging
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+from django.db.utils import DatabaseError
+
+from .models import CacheVersion, Subtopic
+
+logger = logging.getLogger(__name__)
+
+# The question bank version is bumped (via quiz/signals.py) whenever a Question,
+# Subtopic, Topic or Category row changes. Every derived cache entry embeds it in its key,
+# so a bump invalidates them all at once without having to track individual keys.
+#
+# The counter is a CacheVersion row, not a cache key: without Redis each worker has its own
+# LocMemCache, and a bump from the admin in one worker, `import_questions` or a shell would never
+# reach the others. Each process re-reads the row at most every BANK_VERSION_CHECK_INTERVAL seconds,
+# so warm cache hits still cost no queries and every worker sees a bump within that interval.
+BANK_VERSION_NAME = 'question_bank'
+BANK_VERSION_CHECK_INTERVAL = 5  # seconds
+TAXONOMY_CACHE_TIMEOUT = 60 * 60 * 24  # 24 hours (rebuilt on demand after a version bump)
+
+# (version, time.monotonic() when it was read) for this process
+_bank_version_checked = None
+
+
+def _remember_bank_version(version):
+    global _bank_version_checked
+    _bank_version_checked = (version, time.monotonic())
+    return version
+
+
+def _read_bank_version():
+    version = CacheVersion.objects.filter(name=BANK_VERSION_NAME).values_list('version', flat=True).first()
+    if version is None:
+        # Seed with a timestamp rather than 1 so a recreated counter can never
+        # collide with a version whose snapshots are still cached.
+        try:
+            with transaction.atomic():
+                version = CacheVersion.objects.create(name=BANK_VERSION_NAME, version=time.time_ns()).version
+        except IntegrityError:
+            # Another process created it first
+            version = CacheVersion.objects.get(name=BANK_VERSION_NAME).version
+    return version
+
+
+def get_bank_version():
+    """Returns the current question bank version, re-reading it from the database at most every
+    BANK_VERSION_CHECK_INTERVAL seconds."""
+    checked = _bank_version_checked
+    if checked is not None and time.monotonic() - checked[1] < BANK_VERSION_CHECK_INTERVAL:
+        return checked[0]
+    try:
+        return _remember_bank_version(_read_bank_version())
+    except DatabaseError:
+        # Table missing (maintains resilience during deployment): serve the last known version
+        logger.warning("DatabaseError reading the question bank version. CacheVersion table likely missing.")
+        return checked[0] if checked is not None else 0
+
+
+def bump_bank_version():
+    """Invalidates every cached view of the question bank, in every process."""
+    updated = CacheVersion.objects.filter(name=BANK_VERSION_NAME).update(version=F('version') + 1)
+    if not updated:
+        # Row missing: _read_bank_version starts a fresh version sequence
+        return _remember_bank_version(_read_bank_version())
+    # This process sees its own bump immediately
+    return _remember_bank_version(CacheVersion.objects.get(name=BANK_VERSION_NAME).version)
+
+
+def build_taxonomy_snapshot(version):
+    """Builds the live Category/Topic/Subtopic tree with live question counts in a single query."""
+    fields = ('id', 'name', 'topic_id', 'topic__name', 'topic__category_id', 'topic__category__name')
+    ordering = ('topic__category_id', 'topic_id', 'id')
+    try:
+        rows = list(Subtopic.objects
+            .annotate(live_count=Count('questions', filter=Q(questions__status='LIVE')))
+            .filter(live_count__gt=0)
+            .values(*fields, 'live_count')
+            .order_by(*ordering))
+    except DatabaseError:
+        # Fallback if the 'status' column is missing (maintains resilience during deployment).
+        logger.warning("DatabaseError building taxonomy snapshot. 'status' column likely missing. Counting all questions.")
+        rows = list(Subtopic.objects
+            .annotate(live_count=Count('questions'))
+            .values(*fields, 'live_count')
+            .order_by(*ordering))
+
+    categories = []
+    subtopics = {}
+    category = topic = None
+    for row in rows:
+        if category is None or category['id'] != row['topic__category_id']:
+            category = {'id': row['topic__category_id'], 'name': row['topic__category__name'], 'live_count': 0, 'topics': []}
+            categories.append(category)
+            topic = None
+        if topic is None or topic['id'] != row['topic_id']:
+            topic = {'id': row['topic_id'], 'name': row['topic__name'], 'live_count': 0, 'subtopics': []}
+            category['topics'].append(topic)
+
+        topic['subtopics'].append({'id': row['id'], 'name': row['name'], 'live_count': row['live_count']})
+        topic['live_count'] += row['live_count']
+        category['live_count'] += row['live_count']
+        subtopics[row['id']] = {
+            'topic_id': row['topic_id'],
+            'category_id': row['topic__category_id'],
+            'live_count': row['live_count'],
+        }
+
+    return {'version': version, 'categories': categories, 'subtopics': subtopics}
+
+
+def get_taxonomy_snapshot():
+    """Returns the cached live taxonomy tree, rebuilding it only after the bank version changes.
+
+    The snapshot is a plain dict so it pickles cheaply:
+        categories: [{id, name, live_count, topics: [{id, name, live_count, subtopics: [...]}]}]
+        subtopics:  {subtopic_id: {topic_id, category_id, live_count}}
+    """
+    version = get_bank_version()
+    cache_key = f'quiz:taxonomy:{version}'
+    snapshot = cache.get(cache_key)
+    if snapshot is None:
+        snapshot = build_taxonomy_snapshot(version)
+        cache.set(cache_key, snapshot, TAXONOMY_CACHE_TIMEOUT)
+    return snapshot
@@ -1,3 +1,1301 @@
-from django.test import TestCase
+import os
+import random
+import re
+import statistics
+import tempfile
+import time
+import uuid
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import fakeredis
+from django.test import Client, TestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.core.cache import cache
+from django.contrib.auth.models import User
+from django.db.models.functions import Lower
+from django.urls import reverse
+from django.utils import timezone
+
+from . import redis_store, rescoring, versions
+from .models import (
+    Answer, AnswerEvent, AnswerOutbox, AnswerRateBucket, BlueprintStratum, CacheVersion, Category, DailyPlatformMetrics, ExamBlueprint, FlaggedQuestion, Topic, Subtopic, Question, QuestionRescore, QuestionStats, QuizAttemptAnswer, UserAnswer,
+    UserDailyStats, UserSubtopicStats,
+)
+from .answer_rate import ANSWER_RATE_WINDOW_MINUTES, get_top_answerers, get_user_answer_count, record_answer
+from .admin_metrics import ADMIN_METRICS_KEY, ADMIN_METRICS_LOCK_KEY, ADMIN_METRICS_TTL, get_admin_index_metrics
+from .attempts import ATTEMPT_SESSION_KEY, create_attempt, get_attempt_answer, get_attempt_answers, get_attempt_meta, save_attempt_answer
+from .bitsets import (
+    bit_predicate, filter_candidates, get_live_bitset, get_user_bitsets, get_user_generation, ids_to_bits, iter_bits,
+    record_user_answers, sample_filtered_question_ids,
+)
+from .bundles import bump_content_versions, get_answer_key, get_answer_keys, get_question_bundle
+from .dashboard import get_dashboard_cache_stats
+from .events import rollup_answer_events
+from .exam import allocate_quotas, generate_exam_question_ids
+from .flags import flush_dirty_flags, flush_user_flags, get_flagged_ids, toggle_flag
+from .ingest import (
+    ANSWER_MAX_FAILURES, USER_ANSWER_BATCH_SIZE, drain_answer_queue, enqueue_results, get_pending_results, requeue_dead_letters,
+)
+from .redis_store import redis_key
+from .question_stats import recompute_question_stats
+from .rescoring import queue_rescore, rescore_pending
+from .sampling import get_subtopic_pools, sample_question_ids
+from .platform_metrics import METRICS_TTL, backfill_platform_metrics, get_platform_metrics
+from .versions import VERSION_CHECK_INTERVAL, VERSION_SEQUENCE_NAME
+from .taxonomy import BANK_VERSION_CHECK_INTERVAL, BANK_VERSION_NAME, bump_bank_version, get_bank_version, get_taxonomy_snapshot
+from .stats import STATS_BATCH_SIZE, get_daily_stats, get_subtopic_stats, rebuild_user_stats
+from .admin_views import ACTIVE_NOW_WINDOW
+from .views import PLAYER_EVENT_RATE, encode_navigator_state
+from users.models import ActiveSession, Profile
+from users.session_registry import (
+    REGISTRY_PRUNE_INTERVAL, REGISTRY_PRUNE_KEY, count_active_sessions, count_active_users, prune_session_registry,
+    registry_window, touch_session,
+)
+
+
+def forget_record_versions():
+    """Drops the record versions this process remembers, which can outlive the rolled-back test that bumped them."""
+    versions._versions.clear()
+    versions._sequence_checked = None
+
+
+# A large LocMemCache so question bundles aren't culled mid-test (the default keeps 300 entries).
+# The queue is drained explicitly, as a drain worker would, unless a test turns the worker off.
+@override_settings(CACHES={'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'quiz-tests',
+    'OPTIONS': {'MAX_ENTRIES': 100000},
+}}, ANSWER_QUEUE_WORKER=True)
+class QuizResultsPersistenceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Category')
+        topic = Topic.objects.create(category=category, name='Topic')
+        subtopic = Subtopic.objects.create(topic=topic, name='Subtopic')
+        Question.objects.bulk_create([
+            Question(subtopic=subtopic, question_text=f'Question {i}', explanation='Explanation', status='LIVE')
+            for i in range(500)
+        ])
+        cls.question_ids = list(Question.objects.order_by('id').values_list('id', flat=True))
+        cls.user = User.objects.create_user('student', 'student@example.com', 'password12345')
+
+    def setUp(self):
+        cache.clear()
+        forget_record_versions()
+        # Build the cached answer history up front so both quizzes update it the same way
+        get_user_bitsets(self.user.id)
+        self.client.force_login(self.user)
+
+    def finish_quiz(self, question_ids, correct, answered_ids=None):
+        """Answers every question (or `answered_ids`) in a new attempt and returns the queries made by quiz_results."""
+        attempt_id = create_attempt(self.user.id, {
+            'question_ids': question_ids, 'total_questions': len(question_ids), 'mode': 'test', 'penalty_value': 0.0,
+        })
+        for q_id in question_ids if answered_ids is None else answered_ids:
+            save_attempt_answer(attempt_id, q_id, {'answer_id': None, 'is_correct': correct, 'is_submitted': True})
+        session = self.client.session
+        session[ATTEMPT_SESSION_KEY] = attempt_id
+        session.save()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('quiz_results'))
+        self.assertEqual(response.status_code, 200)
+        return queries
+
+    def test_results_query_count_is_constant(self):
+        # Each finish replaces the previous quiz's review attempt, so start from one
+        self.finish_quiz(self.question_ids[:10], correct=False)
+        small = self.finish_quiz(self.question_ids[:10], correct=False)
+        large = self.finish_quiz(self.question_ids, correct=False)
+
+        # The results page only queues the answers (one outbox row), whatever the quiz length
+        self.assertEqual(len(large), len(small))
+        self.assertFalse(UserAnswer.objects.exists())
+        self.assertEqual(AnswerOutbox.objects.count(), 3)
+
+    def insert_batches(self, count):
+        """Statements needed to write `count` answers to UserAnswer, AnswerEvent and QuestionStats on this backend."""
+        batches = -(-count // STATS_BATCH_SIZE)  # One QuestionStats increment row per question
+        for model in (UserAnswer, AnswerEvent):
+            fields = [field for field in model._meta.concrete_fields if not field.primary_key]
+            batch_size = min(connection.ops.bulk_batch_size(fields, [None] * count) or count, USER_ANSWER_BATCH_SIZE)
+            batches += -(-count // batch_size)
+        return batches
+
+    def test_drain_upsert_query_count_is_constant(self):
+        self.finish_quiz(self.question_ids[:10], correct=False)
+        with CaptureQueriesContext(connection) as small:
+            drain_answer_queue()
+        self.finish_quiz(self.question_ids, correct=False)
+        with CaptureQueriesContext(connection) as large:
+            drain_answer_queue()
+
+        # One upsert, event insert and question stats increment per batch and no per-row queries. The only
+        # growth is the extra statements a backend with a low parameter limit (SQLite) needs for 500 rows.
+        self.assertEqual(len(large) - len(small), self.insert_batches(500) - self.insert_batches(10))
+        self.assertFalse([q for q in large.captured_queries if q['sql'].startswith('UPDATE "quiz_useranswer"')])
+        self.assertEqual(UserAnswer.objects.filter(user=self.user).count(), 500)
+        self.assertFalse(AnswerOutbox.objects.exists())
+
+    def test_drain_keeps_latest_result(self):
+        self.finish_quiz(self.question_ids[:10], correct=False)
+        self.finish_quiz(self.question_ids[:20], correct=True)
+        drain_answer_queue()
+
+        answers = UserAnswer.objects.filter(user=self.user)
+        self.assertEqual(answers.count(), 20)
+        self.assertFalse(answers.filter(is_correct=False).exists())
+
+    def test_rebuild_before_the_drain_keeps_queued_results(self):
+        self.finish_quiz(self.question_ids[:10], correct=False)
+        self.finish_quiz(self.question_ids[:5], correct=True)
+        # A concurrent write (or an eviction) forces a rebuild while UserAnswer still lags the queue
+        cache.delete(f'quiz:user_bits:{self.user.id}:{get_user_generation(self.user.id)}')
+        answered, correct = get_user_bitsets(self.user.id)
+        self.assertEqual((answered.bit_count(), correct.bit_count()), (10, 5))
+
+        drain_answer_queue()
+        cache.delete(f'quiz:user_bits:{self.user.id}:{get_user_generation(self.user.id)}')
+        self.assertEqual(get_user_bitsets(self.user.id), (answered, correct))
+
+    def test_review_is_paginated_and_filterable(self):
+        question_ids = self.question_ids[:25]
+        self.finish_quiz(question_ids, correct=True, answered_ids=question_ids[:22])
+
+        response = self.client.get(reverse('quiz_review'), {'page': 2})
+        self.assertEqual([item['number'] for item in response.context['review_items']], list(range(21, 26)))
+
+        response = self.client.get(reverse('quiz_review'), {'filter': 'incorrect', 'fragment': 1})
+        self.assertTemplateNotUsed(response, 'base.html')
+        self.assertEqual([item['number'] for item in response.context['review_items']], [23, 24, 25])
+
+    def test_drain_logs_every_answer(self):
+        self.finish_quiz(self.question_ids[:10], correct=False)
+        self.finish_quiz(self.question_ids[:10], correct=True)
+        drain_answer_queue()
+
+        # UserAnswer keeps the latest result; the event log keeps both attempts
+        self.assertEqual(UserAnswer.objects.filter(user=self.user).count(), 10)
+        self.assertEqual(AnswerEvent.objects.filter(user=self.user).count(), 20)
+        self.assertEqual(AnswerEvent.objects.filter(user=self.user, is_correct=True).count(), 10)
+
+    @override_settings(ANSWER_QUEUE_WORKER=False)
+    def test_results_are_written_inline_without_a_worker(self):
+        other = User.objects.create_user('other', 'other@example.com', 'password12345')
+        backlog = AnswerOutbox.objects.create(user=other, results=[[self.question_ids[0], True, None]])
+        self.finish_quiz(self.question_ids[:10], correct=True)
+        self.assertEqual(UserAnswer.objects.filter(user=self.user, is_correct=True).count(), 10)
+        self.assertEqual(AnswerEvent.objects.filter(user=self.user).count(), 10)
+        # Only the request's own entry is written; other users' entries are left to the drain
+        self.assertEqual(list(AnswerOutbox.objects.all()), [backlog])
+        self.assertFalse(UserAnswer.objects.filter(user=other).exists())
+
+    def test_failing_entry_is_dead_lettered(self):
+        poison = AnswerOutbox.objects.create(user=self.user, results=[['not-a-question', True, None]])
+        self.finish_quiz(self.question_ids[:10], correct=True)
+
+        # The bad entry doesn't hold up the rest of its batch
+        self.assertEqual(drain_answer_queue(), 1)
+        self.assertEqual(UserAnswer.objects.filter(user=self.user).count(), 10)
+        poison.refresh_from_db()
+        self.assertEqual(poison.failures, 1)
+        self.assertTrue(poison.last_error)
+
+        for _ in range(ANSWER_MAX_FAILURES - 1):
+            drain_answer_queue()
+        poison.refresh_from_db()
+        self.assertEqual(poison.failures, ANSWER_MAX_FAILURES)
+        # Dead-lettered: no longer retried until requeued
+        self.assertEqual(drain_answer_queue(), 0)
+        self.assertEqual(requeue_dead_letters(), 1)
+        self.assertEqual(AnswerOutbox.objects.get().failures, 0)
+
+    def test_dashboard_reads_incremental_rollups(self):
+        self.finish_quiz(self.question_ids[:10], correct=False)
+        drain_answer_queue()
+        self.finish_quiz(self.question_ids[:20], correct=True)
+        drain_answer_queue()
+
+        # Ten answers flipped to correct and ten new ones; today's activity counts all thirty
+        stats = UserSubtopicStats.objects.get(user=self.user)
+        self.assertEqual((stats.answered, stats.correct), (20, 20))
+        daily = UserDailyStats.objects.get(user=self.user)
+        self.assertEqual((daily.answered, daily.correct), (30, 20))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.context['total_answered'], 20)
+        self.assertEqual(response.context['incorrect_questions_count'], 0)
+        self.assertFalse([q for q in queries.captured_queries
+                          if 'quiz_useranswer' in q['sql'] or 'quiz_answerevent' in q['sql']])
+
+        # A rebuild from the source tables agrees with the incremental counts
+        rebuild_user_stats(self.user.id)
+        stats = UserSubtopicStats.objects.get(user=self.user)
+        daily = UserDailyStats.objects.get(user=self.user)
+        self.assertEqual((stats.answered, stats.correct, daily.answered, daily.correct), (20, 20, 30, 20))
+
+    def test_reset_keeps_the_event_log(self):
+        self.finish_quiz(self.question_ids[:10], correct=False)
+        drain_answer_queue()
+        self.client.post(reverse('reset_performance'))
+        self.assertFalse(UserAnswer.objects.filter(user=self.user).exists())
+        self.assertFalse(UserSubtopicStats.objects.filter(user=self.user).exists())
+        # The event log and the daily rollups it feeds (and the platform metrics) are kept
+        self.assertEqual(AnswerEvent.objects.filter(user=self.user).count(), 10)
+        self.assertEqual(UserDailyStats.objects.get(user=self.user).answered, 10)
+        self.assertEqual(self.client.get(reverse('dashboard')).context['chart_data'], '[]')
+
+        # The activity chart only counts the answers given since the reset
+        self.finish_quiz(self.question_ids[:5], correct=True)
+        drain_answer_queue()
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.context['total_answered'], 5)
+        self.assertEqual(response.context['chart_data'], '[100.0]')
+        self.assertEqual(rollup_answer_events(timezone.localdate()), 1)
+        self.assertEqual(UserDailyStats.objects.get(user=self.user).answered, 15)
+
+    @skipUnlessDBFeature('has_select_for_update')
+    def test_rollup_writers_lock_the_user_first(self):
+        self.finish_quiz(self.question_ids[:10], correct=False)
+        for write in (drain_answer_queue, lambda: rebuild_user_stats(self.user.id)):
+            with CaptureQueriesContext(connection) as queries:
+                write()
+            sql = [q['sql'] for q in queries.captured_queries]
+            user_lock = next(i for i, query in enumerate(sql) if 'FOR UPDATE' in query and '"auth_user"' in query)
+            first_stats_write = next(i for i, query in enumerate(sql) if not query.startswith('SELECT') and 'quiz_usersubtopicstats' in query)
+            self.assertLess(user_lock, first_stats_write)
+
+        # The daily roll-up recounts rows the drain increments, so it locks the users too
+        with CaptureQueriesContext(connection) as queries:
+            rollup_answer_events(timezone.localdate())
+        sql = [q['sql'] for q in queries.captured_queries]
+        user_lock = next(i for i, query in enumerate(sql) if 'FOR UPDATE' in query and '"auth_user"' in query)
+        first_daily_write = next(i for i, query in enumerate(sql) if query.startswith('INSERT') and 'quiz_userdailystats' in query)
+        self.assertLess(user_lock, first_daily_write)
+
+    def test_dashboard_is_cached_until_results_change(self):
+        self.client.get(reverse('dashboard'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.context['total_answered'], 0)
+        # Only the request's user and profile lookups remain on a cache hit, plus the flag count (a
+        # FlaggedQuestion lookup without Redis), which is read per request so toggles needn't invalidate it
+        self.assertFalse([q for q in queries.captured_queries if '"quiz_' in q['sql'] and '"quiz_flaggedquestion"' not in q['sql']])
+        self.assertEqual(get_dashboard_cache_stats()['hits'], 1)
+
+        self.finish_quiz(self.question_ids[:10], correct=True)
+        drain_answer_queue()
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.context['total_answered'], 10)
+        self.assertEqual(get_dashboard_cache_stats()['misses'], 2)
+
+
+    def test_dashboard_invalidated_by_another_process_within_the_check_interval(self):
+        now = time.monotonic() + VERSION_CHECK_INTERVAL
+        with mock.patch('quiz.versions.time.monotonic', return_value=now):
+            self.client.get(reverse('dashboard'))
+        # `manage.py rebuild_user_stats` runs with its own memo and LocMemCache
+        with mock.patch.dict('quiz.versions._versions'), \
+             override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'command'}}):
+            UserAnswer.objects.bulk_create([UserAnswer(user=self.user, question_id=q_id, is_correct=True) for q_id in self.question_ids[:3]])
+            call_command('rebuild_user_stats', '--user', str(self.user.id), stdout=StringIO())
+        with mock.patch('quiz.versions.time.monotonic', return_value=now + 1):
+            self.assertEqual(self.client.get(reverse('dashboard')).context['total_answered'], 0)
+        with mock.patch('quiz.versions.time.monotonic', return_value=now + VERSION_CHECK_INTERVAL):
+            self.assertEqual(self.client.get(reverse('dashboard')).context['total_answered'], 3)
+
+class QueryPlanTests(TestCase):
+    """Fails if a hot lookup regresses to a full table scan (checked with EXPLAIN on SQLite and PostgreSQL)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Category')
+        topic = Topic.objects.create(category=category, name='Topic')
+        cls.subtopic = Subtopic.objects.create(topic=topic, name='Subtopic')
+        cls.user = User.objects.create_user('student', 'student@example.com', 'password12345')
+
+    def setUp(self):
+        if connection.vendor == 'postgresql':
+            # Tiny test tables are always cheaper to scan; only fall back to a scan if no index applies
+            with connection.cursor() as cursor:
+                cursor.execute('SET enable_seqscan = off')
+
+    def assertIndexed(self, queryset, table):
+        plan = queryset.explain()
+        if connection.vendor == 'postgresql':
+            self.assertNotIn(f'Seq Scan on {table}', plan)
+        elif connection.vendor == 'sqlite':
+            # "SEARCH t USING INDEX" is a lookup; "SCAN t" (with or without an index) reads every row
+            self.assertFalse(re.search(rf'\bSCAN {table}\b', plan), plan)
+
+    def test_dashboard_rollups_use_indexes(self):
+        self.assertIndexed(get_subtopic_stats(self.user.id), 'quiz_usersubtopicstats')
+        self.assertIndexed(get_daily_stats(self.user.id), 'quiz_userdailystats')
+
+    def test_quiz_setup_pool_query_uses_index(self):
+        # The query get_subtopic_pools runs for subtopics missing from the cache
+        pools = (Question.objects.filter(subtopic_id__in=[self.subtopic.id], status='LIVE')
+                 .order_by('subtopic_id', 'id').values_list('subtopic_id', 'id'))
+        self.assertIndexed(pools, 'quiz_question')
+
+    def test_webhook_profile_lookup_uses_index(self):
+        self.assertIndexed(Profile.objects.filter(stripe_customer_id='cus_123'), 'users_profile')
+
+    def test_signup_email_check_uses_index(self):
+        query = User.objects.alias(email_lower=Lower('email')).filter(email_lower='student@example.com')
+        self.assertIndexed(query, 'auth_user')
+
+
+class PlatformMetricsTests(TestCase):
+    def test_metrics_are_materialised_per_day(self):
+        today = timezone.localdate()
+        users = [User.objects.create_user(f'user{i}', f'user{i}@example.com', 'password12345') for i in range(3)]
+        User.objects.filter(id=users[0].id).update(date_joined=timezone.now() - timedelta(days=40))
+        UserDailyStats.objects.create(user=users[0], date=today - timedelta(days=40), answered=10, correct=4)
+        UserDailyStats.objects.create(user=users[1], date=today, answered=5, correct=5)
+        UserDailyStats.objects.create(user=users[2], date=today, answered=3, correct=0)
+
+        # The backfill reads each source once whatever the range
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(backfill_platform_metrics(), 41)
+        self.assertLess(len(queries), 20)
+
+        with CaptureQueriesContext(connection) as queries:
+            metrics = get_platform_metrics(days=30)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual((metrics[today].new_users, metrics[today].active_users, metrics[today].answers), (2, 2, 8))
+        self.assertEqual(metrics[today].total_users, 3)
+        old = DailyPlatformMetrics.objects.get(date=today - timedelta(days=40))
+        self.assertEqual((old.new_users, old.answers, old.correct_answers, old.total_users), (1, 10, 4, None))
+
+    def test_todays_row_is_refreshed_once_stale(self):
+        today = timezone.localdate()
+        user = User.objects.create_user('student', 'student@example.com', 'password12345')
+        User.objects.filter(id=user.id).update(last_login=timezone.now())
+        get_platform_metrics(days=30)
+        UserDailyStats.objects.create(user=user, date=today, answered=4, correct=1)
+        self.assertEqual(get_platform_metrics(days=30)[today].answers, 0)
+
+        DailyPlatformMetrics.objects.filter(date=today).update(computed_at=timezone.now() - METRICS_TTL - timedelta(seconds=1))
+        row = get_platform_metrics(days=30)[today]
+        self.assertEqual((row.answers, row.active_users, row.logged_in_users), (4, 1, 1))
+
+
+class QuestionStatsTests(TestCase):
+    def test_counts_are_incremental_and_recompute_adds_discrimination(self):
+        category = Category.objects.create(name='Category')
+        topic = Topic.objects.create(category=category, name='Topic')
+        subtopic = Subtopic.objects.create(topic=topic, name='Subtopic')
+        questions = [Question.objects.create(subtopic=subtopic, question_text=f'Question {i}', explanation='-', status='LIVE')
+                     for i in range(3)]
+        answers = [(True, True, True), (True, False, False), (True, True, False), (False, False, False)]
+        users = [User.objects.create_user(f'user{i}', f'user{i}@example.com', 'password12345') for i in range(len(answers))]
+        for user, row in zip(users, answers):
+            enqueue_results(user.id, [(question.id, is_correct, None) for question, is_correct in zip(questions, row)])
+        drain_answer_queue()
+
+        stats = QuestionStats.objects.get(question=questions[1])
+        self.assertEqual((stats.attempts, stats.correct, stats.p_value, stats.discrimination), (4, 2, 0.5, None))
+
+        recompute_question_stats()
+        stats.refresh_from_db()
+        self.assertEqual((stats.attempts, stats.correct), (4, 2))
+        scores = [sum(row) / len(row) for row in answers]
+        expected = statistics.correlation([float(row[1]) for row in answers], scores)
+        self.assertAlmostEqual(stats.discrimination, expected)
+
+        # A reset takes the user's answers back out of the counts
+        self.client.force_login(users[0])
+        self.client.post(reverse('reset_performance'))
+        stats.refresh_from_db()
+        self.assertEqual((stats.attempts, stats.correct, stats.p_value), (3, 1, 1 / 3))
+
+
+class AdminIndexMetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_snapshot_is_served_stale_while_one_worker_refreshes(self):
+        first = get_admin_index_metrics()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(get_admin_index_metrics(), first)
+        self.assertEqual(len(queries), 0)
+
+        # Past the TTL the stale snapshot is still returned, with a refresh started in the background
+        stale = dict(first, computed_at=first['computed_at'] - timedelta(seconds=ADMIN_METRICS_TTL + 1))
+        cache.set(ADMIN_METRICS_KEY, stale, None)
+        with mock.patch('quiz.admin_metrics.start_background_refresh') as refresh:
+            self.assertEqual(get_admin_index_metrics(), stale)
+            refresh.assert_called_once()
+
+            # ...but not while another worker holds the refresh lock
+            refresh.reset_mock()
+            cache.set(ADMIN_METRICS_LOCK_KEY, 'other-worker', 60)
+            get_admin_index_metrics()
+            refresh.assert_not_called()
+
+
+class SessionRegistryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('student', 'student@example.com', 'password12345')
+
+    def test_sessions_and_users_are_counted_within_a_window(self):
+        self.client.login(username='student', password='password12345')
+        self.client.get(reverse('dashboard'))
+        self.client.get(reverse('dashboard'))
+        self.assertEqual((count_active_sessions(), count_active_users()), (1, 1))
+
+        # Entries older than the window aren't counted and are pruned
+        other = User.objects.create_user('other', 'other@example.com', 'password12345')
+        touch_session('old-session', other.id, now=time.time() - 2 * ACTIVE_NOW_WINDOW)
+        self.assertEqual((count_active_sessions(), count_active_users()), (2, 2))
+        self.assertEqual(count_active_sessions(window=ACTIVE_NOW_WINDOW), 1)
+        self.assertEqual(prune_session_registry(max_age=ACTIVE_NOW_WINDOW), 1)
+        self.assertEqual(count_active_users(), 1)
+
+        self.client.logout()
+        self.assertEqual(count_active_sessions(), 0)
+        # The user still counts within the window after logging out
+        self.assertEqual(count_active_users(), 1)
+
+    def test_touch_prunes_stale_entries_once_per_interval(self):
+        stale = time.time() - registry_window() - 60
+        # Pruned recently: the stale entry is kept until the interval is up
+        cache.add(REGISTRY_PRUNE_KEY, True, REGISTRY_PRUNE_INTERVAL)
+        touch_session('stale-session', self.user.id, now=stale)
+        self.assertEqual(ActiveSession.objects.count(), 1)
+
+        cache.delete(REGISTRY_PRUNE_KEY)
+        touch_session('fresh-session', self.user.id)
+        self.assertEqual(list(ActiveSession.objects.values_list('session_key', flat=True)), ['fresh-session'])
+
+
+class AnswerRateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.users = [User.objects.create_user(f'user{i}', f'user{i}@example.com', 'password12345') for i in range(3)]
+
+    def record_answers(self):
+        first, second, third = (user.id for user in self.users)
+        now = time.time()
+        for _ in range(3):
+            record_answer(first, now=now)
+        record_answer(first, now=now - 5 * 60)
+        record_answer(second, now=now)
+        # Outside the window: not counted
+        record_answer(second, now=now - (ANSWER_RATE_WINDOW_MINUTES + 5) * 60)
+        for _ in range(5):
+            record_answer(third, now=now - 10 * 60)
+
+    def assertWindowTotals(self):
+        first, second, third = (user.id for user in self.users)
+        self.assertEqual(get_top_answerers(limit=2), [(third, 5), (first, 4)])
+        self.assertEqual(get_top_answerers(window_minutes=2), [(first, 3), (second, 1)])
+        self.assertEqual(get_user_answer_count(second), 1)
+
+    def test_top_answerers_sum_the_minute_buckets_in_the_window(self):
+        # Counted in the cache: the answer hot path and the dashboard make no queries
+        with self.assertNumQueries(0):
+            self.record_answers()
+            self.assertWindowTotals()
+
+    @override_settings(ANSWER_RATE_DB_FALLBACK=True)
+    def test_database_fallback_sums_the_same_buckets(self):
+        self.record_answers()
+        self.assertEqual(AnswerRateBucket.objects.count(), 5)
+        # One grouped query per read
+        with self.assertNumQueries(3):
+            self.assertWindowTotals()
+
+    def test_each_question_counts_once_per_attempt(self):
+        user = self.users[0]
+        Profile.objects.filter(user=user).update(membership='Monthly', membership_expiry_date=timezone.localdate() + timedelta(days=30))
+        category = Category.objects.create(name='Category')
+        topic = Topic.objects.create(category=category, name='Topic')
+        subtopic = Subtopic.objects.create(topic=topic, name='Subtopic')
+        questions = [Question.objects.create(subtopic=subtopic, question_text=f'Question {i}', explanation='-', status='LIVE')
+                     for i in range(2)]
+        answers = [Answer.objects.create(question=questions[0], answer_text=f'Answer {i}', is_correct=i == 0) for i in range(2)]
+        self.client.force_login(user)
+        session = self.client.session
+        session[ATTEMPT_SESSION_KEY] = create_attempt(user.id, {
+            'question_ids': [question.id for question in questions], 'total_questions': 2, 'mode': 'test',
+        })
+        session.save()
+
+        for answer in answers + answers:
+            response = self.client.post(reverse('quiz_api_answer'), {'index': 1, 'answer_id': answer.id},
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(get_user_answer_count(user.id), 1)
+
+
+class QuizPlayerApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Category')
+        topic = Topic.objects.create(category=category, name='Topic')
+        subtopic = Subtopic.objects.create(topic=topic, name='Subtopic')
+        cls.questions = [Question.objects.create(subtopic=subtopic, question_text=f'Question {i}', explanation='Explanation',
+                                                 status='LIVE') for i in range(3)]
+        cls.answers = {question.id: [Answer.objects.create(question=question, answer_text=f'Answer {i}', is_correct=i == 0)
+                                     for i in range(2)] for question in cls.questions}
+        cls.user = User.objects.create_user('student', 'student@example.com', 'password12345')
+        Profile.objects.filter(user=cls.user).update(membership='Monthly', membership_expiry_date=timezone.localdate() + timedelta(days=30))
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def start_attempt(self, mode='quiz', user=None):
+        attempt_id = create_attempt((user or self.user).id, {
+            'question_ids': [question.id for question in self.questions], 'total_questions': len(self.questions), 'mode': mode,
+        })
+        session = self.client.session
+        session[ATTEMPT_SESSION_KEY] = attempt_id
+        session.save()
+        return attempt_id
+
+    def post_event(self, name, **data):
+        return self.client.post(reverse(f'quiz_api_{name}'), data, content_type='application/json')
+
+    def test_events_are_rate_limited_per_user(self):
+        self.start_attempt()
+        limit = int(PLAYER_EVENT_RATE.split('/')[0])
+        # Pin the clock so the whole burst falls in one rate-limit window
+        with mock.patch('django_ratelimit.core.time.time', return_value=1_700_000_000):
+            for i in range(limit):
+                self.assertEqual(self.post_event('navigate' if i % 2 else 'flag', index=1).status_code, 200)
+            # The budget is shared by every event endpoint
+            response = self.post_event('answer', index=1, answer_id=self.answers[self.questions[0].id][0].id)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.json()['status'], 'error')
+
+    def test_another_users_attempt_is_rejected(self):
+        other = User.objects.create_user('other', 'other@example.com', 'password12345')
+        attempt_id = self.start_attempt(user=other)
+        question = self.questions[0]
+        response = self.post_event('answer', index=1, answer_id=self.answers[question.id][0].id, submit=True)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.post_event('flag', index=1).status_code, 409)
+        self.assertEqual(self.client.get(reverse('quiz_api_questions')).status_code, 409)
+        self.assertIsNone(get_attempt_answer(attempt_id, question.id))
+
+    def test_submitted_answers_are_locked_in_quiz_mode(self):
+        attempt_id = self.start_attempt('quiz')
+        question = self.questions[0]
+        correct, wrong = self.answers[question.id]
+        payload = self.post_event('answer', index=1, answer_id=correct.id, submit=True).json()['question']
+        self.assertTrue(payload['is_feedback_mode'])
+        self.assertTrue(payload['is_correct'])
+        self.assertEqual(payload['correct_answer_ids'], [correct.id])
+        self.assertEqual(payload['explanation'], 'Explanation')
+
+        payload = self.post_event('answer', index=1, answer_id=wrong.id, submit=True).json()['question']
+        self.assertEqual(payload['selected_answer_id'], correct.id)
+        self.assertTrue(payload['is_correct'])
+        self.assertEqual(get_attempt_answer(attempt_id, question.id)['answer_id'], correct.id)
+
+    def test_navigator_state_packs_one_digit_per_question(self):
+        question_ids = [1, 2, 3, 4, 5]
+        user_answers = {
+            1: {'answer_id': 10, 'is_correct': True, 'is_submitted': True},
+            2: {'answer_id': 20, 'is_correct': False, 'is_submitted': True},
+            3: {'answer_id': 30, 'is_correct': True, 'is_submitted': False},
+        }
+        flagged_ids = {2, 5}
+        self.assertEqual(encode_navigator_state(question_ids, user_answers, flagged_ids, 'quiz'), '7b108')
+        # Test mode only marks questions as answered
+        self.assertEqual(encode_navigator_state(question_ids, user_answers, flagged_ids, 'test'), '19108')
+        self.assertEqual(encode_navigator_state([], {}, set(), 'quiz'), '')
+
+    def test_player_page_embeds_the_navigator_state(self):
+        self.start_attempt('quiz')
+        question = self.questions[0]
+        self.post_event('answer', index=1, answer_id=self.answers[question.id][0].id, submit=True)
+        self.post_event('flag', index=3)
+        response = self.client.get(reverse('quiz_player', kwargs={'question_index': 2}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['player_config']['navigator'], '708')
+
+    def test_two_tabs_keep_each_others_answers(self):
+        attempt_id = self.start_attempt('test')
+        other_tab = Client()
+        other_tab.cookies = self.client.cookies
+        first, second = self.questions[:2]
+        # Both tabs load the player before either answers, then answer different questions
+        self.assertEqual(self.client.get(reverse('quiz_player', kwargs={'question_index': 1})).status_code, 200)
+        self.assertEqual(other_tab.get(reverse('quiz_player', kwargs={'question_index': 2})).status_code, 200)
+        self.client.post(reverse('quiz_player', kwargs={'question_index': 1}),
+                         {'answer': self.answers[first.id][0].id, 'action': 'next'})
+        other_tab.post(reverse('quiz_api_answer'), {'index': 2, 'answer_id': self.answers[second.id][1].id},
+                       content_type='application/json')
+
+        answers = get_attempt_answers(attempt_id)
+        self.assertEqual(answers[first.id]['answer_id'], self.answers[first.id][0].id)
+        self.assertEqual(answers[second.id]['answer_id'], self.answers[second.id][1].id)
+        self.assertEqual(QuizAttemptAnswer.objects.filter(attempt_id=attempt_id).count(), 2)
+        # The session only points at the attempt
+        self.assertEqual(self.client.session[ATTEMPT_SESSION_KEY], attempt_id)
+        self.assertNotIn('quiz_context', self.client.session)
+
+    def test_answers_are_validated_against_the_warm_answer_key(self):
+        attempt_id = self.start_attempt('quiz')
+        self.client.get(reverse('start_quiz'))
+        # The player fetches the question page (warming the bundles) before the first answer
+        self.client.get(reverse('quiz_api_questions'))
+        first, second = self.questions[:2]
+        # An answer that belongs to another question is ignored
+        payload = self.post_event('answer', index=1, answer_id=self.answers[second.id][0].id).json()['question']
+        self.assertIsNone(payload['selected_answer_id'])
+        self.assertIsNone(get_attempt_answer(attempt_id, first.id))
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('quiz_player', kwargs={'question_index': 1}),
+                             {'answer': self.answers[first.id][1].id, 'action': 'submit_answer'})
+            self.post_event('answer', index=2, answer_id=self.answers[second.id][0].id, submit=True)
+        self.assertFalse([query['sql'] for query in queries if 'quiz_answer"' in query['sql']])
+        self.assertFalse(get_attempt_answer(attempt_id, first.id)['is_correct'])
+        self.assertTrue(get_attempt_answer(attempt_id, second.id)['is_correct'])
+
+    def test_test_mode_never_reveals_correctness(self):
+        attempt_id = self.start_attempt('test')
+        question = self.questions[0]
+        correct, wrong = self.answers[question.id]
+        payload = self.post_event('answer', index=1, answer_id=correct.id, submit=True).json()['question']
+        # Answers can still be changed until the test is finished
+        payload = self.post_event('answer', index=1, answer_id=wrong.id, submit=True).json()['question']
+        self.assertEqual(payload['selected_answer_id'], wrong.id)
+        self.assertEqual(get_attempt_answer(attempt_id, question.id)['answer_id'], wrong.id)
+
+        questions = self.client.get(reverse('quiz_api_questions')).json()['questions']
+        for payload in [payload] + questions:
+            self.assertFalse(payload['is_feedback_mode'])
+            self.assertNotIn('is_correct', payload)
+            self.assertNotIn('correct_answer_ids', payload)
+            self.assertNotIn('explanation', payload)
+            self.assertEqual([set(answer) for answer in payload['answers']], [{'id', 'answer_text'}] * 2)
+
+
+class FlaggedQuestionTestData:
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Category')
+        topic = Topic.objects.create(category=category, name='Topic')
+        subtopic = Subtopic.objects.create(topic=topic, name='Subtopic')
+        cls.questions = [Question.objects.create(subtopic=subtopic, question_text=f'Question {i}', explanation='-',
+                                                 status='LIVE') for i in range(3)]
+        cls.user = User.objects.create_user('student', 'student@example.com', 'password12345')
+
+    def setUp(self):
+        cache.clear()
+
+
+class FlaggedQuestionTests(FlaggedQuestionTestData, TestCase):
+    def test_toggles_write_through_without_redis(self):
+        first, second = (question.id for question in self.questions[:2])
+        self.assertTrue(toggle_flag(self.user.id, first))
+        self.assertTrue(toggle_flag(self.user.id, second))
+        self.assertFalse(toggle_flag(self.user.id, first))
+        self.assertEqual(get_flagged_ids(self.user.id), {second})
+        self.assertEqual(set(FlaggedQuestion.objects.filter(user=self.user).values_list('question_id', flat=True)), {second})
+        self.assertEqual(flush_dirty_flags(), 0)
+        # A question deleted since the quiz started can't be flagged
+        self.assertFalse(toggle_flag(self.user.id, 999999))
+
+    def test_flagged_quiz_is_capped(self):
+        for question in self.questions:
+            toggle_flag(self.user.id, question.id)
+        self.client.force_login(self.user)
+        with mock.patch('quiz.views.MAX_QUESTIONS_PER_QUIZ', 2):
+            response = self.client.get(reverse('start_flagged_quiz'), follow=True)
+        self.assertContains(response, 'limited to the maximum of 2 questions')
+        meta = get_attempt_meta(self.client.session[ATTEMPT_SESSION_KEY], self.user.id)
+        self.assertEqual(meta['total_questions'], 2)
+        self.assertLess(set(meta['question_ids']), {question.id for question in self.questions})
+
+
+@override_settings(REDIS_URL='redis://flags-tests')
+class FlaggedQuestionRedisTests(FlaggedQuestionTestData, TestCase):
+    def setUp(self):
+        super().setUp()
+        redis_store._redis_client = fakeredis.FakeRedis()
+        redis_store._redis_client.flushall()
+
+    def tearDown(self):
+        redis_store._redis_client = None
+
+    def flagged_in_db(self):
+        return set(FlaggedQuestion.objects.filter(user=self.user).values_list('question_id', flat=True))
+
+    def test_toggles_are_persisted_by_the_flush(self):
+        first, second = (question.id for question in self.questions[:2])
+        FlaggedQuestion.objects.create(user=self.user, question_id=first)
+        self.assertFalse(toggle_flag(self.user.id, first))
+        self.assertTrue(toggle_flag(self.user.id, second))
+        self.assertEqual(get_flagged_ids(self.user.id), {second})
+        self.assertEqual(self.flagged_in_db(), {first})
+
+        call_command('flush_flagged_questions', stdout=StringIO())
+        self.assertEqual(self.flagged_in_db(), {second})
+        self.assertEqual(flush_dirty_flags(), 0)
+
+    def test_interrupted_flush_is_retried(self):
+        first = self.questions[0].id
+        toggle_flag(self.user.id, first)
+        with mock.patch('quiz.flags.FlaggedQuestion.objects.bulk_create', side_effect=DatabaseError('connection lost')):
+            self.assertEqual(flush_user_flags(self.user.id), 0)
+        self.assertEqual(self.flagged_in_db(), set())
+
+        # A toggle made before the retry is merged into the batch left behind
+        second = self.questions[1].id
+        toggle_flag(self.user.id, second)
+        self.assertEqual(flush_dirty_flags(), 1)
+        self.assertEqual(self.flagged_in_db(), {first, second})
+
+    def test_toggle_after_expiry_keeps_the_other_flags(self):
+        first, second = (question.id for question in self.questions[:2])
+        FlaggedQuestion.objects.create(user=self.user, question_id=first)
+        get_flagged_ids(self.user.id)
+        redis_store._redis_client.delete(redis_key(f'quiz:flags:{self.user.id}'))
+        # The toggle reloads the expired set instead of recreating it with only this flag
+        self.assertTrue(toggle_flag(self.user.id, second))
+        self.assertEqual(get_flagged_ids(self.user.id), {first, second})
+
+    def test_repeated_toggles_alternate(self):
+        question_id = self.questions[0].id
+        self.assertEqual([toggle_flag(self.user.id, question_id) for _ in range(4)], [True, False, True, False])
+        self.assertEqual(get_flagged_ids(self.user.id), set())
+        flush_dirty_flags()
+        self.assertFalse(FlaggedQuestion.objects.exists())
+
+    def test_evicted_flag_set_is_rebuilt_from_the_database_and_journal(self):
+        first, second, third = (question.id for question in self.questions)
+        FlaggedQuestion.objects.bulk_create([FlaggedQuestion(user=self.user, question_id=q_id) for q_id in (first, second)])
+        toggle_flag(self.user.id, second)
+        toggle_flag(self.user.id, third)
+        redis_store._redis_client.delete(redis_key(f'quiz:flags:{self.user.id}'))
+        self.assertEqual(get_flagged_ids(self.user.id), {first, third})
+
+
+@override_settings(REDIS_URL='redis://answer-queue-tests', ANSWER_QUEUE_WORKER=False)
+class AnswerStreamTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Category')
+        topic = Topic.objects.create(category=category, name='Topic')
+        subtopic = Subtopic.objects.create(topic=topic, name='Subtopic')
+        cls.questions = [Question.objects.create(subtopic=subtopic, question_text=f'Question {i}', explanation='-',
+                                                 status='LIVE') for i in range(3)]
+        cls.users = [User.objects.create_user(f'student{i}', f'student{i}@example.com', 'password12345') for i in range(2)]
+
+    def setUp(self):
+        cache.clear()
+        forget_record_versions()
+        redis_store._redis_client = fakeredis.FakeRedis()
+        redis_store._redis_client.flushall()
+
+    def tearDown(self):
+        redis_store._redis_client = None
+
+    def test_inline_write_only_takes_the_callers_entry(self):
+        first, second = self.users
+        with override_settings(ANSWER_QUEUE_WORKER=True):
+            enqueue_results(first.id, [(self.questions[0].id, True, None)], attempt_id=str(uuid.uuid4()))
+        enqueue_results(second.id, [(question.id, False, None) for question in self.questions], attempt_id=str(uuid.uuid4()))
+
+        self.assertEqual(UserAnswer.objects.filter(user=second).count(), 3)
+        self.assertEqual(get_pending_results(second.id), [])
+        # The other user's entry is still queued for the drain
+        self.assertFalse(UserAnswer.objects.filter(user=first).exists())
+        self.assertEqual(get_pending_results(first.id), [(self.questions[0].id, True)])
+        self.assertEqual(drain_answer_queue(), 1)
+        self.assertEqual(UserAnswer.objects.filter(user=first).count(), 1)
+        self.assertEqual(AnswerEvent.objects.count(), 4)
+
+
+class RescoreAnswersTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Category')
+        topic = Topic.objects.create(category=category, name='Topic')
+        cls.subtopic = Subtopic.objects.create(topic=topic, name='Subtopic')
+        cls.question = Question.objects.create(subtopic=cls.subtopic, question_text='Question', explanation='-', status='LIVE')
+        cls.first = Answer.objects.create(question=cls.question, answer_text='First', is_correct=True)
+        cls.second = Answer.objects.create(question=cls.question, answer_text='Second', is_correct=False)
+        # Three users chose the first answer and two the second
+        cls.users = [User.objects.create_user(f'student{i}', f'student{i}@example.com', 'password12345') for i in range(5)]
+        UserAnswer.objects.bulk_create([
+            UserAnswer(user=user, question=cls.question, answer_id=(cls.first if i < 3 else cls.second).id, is_correct=i < 3)
+            for i, user in enumerate(cls.users)
+        ])
+        for user in cls.users:
+            rebuild_user_stats(user.id)
+
+    def setUp(self):
+        cache.clear()
+        forget_record_versions()
+
+    def correct_key(self):
+        """Makes the second answer the correct one, as an editor would in the admin."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.first.is_correct = False
+            self.first.save()
+            self.second.is_correct = True
+            self.second.save()
+
+    def correct_users(self):
+        return set(UserAnswer.objects.filter(is_correct=True).values_list('user__username', flat=True))
+
+    def correct_rollups(self):
+        return dict(UserSubtopicStats.objects.values_list('user__username', 'correct'))
+
+    def test_answer_key_change_is_queued_and_rescored(self):
+        self.correct_key()
+        self.assertEqual(list(QuestionRescore.objects.values_list('question_id', flat=True)), [self.question.id])
+
+        out = StringIO()
+        call_command('rescore_answers', chunk_size=2, stdout=out)
+        self.assertIn('Rescored 1 questions; 5 answers changed correctness.', out.getvalue())
+        self.assertEqual(self.correct_users(), {'student3', 'student4'})
+        self.assertEqual(self.correct_rollups(), {'student0': 0, 'student1': 0, 'student2': 0, 'student3': 1, 'student4': 1})
+        self.assertFalse(QuestionRescore.objects.exists())
+
+    def test_interrupted_rescore_resumes_from_its_cursor(self):
+        self.correct_key()
+        real_chunk = rescoring._rescore_chunk
+        calls = []
+
+        def chunk_then_fail(*args):
+            # The worker dies after committing the first chunk
+            calls.append(args)
+            if len(calls) > 1:
+                raise DatabaseError('connection lost')
+            return real_chunk(*args)
+
+        with mock.patch('quiz.rescoring._rescore_chunk', side_effect=chunk_then_fail):
+            with self.assertRaises(DatabaseError):
+                rescore_pending(chunk_size=2)
+        job = QuestionRescore.objects.get()
+        first_chunk = list(UserAnswer.objects.order_by('id').values_list('id', flat=True)[:2])
+        self.assertEqual(job.last_user_answer_id, first_chunk[-1])
+        self.assertEqual(self.correct_users(), {'student2'})
+
+        with mock.patch('quiz.rescoring._rescore_chunk', wraps=real_chunk) as chunk:
+            self.assertEqual(rescore_pending(chunk_size=2), (1, 3))
+        self.assertEqual(chunk.call_args_list[0].args[2], first_chunk[-1])
+        self.assertEqual(self.correct_users(), {'student3', 'student4'})
+        self.assertEqual(self.correct_rollups(), {'student0': 0, 'student1': 0, 'student2': 0, 'student3': 1, 'student4': 1})
+
+    def test_rescoring_is_idempotent(self):
+        self.correct_key()
+        self.assertEqual(rescore_pending(), (1, 5))
+        queue_rescore(self.question.id)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(rescore_pending(), (1, 0))
+        writes = [query['sql'] for query in queries if query['sql'].startswith(('UPDATE', 'INSERT'))]
+        self.assertFalse([sql for sql in writes if 'quiz_useranswer' in sql or 'stats' in sql])
+        self.assertEqual(self.correct_users(), {'student3', 'student4'})
+        self.assertEqual(self.correct_rollups(), {'student0': 0, 'student1': 0, 'student2': 0, 'student3': 1, 'student4': 1})
+
+
+class TaxonomyCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Category')
+        cls.topic = Topic.objects.create(category=category, name='Topic')
+        subtopic = Subtopic.objects.create(topic=cls.topic, name='Subtopic')
+        Question.objects.create(subtopic=subtopic, question_text='Question', explanation='Explanation', status='LIVE')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_warm_taxonomy_costs_no_queries(self):
+        get_taxonomy_snapshot()
+        with self.assertNumQueries(0):
+            snapshot = get_taxonomy_snapshot()
+        self.assertEqual(snapshot['categories'][0]['live_count'], 1)
+
+    def test_question_save_invalidates_the_taxonomy(self):
+        get_taxonomy_snapshot()
+        subtopic = Subtopic.objects.create(topic=self.topic, name='New subtopic')
+        with self.captureOnCommitCallbacks(execute=True):
+            Question.objects.create(subtopic=subtopic, question_text='New', explanation='Explanation', status='LIVE')
+        snapshot = get_taxonomy_snapshot()
+        self.assertIn(subtopic.id, snapshot['subtopics'])
+        self.assertEqual(snapshot['categories'][0]['live_count'], 2)
+
+    def test_bump_from_another_process_is_seen_within_the_check_interval(self):
+        version = bump_bank_version()
+        # What the admin in another worker (or import_questions) does; this process's memo is untouched
+        CacheVersion.objects.filter(name=BANK_VERSION_NAME).update(version=version + 1)
+        self.assertEqual(get_bank_version(), version)
+        with mock.patch('quiz.taxonomy.time.monotonic', return_value=time.monotonic() + BANK_VERSION_CHECK_INTERVAL):
+            self.assertEqual(get_bank_version(), version + 1)
+
+
+class QuestionBundleTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Category')
+        topic = Topic.objects.create(category=category, name='Topic')
+        subtopic = Subtopic.objects.create(topic=topic, name='Subtopic')
+        cls.question = Question.objects.create(subtopic=subtopic, question_text='Question', explanation='Explanation', status='LIVE')
+        cls.right = Answer.objects.create(question=cls.question, answer_text='Right', is_correct=True)
+        cls.wrong = Answer.objects.create(question=cls.question, answer_text='Wrong', is_correct=False)
+
+    def setUp(self):
+        cache.clear()
+        forget_record_versions()
+
+    def test_answer_hot_path_is_cache_only(self):
+        get_answer_keys([self.question.id])
+        get_question_bundle(self.question.id)
+        with self.assertNumQueries(0):
+            answer_key = get_answer_key(self.question.id)
+            bundle = get_question_bundle(self.question.id)
+        self.assertEqual(answer_key, {self.right.id: True, self.wrong.id: False})
+        self.assertEqual([answer['answer_text'] for answer in bundle['answers']], ['Right', 'Wrong'])
+
+    def test_answer_save_invalidates_the_bundle_and_answer_key(self):
+        get_answer_key(self.question.id)
+        get_question_bundle(self.question.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.wrong.is_correct = True
+            self.wrong.answer_text = 'Also right'
+            self.wrong.save()
+        self.assertEqual(get_answer_key(self.question.id), {self.right.id: True, self.wrong.id: True})
+        self.assertEqual(get_question_bundle(self.question.id)['answers'][1]['answer_text'], 'Also right')
+
+    def test_question_save_invalidates_the_bundle(self):
+        get_question_bundle(self.question.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.question.explanation = 'Revised'
+            self.question.save()
+        self.assertEqual(get_question_bundle(self.question.id)['explanation'], 'Revised')
+
+    def test_question_edit_keeps_other_cached_bundles(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            other = Question.objects.create(subtopic=self.question.subtopic, question_text='Other', explanation='-', status='LIVE')
+        get_question_bundle(other.id)
+        version = get_bank_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.question.explanation = 'Revised'
+            self.question.save()
+        self.assertEqual(get_bank_version(), version)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_question_bundle(other.id)['question_text'], 'Other')
+
+    def test_unpublishing_bumps_the_bank_version(self):
+        version = get_bank_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.question.status = 'DRAFT'
+            self.question.save()
+        self.assertGreater(get_bank_version(), version)
+
+    def test_edit_from_another_process_is_seen_within_the_check_interval(self):
+        bump_content_versions([self.question.id])
+        now = time.monotonic() + VERSION_CHECK_INTERVAL
+        with mock.patch('quiz.versions.time.monotonic', return_value=now):
+            get_answer_key(self.question.id)
+        # What the admin in another worker does; this process's memo is untouched
+        Answer.objects.filter(pk=self.wrong.pk).update(is_correct=True)
+        sequence = CacheVersion.objects.get(name=VERSION_SEQUENCE_NAME).version + 1
+        CacheVersion.objects.filter(name__in=[VERSION_SEQUENCE_NAME, f'question:{self.question.id}']).update(version=sequence)
+        with mock.patch('quiz.versions.time.monotonic', return_value=now + 1):
+            self.assertEqual(get_answer_key(self.question.id), {self.right.id: True, self.wrong.id: False})
+        with mock.patch('quiz.versions.time.monotonic', return_value=now + VERSION_CHECK_INTERVAL):
+            self.assertEqual(get_answer_key(self.question.id), {self.right.id: True, self.wrong.id: True})
+
+    def test_import_invalidates_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            other = Question.objects.create(subtopic=self.question.subtopic, question_text='Other', explanation='-', status='LIVE')
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as csv_file:
+            csv_file.write('subtopic_name,question_text,explanation,answer_1,is_correct_1\n')
+            for question in (self.question, other):
+                csv_file.write(f'Subtopic,{question.question_text},Revised,Only,TRUE\n')
+        self.addCleanup(os.remove, csv_file.name)
+        with mock.patch('quiz.signals.bump_content_versions') as bump_content, \
+             mock.patch('quiz.signals.bump_bank_version') as bump_bank, \
+             self.captureOnCommitCallbacks(execute=True):
+            call_command('import_questions', csv_file.name, stdout=StringIO())
+        bump_content.assert_called_once_with({self.question.id, other.id})
+        bump_bank.assert_not_called()
+
+
+class QuestionSamplingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Category')
+        topic = Topic.objects.create(category=category, name='Topic')
+        cls.subtopic_ids = []
+        for st in range(3):
+            subtopic = Subtopic.objects.create(topic=topic, name=f'Subtopic {st}')
+            cls.subtopic_ids.append(subtopic.id)
+            Question.objects.bulk_create([
+                Question(subtopic=subtopic, question_text=f'Question {i}', explanation='Explanation', status='LIVE' if i < 40 else 'DRAFT')
+                for i in range(45)
+            ])
+        cls.live_ids = set(Question.objects.filter(status='LIVE').values_list('id', flat=True))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_samples_are_distinct_live_questions(self):
+        question_ids = sample_question_ids(self.subtopic_ids, 100)
+        self.assertEqual(len(set(question_ids)), 100)
+        self.assertLessEqual(set(question_ids), self.live_ids)
+        # Asking for more than the pools hold returns every live question once
+        self.assertEqual(sorted(sample_question_ids(self.subtopic_ids, 500)), sorted(self.live_ids))
+
+    def test_pools_are_cached(self):
+        get_subtopic_pools(self.subtopic_ids)
+        with self.assertNumQueries(0):
+            pools = get_subtopic_pools(self.subtopic_ids)
+        self.assertEqual(sum(len(pool) for pool in pools.values()), 120)
+
+    def test_seeded_sample_is_deterministic(self):
+        first = sample_question_ids(self.subtopic_ids, 30, rng=random.Random(42))
+        # The subtopic order doesn't change the virtual sequence
+        second = sample_question_ids(list(reversed(self.subtopic_ids)), 30, rng=random.Random(42))
+        self.assertEqual(first, second)
+        accept = lambda q_id: q_id % 2 == 0
+        self.assertEqual(sample_question_ids(self.subtopic_ids, 30, accept=accept, rng=random.Random(7)),
+                         sample_question_ids(self.subtopic_ids, 30, accept=accept, rng=random.Random(7)))
+
+    def test_reservoir_fallback_when_few_questions_pass(self):
+        eligible = set(sorted(self.live_ids)[::40])  # One question per subtopic
+        # Too few draws to find them all by rejection sampling: the reservoir pass returns every one
+        question_ids = sample_question_ids(self.subtopic_ids, 10, accept=eligible.__contains__, rng=random.Random(1))
+        self.assertEqual(sorted(question_ids), sorted(eligible))
+        question_ids = sample_question_ids(self.subtopic_ids, 2, accept=eligible.__contains__, rng=random.Random(1))
+        self.assertEqual(len(set(question_ids)), 2)
+        self.assertLessEqual(set(question_ids), eligible)
+
+
+class UserBitsetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Category')
+        topic = Topic.objects.create(category=category, name='Topic')
+        cls.subtopic = Subtopic.objects.create(topic=topic, name='Subtopic')
+        questions = [Question.objects.create(subtopic=cls.subtopic, question_text=f'Question {i}', explanation='-',
+                                             status='LIVE' if i < 10 else 'DRAFT') for i in range(12)]
+        cls.live_ids = [question.id for question in questions[:10]]
+        cls.correct_ids = cls.live_ids[:4]
+        cls.incorrect_ids = cls.live_ids[4:6]
+        cls.unanswered_ids = cls.live_ids[6:]
+        cls.user = User.objects.create_user('student', 'student@example.com', 'password12345')
+        UserAnswer.objects.bulk_create(
+            [UserAnswer(user=cls.user, question_id=q_id, is_correct=True) for q_id in cls.correct_ids]
+            + [UserAnswer(user=cls.user, question_id=q_id, is_correct=False) for q_id in cls.incorrect_ids]
+            # An answered question that is no longer live never matches a filter
+            + [UserAnswer(user=cls.user, question=questions[10], is_correct=False)]
+        )
+
+    def setUp(self):
+        cache.clear()
+        forget_record_versions()
+
+    def test_bitset_helpers_round_trip(self):
+        question_ids = [1, 7, 8, 64, 1000]
+        bits = ids_to_bits(question_ids)
+        self.assertEqual(list(iter_bits(bits)), question_ids)
+        self.assertEqual(bits.bit_count(), 5)
+        contains = bit_predicate(bits)
+        self.assertEqual([q_id for q_id in range(1100) if contains(q_id)], question_ids)
+        self.assertEqual(ids_to_bits([]), 0)
+
+    def test_filter_algebra(self):
+        live = get_live_bitset([self.subtopic.id])
+        answered, correct = get_user_bitsets(self.user.id)
+        expected = {
+            'all': self.live_ids,
+            'unanswered': self.unanswered_ids,
+            'correct': self.correct_ids,
+            'incorrect': self.incorrect_ids,
+        }
+        for question_filter, question_ids in expected.items():
+            with self.subTest(question_filter=question_filter):
+                self.assertEqual(list(iter_bits(filter_candidates(live, answered, correct, question_filter))), question_ids)
+
+    def test_filtered_sampling_only_draws_matching_questions(self):
+        for question_filter, question_ids in (('unanswered', self.unanswered_ids), ('incorrect', self.incorrect_ids)):
+            with self.subTest(question_filter=question_filter):
+                sampled = sample_filtered_question_ids(self.user.id, [self.subtopic.id], question_filter, 10)
+                self.assertEqual(sorted(sampled), question_ids)
+
+    def test_history_written_by_another_process_is_seen_within_the_check_interval(self):
+        now = time.monotonic() + VERSION_CHECK_INTERVAL
+        with mock.patch('quiz.versions.time.monotonic', return_value=now):
+            answered, _ = get_user_bitsets(self.user.id)
+        # What the drain worker or `manage.py rescore_answers` does, with its own memo and LocMemCache
+        with mock.patch.dict('quiz.versions._versions'), \
+             override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'worker'}}):
+            UserAnswer.objects.create(user=self.user, question_id=self.unanswered_ids[0], is_correct=True)
+            record_user_answers(self.user.id, [(self.unanswered_ids[0], True)])
+        with mock.patch('quiz.versions.time.monotonic', return_value=now + 1):
+            self.assertEqual(get_user_bitsets(self.user.id)[0], answered)
+        with mock.patch('quiz.versions.time.monotonic', return_value=now + VERSION_CHECK_INTERVAL):
+            self.assertEqual(get_user_bitsets(self.user.id)[0].bit_count(), answered.bit_count() + 1)
+
+    def test_recorded_answers_update_the_cached_bitsets(self):
+        get_user_bitsets(self.user.id)
+        record_user_answers(self.user.id, [(self.unanswered_ids[0], True), (self.correct_ids[0], False)])
+        with self.assertNumQueries(0):
+            answered, correct = get_user_bitsets(self.user.id)
+        self.assertEqual(answered.bit_count(), 8)
+        self.assertEqual(list(iter_bits(correct)), self.correct_ids[1:] + [self.unanswered_ids[0]])
+
+
+class MatchingQuestionsCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Category')
+        topic = Topic.objects.create(category=category, name='Topic')
+        cls.subtopics = [Subtopic.objects.create(topic=topic, name=f'Subtopic {i}') for i in range(2)]
+        questions = [Question.objects.create(subtopic=cls.subtopics[i % 2], question_text=f'Question {i}', explanation='-',
+                                             status='LIVE') for i in range(10)]
+        Question.objects.create(subtopic=cls.subtopics[0], question_text='Draft', explanation='-', status='DRAFT')
+        cls.user = User.objects.create_user('student', 'student@example.com', 'password12345')
+        # Subtopic 0 holds the even questions: 0 and 2 correct, 4 incorrect; subtopic 1 has 1 correct
+        UserAnswer.objects.bulk_create([
+            UserAnswer(user=cls.user, question=questions[0], is_correct=True),
+            UserAnswer(user=cls.user, question=questions[2], is_correct=True),
+            UserAnswer(user=cls.user, question=questions[4], is_correct=False),
+            UserAnswer(user=cls.user, question=questions[1], is_correct=True),
+        ])
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def get_count(self, subtopics, question_filter):
+        response = self.client.get(reverse('matching_questions_count'),
+                                   {'subtopics': subtopics, 'question_filter': question_filter})
+        self.assertEqual(response.status_code, 200)
+        return response.json()['count']
+
+    def test_counts_match_each_filter(self):
+        first, second = (subtopic.id for subtopic in self.subtopics)
+        expected = [
+            ([first], 'all', 5), ([first], 'unanswered', 2), ([first], 'correct', 2), ([first], 'incorrect', 1),
+            ([first, second], 'all', 10), ([first, second], 'unanswered', 6), ([first, second], 'correct', 3),
+            ([second, 999999], 'all', 5), ([], 'all', 0),
+        ]
+        for subtopics, question_filter, count in expected:
+            with self.subTest(subtopics=subtopics, question_filter=question_filter):
+                self.assertEqual(self.get_count(subtopics, question_filter), count)
+
+    def test_warm_counts_do_not_query_the_question_bank(self):
+        subtopics = [subtopic.id for subtopic in self.subtopics]
+        self.get_count(subtopics, 'incorrect')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.get_count(subtopics, 'incorrect'), 1)
+        self.assertFalse([query['sql'] for query in queries if 'quiz_' in query['sql']])
+
+    def test_invalid_subtopics_are_rejected(self):
+        response = self.client.get(reverse('matching_questions_count'), {'subtopics': ['abc']})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['status'], 'error')
+
+
+class ExamBlueprintTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.categories, cls.topics = [], []
+        for c in range(2):
+            category = Category.objects.create(name=f'Category {c}')
+            cls.categories.append(category)
+            for t in range(2):
+                topic = Topic.objects.create(category=category, name=f'Topic {c}.{t}')
+                cls.topics.append(topic)
+                for st in range(3):
+                    subtopic = Subtopic.objects.create(topic=topic, name=f'Subtopic {c}.{t}.{st}')
+                    Question.objects.bulk_create([
+                        Question(subtopic=subtopic, question_text=f'Question {i}', explanation='Explanation', status='LIVE')
+                        for i in range(5)
+                    ])
+
+    def setUp(self):
+        cache.clear()
+
+    def blueprint(self, total, strata, min_per_subtopic=0):
+        blueprint = ExamBlueprint.objects.create(name=f'Blueprint {ExamBlueprint.objects.count()}', total_questions=total,
+                                                 min_per_subtopic=min_per_subtopic)
+        for stratum in strata:
+            BlueprintStratum.objects.create(blueprint=blueprint, percentage=30, **stratum)
+        return ExamBlueprint.objects.prefetch_related('strata').get(pk=blueprint.pk)
+
+    def test_quotas_sum_to_the_total(self):
+        for percentages, total in [([30, 70], 100), ([1, 1, 1], 100), ([33.33, 33.33, 33.34], 7), ([5, 5], 1)]:
+            quotas = allocate_quotas(percentages, total)
+            self.assertEqual(sum(quotas), total)
+            self.assertTrue(all(quota >= 0 for quota in quotas))
+
+    def test_minimums_never_push_the_paper_past_the_total(self):
+        # 12 covered subtopics x 3 minimum = 36 questions, for a 10-question paper
+        blueprint = self.blueprint(10, [{'category': category} for category in self.categories], min_per_subtopic=3)
+        question_ids = generate_exam_question_ids(blueprint, 500)
+        self.assertEqual(len(question_ids), 10)
+        self.assertEqual(len(set(question_ids)), 10)
+        per_category = {category.id: 0 for category in self.categories}
+        for category_id in Question.objects.filter(id__in=question_ids).values_list('subtopic__topic__category_id', flat=True):
+            per_category[category_id] += 1
+        self.assertEqual(list(per_category.values()), [5, 5])
+
+    def test_query_count_is_flat_as_strata_grow(self):
+        counts = []
+        for strata in ([{'topic': self.topics[0]}], [{'topic': topic} for topic in self.topics]):
+            blueprint = self.blueprint(20, strata, min_per_subtopic=1)
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                question_ids = generate_exam_question_ids(blueprint, 500)
+            counts.append(len(queries))
+            self.assertEqual(len(question_ids), min(20, 15 * len(strata)))
+        self.assertEqual(counts[0], counts[1])
+
+
+class QuizQuestionListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Category')
+        topic = Topic.objects.create(category=category, name='Topic')
+        cls.subtopic = Subtopic.objects.create(topic=topic, name='Subtopic')
+        Question.objects.bulk_create([
+            Question(subtopic=cls.subtopic, question_text=f'Question {i}', explanation='Explanation', status='LIVE')
+            for i in range(30)
+        ])
+        cls.user = User.objects.create_user('student', 'student@example.com', 'password12345')
+        Profile.objects.filter(user=cls.user).update(membership='Monthly', membership_expiry_date=timezone.localdate() + timedelta(days=30))
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_attempt_keeps_its_question_list(self):
+        self.client.post(reverse('quiz_setup'), {
+            'subtopics': [self.subtopic.id], 'question_filter': 'unanswered',
+            'question_count_type': 'custom', 'question_count_custom': 10,
+        })
+        attempt_id = self.client.session[ATTEMPT_SESSION_KEY]
+        meta = get_attempt_meta(attempt_id, self.user.id)
+        question_ids = meta['question_ids']
+        self.assertEqual(len(set(question_ids)), 10)
+
+        for q_id in question_ids:
+            save_attempt_answer(attempt_id, q_id, {'answer_id': None, 'is_correct': True, 'is_submitted': True})
+        self.client.get(reverse('quiz_results'))
+        # Re-sampling the "unanswered" filter now would exclude every question just answered, even
+        # with cold caches; the review still shows the quiz that was taken
+        version = get_bank_version()
+        cache.delete_many([f'quiz:pool:{version}:{self.subtopic.id}', f'quiz:live_bits:{version}:{self.subtopic.id}',
+                           f'quiz:user_bits:{self.user.id}:{get_user_generation(self.user.id)}'])
+        response = self.client.get(reverse('quiz_review'))
+        self.assertEqual([item['question']['id'] for item in response.context['review_items']], question_ids)
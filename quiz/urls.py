@@ -8,6 +8,7 @@ urlpatterns = [
     path('', views.landing_page, name='home'),
     path('contact/', views.contact_page, name='contact'),
     path('quiz/setup/', views.quiz_setup, name='quiz_setup'),
+    path('quiz/setup/count/', views.matching_questions_count, name='matching_questions_count'),
     path('dashboard/', views.dashboard, name='dashboard'),
     path('membership/', views.membership_page, name='membership_page'),
 
@@ -20,8 +21,13 @@ urlpatterns = [
     # Quiz Player flow
     path('quiz/start/', views.start_quiz, name='start_quiz'),
     path('quiz/play/<int:question_index>/', views.quiz_player, name='quiz_player'),
+    path('quiz/api/questions/', views.quiz_api_questions, name='quiz_api_questions'),
+    path('quiz/api/answer/', views.quiz_api_answer, name='quiz_api_answer'),
+    path('quiz/api/flag/', views.quiz_api_flag, name='quiz_api_flag'),
+    path('quiz/api/navigate/', views.quiz_api_navigate, name='quiz_api_navigate'),
     path('quiz/report-question/', views.report_question, name='report_question'),
     path('quiz/results/', views.quiz_results, name='quiz_results'),
+    path('quiz/results/review/', views.quiz_review, name='quiz_review'),
 
     # Stripe checkout flow
     path('create-checkout-session/', views.create_checkout_session, name='create_checkout_session'),
@@ -33,4 +39,5 @@ urlpatterns = [
     path('dashboard/reset/', views.reset_performance, name='reset_performance'),
     path('quiz/start/incorrect/', views.start_incorrect_quiz, name='start_incorrect_quiz'),
     path('quiz/start/flagged/', views.start_flagged_quiz, name='start_flagged_quiz'),
+    path('quiz/start/exam/<int:blueprint_id>/', views.start_mock_exam, name='start_mock_exam'),
 ]
\ No newline at end of file
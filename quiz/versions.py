@@ -0,0 +1,101 @@
+# quiz/versions.py
+
+import time
+import logging
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.db.utils import DatabaseError
+
+from .models import CacheVersion
+
+logger = logging.getLogger(__name__)
+
+# Per-record versions (one question's content, one user's answer history or dashboard) embedded in
+# cache keys. Like the question bank version (quiz/taxonomy.py) they are CacheVersion rows, so a bump
+# in one process (the admin, a management command, a drain worker) reaches every worker's LocMemCache.
+#
+# A bump stamps the named rows with the next value of one shared sequence. Each process remembers
+# the versions it has read and, at most every VERSION_CHECK_INTERVAL seconds, re-reads the sequence;
+# when it has moved, a single query fetches the rows stamped since, so warm reads cost no queries
+# however many records are tracked. A name read for the first time costs one query per batch.
+VERSION_SEQUENCE_NAME = 'record_versions'
+VERSION_CHECK_INTERVAL = 5  # seconds
+
+# {name: version} read or bumped by this process, and (sequence, time.monotonic()) of the last check
+_versions = {}
+_sequence_checked = None
+
+
+def _read_sequence():
+    sequence = CacheVersion.objects.filter(name=VERSION_SEQUENCE_NAME).values_list('version', flat=True).first()
+    if sequence is None:
+        # Seed with a timestamp so a recreated sequence never stamps below an existing version
+        try:
+            with transaction.atomic():
+                sequence = CacheVersion.objects.create(name=VERSION_SEQUENCE_NAME, version=time.time_ns()).version
+        except IntegrityError:
+            # Another process created it first
+            sequence = CacheVersion.objects.get(name=VERSION_SEQUENCE_NAME).version
+    return sequence
+
+
+def _sync_versions():
+    """Applies the bumps made by other processes since the last check, if the interval has passed."""
+    global _sequence_checked
+    checked = _sequence_checked
+    now = time.monotonic()
+    if checked is not None and now - checked[1] < VERSION_CHECK_INTERVAL:
+        return
+    sequence = _read_sequence()
+    if checked is not None and sequence != checked[0]:
+        for name, version in CacheVersion.objects.filter(version__gt=checked[0]).values_list('name', 'version'):
+            if name in _versions:
+                _versions[name] = version
+    _sequence_checked = (sequence, now)
+
+
+def get_versions(names):
+    """Returns {name: version} for the given names (0 for a name never bumped)."""
+    try:
+        _sync_versions()
+        missing = [name for name in names if name not in _versions]
+        if missing:
+            found = dict(CacheVersion.objects.filter(name__in=missing).values_list('name', 'version'))
+            for name in missing:
+                _versions[name] = found.get(name, 0)
+    except DatabaseError:
+        # Table missing (maintains resilience during deployment): serve what this process last read
+        logger.warning("DatabaseError reading record versions. CacheVersion table likely missing.")
+    return {name: _versions.get(name, 0) for name in names}
+
+
+def get_version(name):
+    return get_versions([name])[name]
+
+
+def bump_versions(names):
+    """Invalidates every cache entry keyed by the named versions, in every process.
+
+    Returns {name: version before the bump}, so a caller that read a version can tell whether
+    another process bumped it in between.
+    """
+    names = list(dict.fromkeys(names))
+    if not names:
+        return {}
+    with transaction.atomic():
+        # The sequence row stays locked until commit, so bumps are serialized and become visible in
+        # sequence order. It follows the clock, so a value handed out by a bump that is rolled back
+        # (but already remembered by its process) is never reused.
+        next_version = Greatest(F('version') + 1, Value(time.time_ns()))
+        if not CacheVersion.objects.filter(name=VERSION_SEQUENCE_NAME).update(version=next_version):
+            _read_sequence()
+        sequence = CacheVersion.objects.get(name=VERSION_SEQUENCE_NAME).version
+        previous = dict(CacheVersion.objects.filter(name__in=names).values_list('name', 'version'))
+        CacheVersion.objects.bulk_create([CacheVersion(name=name, version=sequence) for name in names],
+                                         update_conflicts=True, unique_fields=['name'], update_fields=['version'])
+    # This process sees its own bump immediately
+    for name in names:
+        _versions[name] = sequence
+    return {name: previous.get(name, 0) for name in names}
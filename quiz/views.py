@@ -18,21 +18,35 @@ from django.http import JsonResponse, Http404
 # Added csrf_protect for security
 from django.views.decorators.csrf import csrf_exempt, csrf_protect
 from django.contrib.auth.decorators import login_required
-# Added Prefetch to imports
-from django.db.models import Count, Q, Prefetch
-# Import DatabaseError
-from django.db.utils import DatabaseError
-from django.db.models.functions import TruncDate
+from django_ratelimit.decorators import ratelimit
+from django.db import transaction
 from django.contrib import messages
 from django.urls import reverse
 # Added PermissionDenied and cache imports for security
 from django.core.exceptions import PermissionDenied
 from django.views.decorators.cache import cache_page
 from django.core.cache import cache
+from django.core.paginator import Paginator
 
-# Added Topic and Subtopic to imports for optimization
-from .models import Category, Topic, Subtopic, Question, Answer, UserAnswer, FlaggedQuestion, QuestionReport
+from .models import Question, UserAnswer, QuestionReport, ExamBlueprint
 from .forms import ContactForm
+from .taxonomy import get_taxonomy_snapshot
+from .exam import generate_exam_question_ids, get_active_blueprints
+from .bundles import get_answer_key, get_answer_keys, get_bundle_answer, get_question_bundle, get_question_bundles
+from .attempts import (
+    ATTEMPT_SESSION_KEY, REVIEW_SESSION_KEY, clear_attempt_answers, create_attempt, delete_attempt, get_attempt_answer,
+    get_attempt_answers, get_attempt_meta, save_attempt_answer, update_attempt_meta,
+)
+from .bitsets import (
+    bit_predicate, count_matching_questions, get_live_bitset, get_user_bitsets, iter_bits, record_user_answers,
+    reset_user_bitsets, sample_filtered_question_ids,
+)
+from .flags import flush_user_flags, get_flagged_ids, reset_user_flags, toggle_flag
+from .ingest import enqueue_results
+from .dashboard import bump_dashboard_generation, get_dashboard_context
+from .question_stats import apply_question_changes
+from .answer_rate import record_answer
+from .stats import get_daily_stats, get_reset_day_stats, get_subtopic_stats, lock_users, reset_user_stats
 
 # Import Profile model for webhook processing
 try:
@@ -47,6 +61,13 @@ logger = logging.getLogger(__name__)
 
 MAX_QUESTIONS_PER_QUIZ = 500
 
+# Quiz player navigator state bits (one hex digit per question position)
+NAV_ANSWERED = 1
+NAV_SUBMITTED = 2
+NAV_CORRECT = 4
+NAV_FLAGGED = 8
+NAV_DIGITS = '0123456789abcdef'
+
 # --- Security Decorators ---
 
 def premium_required(view_func):
@@ -67,22 +88,35 @@ def premium_required(view_func):
         return view_func(request, *args, **kwargs)
     return wrapped_view
 
+def _quiz_rate_limited(user_id):
+    """Counts a quiz request and returns True once the user is over the limit"""
+    cache_key = f'quiz_rate_{user_id}'
+
+    # Check rate limit (max 100 questions per hour for security)
+    attempts = cache.get(cache_key, 0)
+    if attempts > 100:
+        return True
+
+    # Increment counter
+    cache.set(cache_key, attempts + 1, 3600)  # 1 hour expiry
+    return False
+
 def rate_limit_quiz(view_func):
     """Rate limit quiz attempts to prevent abuse"""
     @login_required
     def wrapped_view(request, *args, **kwargs):
-        user_id = request.user.id
-        cache_key = f'quiz_rate_{user_id}'
-        
-        # Check rate limit (max 100 questions per hour for security)
-        attempts = cache.get(cache_key, 0)
-        if attempts > 100:
+        if _quiz_rate_limited(request.user.id):
             messages.error(request, "You've exceeded the maximum quiz attempts. Please wait before trying again.")
             return redirect('dashboard')
-        
-        # Increment counter
-        cache.set(cache_key, attempts + 1, 3600)  # 1 hour expiry
-        
+        return view_func(request, *args, **kwargs)
+    return wrapped_view
+
+def rate_limit_quiz_api(view_func):
+    """JSON variant of rate_limit_quiz for the quiz player API (shares the same counter)"""
+    @login_required
+    def wrapped_view(request, *args, **kwargs):
+        if _quiz_rate_limited(request.user.id):
+            return JsonResponse({'status': 'error', 'message': "You've exceeded the maximum quiz attempts. Please wait before trying again."}, status=429)
         return view_func(request, *args, **kwargs)
     return wrapped_view
 
@@ -127,48 +161,48 @@ def membership_page(request):
 
 # --- Dashboard View ---
 
-@login_required
-def dashboard(request):
-    user_answers = UserAnswer.objects.filter(user=request.user)
-    total_answered = user_answers.count()
-    correct_answered = user_answers.filter(is_correct=True).count()
+def _build_dashboard_context(user_id):
+    # OPTIMIZATION: Read the per-user rollups (see quiz/stats.py) - one row per subtopic answered and
+    # per active day - instead of aggregating the user's whole UserAnswer/AnswerEvent history per view.
+    subtopic_performance = list(get_subtopic_stats(user_id))
+    total_answered = sum(item['answered'] for item in subtopic_performance)
+    correct_answered = sum(item['correct'] for item in subtopic_performance)
 
     if total_answered > 0:
         overall_percentage = (Decimal(correct_answered) / Decimal(total_answered)) * 100
     else:
         overall_percentage = Decimal(0)
 
-    thirty_days_ago = timezone.now() - timedelta(days=30)
-    daily_performance = (UserAnswer.objects.filter(user=request.user, timestamp__gte=thirty_days_ago)
-        .annotate(date=TruncDate('timestamp')).values('date')
-        .annotate(daily_total=Count('id'), daily_correct=Count('id', filter=Q(is_correct=True)))
-        .order_by('date'))
-
-    chart_labels = [d['date'].strftime('%b %d') for d in daily_performance]
+    # Activity counts every answer submitted (UserDailyStats is rolled up from the AnswerEvent log),
+    # starting from the user's last stats reset; the reset day itself only counts later answers
+    reset_at = Profile.objects.filter(user_id=user_id).values_list('stats_reset_at', flat=True).first() if Profile else None
+    reset_date = timezone.localtime(reset_at).date() if reset_at else None
+    daily_performance = list(get_daily_stats(user_id, days=30, after=reset_date))
+    if reset_date and reset_date >= timezone.localdate() - timedelta(days=30):
+        reset_day = get_reset_day_stats(user_id, reset_at)
+        if reset_day.answered:
+            daily_performance.insert(0, reset_day)
+
+    chart_labels = [d.date.strftime('%b %d') for d in daily_performance]
     chart_data = []
     for d in daily_performance:
-        if d['daily_total'] > 0:
-            perc = (Decimal(d['daily_correct']) / Decimal(d['daily_total'])) * 100
+        if d.answered > 0:
+            perc = (Decimal(d.correct) / Decimal(d.answered)) * 100
             chart_data.append(float(perc.quantize(Decimal('0.1'), rounding=ROUND_HALF_UP)))
         else:
             chart_data.append(0.0)
 
-    subtopic_performance = (UserAnswer.objects.filter(user=request.user)
-        .values('question__subtopic__topic__name', 'question__subtopic__name')
-        .annotate(total=Count('id'), correct=Count('id', filter=Q(is_correct=True)))
-        .order_by('question__subtopic__topic__name', 'question__subtopic__name'))
-
     topic_stats = {}
     for item in subtopic_performance:
-        topic_name = item['question__subtopic__topic__name']
+        topic_name = item['subtopic__topic__name']
         if topic_name not in topic_stats:
             topic_stats[topic_name] = {'total': 0, 'correct': 0, 'subtopics': []}
-        topic_stats[topic_name]['total'] += item['total']
+        topic_stats[topic_name]['total'] += item['answered']
         topic_stats[topic_name]['correct'] += item['correct']
-        sub_perc = (Decimal(item['correct']) / Decimal(item['total']) * 100) if item['total'] > 0 else Decimal(0)
+        sub_perc = (Decimal(item['correct']) / Decimal(item['answered']) * 100) if item['answered'] > 0 else Decimal(0)
         topic_stats[topic_name]['subtopics'].append({
-            'name': item['question__subtopic__name'],
-            'total': item['total'],
+            'name': item['subtopic__name'],
+            'total': item['answered'],
             'correct': item['correct'],
             'percentage': sub_perc.quantize(Decimal('0.1'), rounding=ROUND_HALF_UP)
         })
@@ -177,16 +211,23 @@ def dashboard(request):
         data['percentage'] = (Decimal(data['correct']) / Decimal(data['total']) * 100) if data['total'] > 0 else Decimal(0)
         data['percentage'] = data['percentage'].quantize(Decimal('0.1'), rounding=ROUND_HALF_UP)
 
-    context = {
+    return {
         'total_answered': total_answered,
         'correct_answered': correct_answered,
         'overall_percentage': overall_percentage.quantize(Decimal('0.1'), rounding=ROUND_HALF_UP),
         'topic_stats': topic_stats,
         'chart_labels': json.dumps(chart_labels),
         'chart_data': json.dumps(chart_data),
-        'incorrect_questions_count': user_answers.filter(is_correct=False).values('question_id').distinct().count(),
-        'flagged_questions_count': FlaggedQuestion.objects.filter(user=request.user).count(),
+        'incorrect_questions_count': total_answered - correct_answered,
     }
+
+
+@login_required
+def dashboard(request):
+    # OPTIMIZATION: Served from a per-user cache invalidated by anything that changes it (see quiz/dashboard.py).
+    # The flag count is read from the flag store per request, so a flag toggle needn't invalidate it.
+    context = get_dashboard_context(request.user.id, _build_dashboard_context)
+    context['flagged_questions_count'] = len(get_flagged_ids(request.user.id))
     return render(request, 'quiz/dashboard.html', context)
 
 
@@ -225,57 +266,38 @@ def quiz_setup(request):
         
         question_filter = request.POST.get('question_filter', 'all')
 
-        # Handle the case where the 'status' column might be missing during the POST request.
-        try:
-            # Attempt to filter by LIVE status
-            questions = Question.objects.filter(
-                subtopic__id__in=selected_subtopic_ids,
-                status='LIVE'
-            )
-        except DatabaseError:
-             # Fallback if 'status' column is missing: Assume all questions are LIVE.
-             logger.warning("DatabaseError in quiz_setup (POST). 'status' column likely missing. Assuming all questions are LIVE.")
-             questions = Question.objects.filter(
-                subtopic__id__in=selected_subtopic_ids
-            )
-        
-        if question_filter == 'unanswered':
-            answered_question_ids = UserAnswer.objects.filter(user=request.user).values_list('question_id', flat=True)
-            questions = questions.exclude(id__in=answered_question_ids)
-        elif question_filter == 'correct':
-            questions = questions.filter(id__in=UserAnswer.objects.filter(user=request.user, is_correct=True).values_list('question_id', flat=True))
-        elif question_filter == 'incorrect':
-            questions = questions.filter(id__in=UserAnswer.objects.filter(user=request.user, is_correct=False).values_list('question_id', flat=True))
-        
-        question_ids = list(questions.values_list('id', flat=True).distinct())
-        
-        if not question_ids:
-            messages.info(request, "No live questions found for your selected topics and filters.")
-            return redirect('quiz_setup')
-        
-        random.shuffle(question_ids)
-        
         # Handle question count limits
+        requested_count = None
         if profile.membership == 'Free':
-            question_ids = question_ids[:10]
+            requested_count = 10
         elif request.POST.get('question_count_type') == 'custom':
             try:
                 custom_count = int(request.POST.get('question_count_custom', 0))
                 if custom_count > 0:
-                    question_ids = question_ids[:custom_count]
+                    requested_count = custom_count
             except (ValueError, TypeError): pass
-        
-        if len(question_ids) > MAX_QUESTIONS_PER_QUIZ:
-            if profile.membership != 'Free':
+
+        # OPTIMIZATION: Sample only the questions we need from the cached per-subtopic ID pools
+        # (see quiz/sampling.py) instead of loading and shuffling every matching ID. The history
+        # filters are bitwise operations on cached per-user bitsets (see quiz/bitsets.py).
+        if requested_count is None or requested_count > MAX_QUESTIONS_PER_QUIZ:
+            sample_size = MAX_QUESTIONS_PER_QUIZ
+            if profile.membership != 'Free' and count_matching_questions(request.user.id, selected_subtopic_ids, question_filter) > MAX_QUESTIONS_PER_QUIZ:
                  messages.warning(request, f"To ensure stability, the quiz has been limited to the maximum of {MAX_QUESTIONS_PER_QUIZ} questions.")
-            question_ids = question_ids[:MAX_QUESTIONS_PER_QUIZ]
+        else:
+            sample_size = requested_count
+        question_ids = sample_filtered_question_ids(request.user.id, selected_subtopic_ids, question_filter, sample_size)
+
+        if not question_ids:
+            messages.info(request, "No live questions found for your selected topics and filters.")
+            return redirect('quiz_setup')
 
 
         # Initialize quiz context
         quiz_mode = request.POST.get('quiz_mode', 'quiz')
         quiz_context = {
-            'question_ids': question_ids, 'total_questions': len(question_ids),
-            'mode': quiz_mode, 'user_answers': {},
+            'question_ids': list(question_ids), 'total_questions': len(question_ids),
+            'mode': quiz_mode,
             'penalty_value': 0.0
         }
 
@@ -299,56 +321,203 @@ def quiz_setup(request):
                 pass
 
 
-        request.session['quiz_context'] = quiz_context
+        _begin_quiz(request, quiz_context)
         return redirect('start_quiz')
 
     # GET request: Display the form
-    # Optimized the query using Prefetch objects to prevent timeouts in production.
-    try:
-        # 1. Define Prefetch for Subtopics: Only fetch subtopics that have LIVE questions.
-        live_subtopics = Prefetch(
-            'subtopics',
-            queryset=Subtopic.objects.filter(questions__status='LIVE').distinct()
-        )
-        
-        # 2. Define Prefetch for Topics: Only fetch topics that have LIVE questions, 
-        #    AND apply the live_subtopics prefetch to them.
-        live_topics = Prefetch(
-            'topics',
-            queryset=Topic.objects.filter(subtopics__questions__status='LIVE').distinct().prefetch_related(live_subtopics)
-        )
+    # OPTIMIZATION: The live Category -> Topic -> Subtopic tree is served from a cached snapshot
+    # (see quiz/taxonomy.py), so a cache hit costs no SQL queries at all.
+    snapshot = get_taxonomy_snapshot()
 
-        # 3. Fetch Categories: Only fetch categories that have LIVE questions,
-        #    AND apply the live_topics prefetch.
-        categories = Category.objects.filter(
-            topics__subtopics__questions__status='LIVE'
-        ).distinct().prefetch_related(live_topics)
+    context = {'categories': snapshot['categories'], 'exam_blueprints': get_active_blueprints()}
+    return render(request, 'quiz/quiz_setup.html', context)
 
-    except DatabaseError:
-        # Fallback if the 'status' column is missing (maintains resilience during deployment).
-        logger.warning("DatabaseError in quiz_setup (GET). 'status' column likely missing. Falling back to loading all categories (less efficient).")
-        categories = Category.objects.prefetch_related('topics__subtopics').all()
 
-    
-    context = {'categories': categories}
-    return render(request, 'quiz/quiz_setup.html', context)
+@login_required
+@premium_required
+@csrf_protect
+def start_mock_exam(request, blueprint_id):
+    """Builds a test-mode quiz following an exam blueprint's category/topic quotas"""
+    if request.method != 'POST':
+        return redirect('quiz_setup')
+
+    blueprint = get_object_or_404(ExamBlueprint.objects.prefetch_related('strata'), pk=blueprint_id, is_active=True)
+    question_ids = generate_exam_question_ids(blueprint, MAX_QUESTIONS_PER_QUIZ)
+
+    if not question_ids:
+        messages.info(request, "No live questions are available for this mock exam yet.")
+        return redirect('quiz_setup')
+
+    # Free users get the same 10-question sample as regular quizzes
+    if request.user.profile.membership == 'Free':
+        question_ids = question_ids[:10]
+
+    quiz_context = {
+        'question_ids': question_ids, 'total_questions': len(question_ids),
+        'mode': 'test',
+        'penalty_value': 0.0
+    }
+    if blueprint.time_limit_minutes:
+        quiz_context['start_time'] = timezone.now().isoformat()
+        quiz_context['duration_seconds'] = blueprint.time_limit_minutes * 60
+
+    _begin_quiz(request, quiz_context)
+    return redirect('start_quiz')
+
+
+@login_required
+def matching_questions_count(request):
+    """JSON count of live questions matching the quiz setup form, served from precomputed counts"""
+    try:
+        subtopic_ids = [int(id) for id in request.GET.getlist('subtopics')]
+    except (ValueError, TypeError):
+        return JsonResponse({'status': 'error', 'message': 'Invalid topic selection.'}, status=400)
+
+    question_filter = request.GET.get('question_filter', 'all')
+    count = count_matching_questions(request.user.id, subtopic_ids, question_filter)
+    return JsonResponse({'status': 'success', 'count': count})
 
 
 @login_required
 def start_quiz(request):
-    if 'quiz_context' in request.session:
-        request.session['quiz_context']['user_answers'] = {}
-        request.session.modified = True
+    quiz_context = _load_quiz_context(request)
+    if quiz_context:
+        clear_attempt_answers(quiz_context['attempt_id'])
+        # OPTIMIZATION: Warm the answer keys for the whole quiz in bulk, so validating each
+        # answer is a cached dict lookup instead of an Answer query (see quiz/bundles.py)
+        get_answer_keys(_get_question_ids(quiz_context))
         return redirect('quiz_player', question_index=1)
     messages.error(request, "Could not start quiz. Please try setting it up again.")
     return redirect('quiz_setup')
 
+# --- Quiz Player Helpers (shared by the HTML player and the JSON player API) ---
+# OPTIMIZATION: The quiz lives in a server-side attempt (see quiz/attempts.py) and the session
+# only holds its ID, so an answer is a single-field write rather than a rewrite of the session.
+
+def _begin_quiz(request, quiz_context):
+    """Stores a new quiz attempt (replacing any unfinished one) and keeps only its ID in the session"""
+    delete_attempt(request.session.get(ATTEMPT_SESSION_KEY))
+    request.session[ATTEMPT_SESSION_KEY] = create_attempt(request.user.id, quiz_context)
+
+def _get_question_ids(quiz_context):
+    """Returns the quiz's ordered question IDs as stored in the attempt when it was created.
+
+    They are never re-sampled: the bank and the user's history change while the quiz runs, so a
+    second draw could return a different list than the one being answered and scored."""
+    question_ids = quiz_context.get('question_ids')
+    if question_ids is None:
+        logger.error(f"Quiz attempt {quiz_context.get('attempt_id')} has no stored question list")
+        return []
+    return question_ids
+
+def _load_quiz_context(request):
+    """Returns the settings of the user's active quiz attempt (including 'attempt_id'), or None"""
+    attempt_id = request.session.get(ATTEMPT_SESSION_KEY)
+    if not attempt_id:
+        return None
+    quiz_context = get_attempt_meta(attempt_id, request.user.id)
+    if quiz_context is not None:
+        quiz_context['attempt_id'] = attempt_id
+    return quiz_context
+
+def _get_seconds_remaining(quiz_context):
+    """Returns the seconds left on a timed quiz (0 once expired), or None for untimed quizzes"""
+    if 'start_time' not in quiz_context:
+        return None
+    try:
+        start_time = datetime.fromisoformat(quiz_context['start_time'])
+        duration = timedelta(seconds=quiz_context.get('duration_seconds', 0))
+
+        # Robust Timezone Handling
+        now = timezone.now()
+        # Check if start_time is naive while now is aware
+        if timezone.is_naive(start_time) and timezone.is_aware(now):
+             # If start_time lost timezone info, assume UTC
+             start_time = timezone.make_aware(start_time, timezone.utc)
+
+        time_passed = now - start_time
+        return max(0, int((duration - time_passed).total_seconds()))
+    except (ValueError, TypeError) as e:
+         logger.error(f"Error processing timer data: {e}. Session data: {quiz_context.get('start_time')}", exc_info=True)
+         # Clear bad timer data
+         del quiz_context['start_time']
+         update_attempt_meta(quiz_context['attempt_id'], start_time=None)
+         return None
+
+def _record_answer(request, quiz_context, question_id, submitted_answer_id_str, submit=False):
+    """Stores the user's answer choice for a question in the quiz attempt and returns its answer info"""
+    attempt_id = quiz_context['attempt_id']
+    current_answer_info = get_attempt_answer(attempt_id, question_id) or {}
+    is_submitted_now = current_answer_info.get('is_submitted', False)
+
+    if quiz_context.get('mode', 'quiz') == 'quiz':
+        # Feedback rule: once an answer has been submitted in quiz mode it is locked
+        if is_submitted_now:
+            return current_answer_info
+        is_submitted_now = submit
+
+    new_answer_info = None
+    if submitted_answer_id_str:
+        try:
+            # Security: Ensure the answer belongs to the current question
+            answer_id = int(submitted_answer_id_str)
+            answer_key = get_answer_key(question_id)
+            if answer_id not in answer_key:
+                raise ValueError("Answer does not belong to the question")
+            new_answer_info = {
+                'answer_id': answer_id,
+                'is_correct': answer_key[answer_id],
+                'is_submitted': is_submitted_now
+            }
+        except (ValueError, TypeError):
+            # Log potential tampering attempt
+            logger.warning(f"User {request.user.id} attempted to submit invalid answer ID {submitted_answer_id_str} for question {question_id}")
+    elif is_submitted_now and not current_answer_info:
+         # Handle submitting a blank answer in quiz mode
+         new_answer_info = {'answer_id': None, 'is_correct': False, 'is_submitted': True}
+
+    if new_answer_info is None:
+        return current_answer_info or None
+    save_attempt_answer(attempt_id, question_id, new_answer_info)
+    if not current_answer_info:
+        try:
+            # Live answer-rate counter for the security dashboard, counted once per question per attempt
+            # (changing or submitting the choice doesn't count again); a counter outage must not lose the answer
+            record_answer(request.user.id)
+        except Exception as e:
+            logger.error(f"Error recording answer rate for user {request.user.id}: {e}", exc_info=True)
+    return new_answer_info
+
+def encode_navigator_state(question_ids, user_answers, flagged_ids, quiz_mode):
+    """Packs the navigator into one hex digit per question position (see the NAV_* bits).
+    The correct bit is only set for submitted quiz-mode answers, so test mode never leaks results."""
+    digits = []
+    for q_id in question_ids:
+        bits = 0
+        answer_info = user_answers.get(q_id)
+        if answer_info:
+            bits |= NAV_ANSWERED
+            if quiz_mode == 'quiz' and answer_info.get('is_submitted'):
+                bits |= NAV_SUBMITTED
+                if answer_info.get('is_correct'):
+                    bits |= NAV_CORRECT
+        if q_id in flagged_ids:
+            bits |= NAV_FLAGGED
+        digits.append(NAV_DIGITS[bits])
+    return ''.join(digits)
+
+def _toggle_flag(user, question_id):
+    """Flags or unflags a question for review and returns the new flagged state"""
+    # OPTIMIZATION: Written to the cached flag set; persisted to FlaggedQuestion by a batched flush
+    return toggle_flag(user.id, question_id)
+
+
 @login_required
 @rate_limit_quiz
 @csrf_protect
 def quiz_player(request, question_index):
     """Quiz player with rate limiting and session validation"""
-    quiz_context = request.session.get('quiz_context')
+    quiz_context = _load_quiz_context(request)
     
     # Security: Validate quiz session structure
     if not quiz_context or not isinstance(quiz_context, dict):
@@ -361,13 +530,13 @@ def quiz_player(request, question_index):
     except (ValueError, TypeError):
         raise Http404("Invalid question index")
 
-    question_ids = quiz_context.get('question_ids', [])
+    question_ids = _get_question_ids(quiz_context)
     total_questions = len(question_ids)
 
     # Security: Validate question IDs in session are integers
     if not all(isinstance(id, int) for id in question_ids):
         messages.error(request, "Invalid quiz data in session. Please start a new quiz.")
-        request.session.pop('quiz_context', None) # Clear bad session
+        delete_attempt(request.session.pop(ATTEMPT_SESSION_KEY, None)) # Clear bad session
         return redirect('quiz_setup')
 
     # Ensure index is within bounds
@@ -390,36 +559,10 @@ def quiz_player(request, question_index):
     # Handle POST request (Answering and Navigation)
     if request.method == 'POST':
         action = request.POST.get('action')
-        submitted_answer_id_str = request.POST.get('answer')
-        user_answers = quiz_context.get('user_answers', {})
-        current_answer_info = user_answers.get(str(question_id), {}).copy()
-        is_submitted_now = current_answer_info.get('is_submitted', False)
-
-        if quiz_mode == 'quiz' and action == 'submit_answer':
-            is_submitted_now = True
-
-        if submitted_answer_id_str:
-            try:
-                # Security: Ensure the answer belongs to the current question
-                answer = Answer.objects.get(id=int(submitted_answer_id_str), question_id=question_id)
-                quiz_context['user_answers'][str(question_id)] = {
-                    'answer_id': answer.id,
-                    'is_correct': answer.is_correct,
-                    'is_submitted': is_submitted_now
-                }
-            except (Answer.DoesNotExist, ValueError):
-                # Log potential tampering attempt
-                logger.warning(f"User {request.user.id} attempted to submit invalid answer ID {submitted_answer_id_str} for question {question_id}")
-                pass
-        elif is_submitted_now and str(question_id) not in user_answers:
-             # Handle submitting a blank answer in quiz mode
-             quiz_context['user_answers'][str(question_id)] = {'answer_id': None, 'is_correct': False, 'is_submitted': True}
+        _record_answer(request, quiz_context, question_id, request.POST.get('answer'), submit=action == 'submit_answer')
 
         if action == 'toggle_flag':
-            flag, created = FlaggedQuestion.objects.get_or_create(user=request.user, question_id=question_id)
-            if not created: flag.delete()
-
-        request.session.modified = True
+            _toggle_flag(request.user, question_id)
 
         # Navigation logic
         navigate_to_index_str = request.POST.get('navigate_to')
@@ -446,66 +589,32 @@ def quiz_player(request, question_index):
         progress_percentage = 0
 
     # Prepare context data
-    question = get_object_or_404(Question.objects.prefetch_related('answers'), pk=question_id)
+    # OPTIMIZATION: Serve the question from the versioned bundle cache (see quiz/bundles.py)
+    question = get_question_bundle(question_id)
+    if question is None:
+        raise Http404("Question not found")
     
-    user_answers = quiz_context.get('user_answers', {})
-    user_answer_info = user_answers.get(str(question_id))
-    seconds_remaining = None
+    user_answers = get_attempt_answers(quiz_context['attempt_id'])
+    user_answer_info = user_answers.get(question_id)
 
     # Timer Logic
-    if 'start_time' in quiz_context:
-        try:
-            start_time = datetime.fromisoformat(quiz_context['start_time'])
-            duration = timedelta(seconds=quiz_context.get('duration_seconds', 0))
-
-            # Robust Timezone Handling
-            now = timezone.now()
-            # Check if start_time is naive while now is aware
-            if timezone.is_naive(start_time) and timezone.is_aware(now):
-                 # If start_time lost timezone info, assume UTC
-                 start_time = timezone.make_aware(start_time, timezone.utc)
-
-            time_passed = now - start_time
-            seconds_remaining = max(0, int((duration - time_passed).total_seconds()))
-            if seconds_remaining <= 0:
-                messages.info(request, "Time is up! The quiz has been automatically submitted.")
-                return redirect('quiz_results')
-        except (ValueError, TypeError) as e:
-             logger.error(f"Error processing timer data: {e}. Session data: {quiz_context.get('start_time')}", exc_info=True)
-             # Clear bad timer data
-             del quiz_context['start_time']
-             request.session.modified = True
+    seconds_remaining = _get_seconds_remaining(quiz_context)
+    if seconds_remaining is not None and seconds_remaining <= 0:
+        messages.info(request, "Time is up! The quiz has been automatically submitted.")
+        return redirect('quiz_results')
 
     # Navigator setup
-    user_flagged_ids = set(FlaggedQuestion.objects.filter(user=request.user, question_id__in=question_ids).values_list('question_id', flat=True))
-    navigator_items = []
-
-    for i, q_id in enumerate(question_ids):
-        idx = i + 1
-        answer_info = user_answers.get(str(q_id))
-        btn_class = 'btn-outline-secondary'
-        if answer_info:
-            if quiz_mode == 'test':
-                 btn_class = 'btn-primary'
-            elif quiz_mode == 'quiz':
-                if answer_info.get('is_submitted'):
-                     btn_class = 'btn-success' if answer_info.get('is_correct') else 'btn-danger'
-                else:
-                    btn_class = 'btn-primary'
-        if idx == question_index:
-            btn_class = btn_class.replace('btn-outline-', 'btn-') + ' active'
-        navigator_items.append({'index': idx, 'class': btn_class, 'is_flagged': q_id in user_flagged_ids})
+    # OPTIMIZATION: The navigator is sent as one compact string and rendered client-side
+    user_flagged_ids = get_flagged_ids(request.user.id)
+    navigator_state = encode_navigator_state(question_ids, user_answers, user_flagged_ids, quiz_mode)
 
     if quiz_mode == 'quiz' and user_answer_info and user_answer_info.get('is_submitted'):
         is_feedback_mode = True
 
-    # Safely fetch user answer object for feedback mode
+    # Look up the selected answer for feedback mode (already part of the question bundle)
     user_answer_obj = None
     if is_feedback_mode and user_answer_info and user_answer_info.get('answer_id'):
-        try:
-            user_answer_obj = Answer.objects.get(id=user_answer_info['answer_id'])
-        except Answer.DoesNotExist:
-            pass
+        user_answer_obj = get_bundle_answer(question, user_answer_info['answer_id'])
 
     # Ensure penalty value is a Decimal for template display
     try:
@@ -523,23 +632,210 @@ def quiz_player(request, question_index):
         'user_selected_answer_id': user_answer_info.get('answer_id') if user_answer_info else None,
         'user_answer': user_answer_obj,
         'is_last_question': question_index == total_questions,
-        'flagged_questions': user_flagged_ids,
+        'is_flagged': question_id in user_flagged_ids,
         'seconds_remaining': seconds_remaining,
-        'navigator_items': navigator_items,
         'penalty_value': penalty_value_decimal,
+        'player_config': {
+            'index': question_index,
+            'total': total_questions,
+            'mode': quiz_mode,
+            'page_size': QUIZ_API_PAGE_SIZE,
+            'navigator': navigator_state,
+            'urls': {
+                'questions': reverse('quiz_api_questions'),
+                'answer': reverse('quiz_api_answer'),
+                'flag': reverse('quiz_api_flag'),
+                'navigate': reverse('quiz_api_navigate'),
+                'results': reverse('quiz_results'),
+                'player': reverse('quiz_player', kwargs={'question_index': 0}),
+            },
+        },
     }
     return render(request, 'quiz/quiz_player.html', context)
 
 
+# --- Quiz Player API (single-page player) ---
+# The player template loads question payloads in pages and sends answers, flags and navigation
+# as small JSON calls, so a quiz no longer costs a POST, a redirect and a full render per click.
+
+QUIZ_API_PAGE_SIZE = 20
+# Per-user budget shared by the player event endpoints (answer, flag, navigate): plenty for a person
+# working through a quiz, but it stops a script from walking every question's answer key
+PLAYER_EVENT_RATE = '120/m'
+# Questions per page of the post-quiz review
+REVIEW_PAGE_SIZE = 20
+REVIEW_FILTERS = ('all', 'incorrect')
+
+def _get_api_quiz_context(request):
+    """Returns the validated quiz context of the user's active attempt, or None"""
+    quiz_context = _load_quiz_context(request)
+    if not quiz_context or not isinstance(quiz_context, dict):
+        return None
+    # Security: Validate question IDs in session are integers
+    question_ids = _get_question_ids(quiz_context)
+    if not all(isinstance(id, int) for id in question_ids):
+        return None
+    quiz_context['question_ids'] = question_ids
+    return quiz_context
+
+def _quiz_expired_response():
+    return JsonResponse({'status': 'expired', 'message': "Time is up! The quiz has been automatically submitted.",
+                         'redirect': reverse('quiz_results')})
+
+def _question_payload(bundle, index, quiz_context, answer_info, is_flagged):
+    """Serializes one question for the player. Correctness and the explanation are only included
+    once the answer has been submitted in quiz mode (the same feedback rule as the HTML player)."""
+    is_feedback_mode = bool(quiz_context.get('mode', 'quiz') == 'quiz' and answer_info and answer_info.get('is_submitted'))
+    payload = {
+        'index': index,
+        'id': bundle['id'],
+        'question_text': bundle['question_text'],
+        'image_url': bundle['image_url'],
+        'answers': [{'id': answer['id'], 'answer_text': answer['answer_text']} for answer in bundle['answers']],
+        'selected_answer_id': answer_info.get('answer_id') if answer_info else None,
+        'is_submitted': bool(answer_info and answer_info.get('is_submitted')),
+        'is_flagged': is_flagged,
+        'is_feedback_mode': is_feedback_mode,
+    }
+    if is_feedback_mode:
+        payload['is_correct'] = answer_info.get('is_correct', False)
+        payload['correct_answer_ids'] = [answer['id'] for answer in bundle['answers'] if answer['is_correct']]
+        payload['explanation'] = bundle['explanation']
+    return payload
+
+def _parse_player_event(request):
+    """Validates a player API event and returns (quiz_context, data, index, question_id, error_response)"""
+    if request.method != 'POST':
+        return None, None, None, None, JsonResponse({'status': 'error', 'message': 'Invalid request method.'}, status=405)
+    # Set by the ratelimit decorator on the event views (block=False, so the client gets a JSON 429)
+    if getattr(request, 'limited', False):
+        return None, None, None, None, JsonResponse({'status': 'error', 'message': 'Too many requests. Please slow down.'}, status=429)
+
+    quiz_context = _get_api_quiz_context(request)
+    if quiz_context is None:
+        return None, None, None, None, JsonResponse({'status': 'error', 'message': 'No active quiz.'}, status=409)
+
+    try:
+        data = json.loads(request.body)
+        index = int(data.get('index'))
+    except (json.JSONDecodeError, AttributeError, ValueError, TypeError):
+        return None, None, None, None, JsonResponse({'status': 'error', 'message': 'Invalid request data.'}, status=400)
+
+    question_ids = quiz_context.get('question_ids', [])
+    # Security: Validate the question position
+    if not (0 < index <= len(question_ids)):
+        return None, None, None, None, JsonResponse({'status': 'error', 'message': 'Invalid question index.'}, status=400)
+
+    # The timer is enforced server-side: no events are accepted once it has run out
+    seconds_remaining = _get_seconds_remaining(quiz_context)
+    if seconds_remaining is not None and seconds_remaining <= 0:
+        return None, None, None, None, _quiz_expired_response()
+
+    return quiz_context, data, index, question_ids[index - 1], None
+
+
+@login_required
+@rate_limit_quiz_api
+def quiz_api_questions(request):
+    """Returns one page of question payloads for the active quiz"""
+    quiz_context = _get_api_quiz_context(request)
+    if quiz_context is None:
+        return JsonResponse({'status': 'error', 'message': 'No active quiz.'}, status=409)
+
+    seconds_remaining = _get_seconds_remaining(quiz_context)
+    if seconds_remaining is not None and seconds_remaining <= 0:
+        return _quiz_expired_response()
+
+    question_ids = quiz_context.get('question_ids', [])
+    page_count = max(1, -(-len(question_ids) // QUIZ_API_PAGE_SIZE))
+    try:
+        page = int(request.GET.get('page', 1))
+    except (ValueError, TypeError):
+        page = 0
+    if not (0 < page <= page_count):
+        return JsonResponse({'status': 'error', 'message': 'Invalid page.'}, status=400)
+
+    start = (page - 1) * QUIZ_API_PAGE_SIZE
+    page_ids = question_ids[start:start + QUIZ_API_PAGE_SIZE]
+    bundles = get_question_bundles(page_ids)
+    flagged_ids = get_flagged_ids(request.user.id)
+    answers = get_attempt_answers(quiz_context['attempt_id'], page_ids)
+
+    questions = [
+        _question_payload(bundles[q_id], start + offset + 1, quiz_context, answers.get(q_id), q_id in flagged_ids)
+        for offset, q_id in enumerate(page_ids) if q_id in bundles
+    ]
+    return JsonResponse({
+        'status': 'success',
+        'page': page,
+        'page_count': page_count,
+        'page_size': QUIZ_API_PAGE_SIZE,
+        'total_questions': len(question_ids),
+        'seconds_remaining': seconds_remaining,
+        'questions': questions,
+    })
+
+
+@login_required
+@csrf_protect
+@ratelimit(key='user', rate=PLAYER_EVENT_RATE, method='POST', group='quiz_player_api', block=False)
+def quiz_api_answer(request):
+    """Records an answer selection (or a quiz-mode submission) and returns the updated question"""
+    quiz_context, data, index, question_id, error = _parse_player_event(request)
+    if error:
+        return error
+
+    bundle = get_question_bundle(question_id)
+    if bundle is None:
+        return JsonResponse({'status': 'error', 'message': 'Question not found.'}, status=404)
+
+    answer_id = data.get('answer_id')
+    answer_info = _record_answer(request, quiz_context, question_id, str(answer_id) if answer_id is not None else None,
+                                 submit=bool(data.get('submit')))
+    is_flagged = question_id in get_flagged_ids(request.user.id)
+    return JsonResponse({'status': 'success', 'question': _question_payload(bundle, index, quiz_context, answer_info, is_flagged)})
+
+
+@login_required
+@csrf_protect
+@ratelimit(key='user', rate=PLAYER_EVENT_RATE, method='POST', group='quiz_player_api', block=False)
+def quiz_api_flag(request):
+    """Toggles the review flag on a question"""
+    quiz_context, data, index, question_id, error = _parse_player_event(request)
+    if error:
+        return error
+    return JsonResponse({'status': 'success', 'index': index, 'is_flagged': _toggle_flag(request.user, question_id)})
+
+
+@login_required
+@csrf_protect
+@ratelimit(key='user', rate=PLAYER_EVENT_RATE, method='POST', group='quiz_player_api', block=False)
+def quiz_api_navigate(request):
+    """Records the current position and re-syncs the client timer"""
+    quiz_context, data, index, question_id, error = _parse_player_event(request)
+    if error:
+        return error
+    update_attempt_meta(quiz_context['attempt_id'], current_index=index)
+    return JsonResponse({'status': 'success', 'index': index, 'seconds_remaining': _get_seconds_remaining(quiz_context)})
+
+
 @login_required
 @csrf_protect
 def quiz_results(request):
-    # Retrieve and clear the quiz context from the session
-    quiz_context = request.session.pop('quiz_context', None)
+    # Retrieve the quiz attempt and clear it from the session
+    quiz_context = _load_quiz_context(request)
+    request.session.pop(ATTEMPT_SESSION_KEY, None)
     if not quiz_context: return redirect('home')
 
-    user_answers_dict = quiz_context.get('user_answers', {})
-    question_ids = quiz_context.get('question_ids', [])
+    user_answers_dict = get_attempt_answers(quiz_context['attempt_id'])
+    # The finished attempt backs the paginated review (quiz_review) until the next quiz finishes or it expires
+    previous_review_id = request.session.get(REVIEW_SESSION_KEY)
+    if previous_review_id and previous_review_id != quiz_context['attempt_id']:
+        delete_attempt(previous_review_id)
+    request.session[REVIEW_SESSION_KEY] = quiz_context['attempt_id']
+    # Persist the flags toggled during the quiz (write-behind, see quiz/flags.py)
+    flush_user_flags(request.user.id)
+    question_ids = _get_question_ids(quiz_context)
     total_questions = len(question_ids)
 
     try:
@@ -548,42 +844,24 @@ def quiz_results(request):
         penalty_value = Decimal(0)
 
 
-    questions_in_quiz = Question.objects.filter(pk__in=question_ids).prefetch_related('answers')
-    question_map = {q.id: q for q in questions_in_quiz}
+    # OPTIMIZATION: Scoring only needs to know which questions still exist; the question bundles are
+    # loaded a page at a time by quiz_review, so the summary renders without them.
+    existing_ids = set(Question.objects.filter(id__in=question_ids).values_list('id', flat=True))
 
     # Initialize counters and lists for bulk operations
     correct_count = 0
     incorrect_count = 0
-    review_data = []
-    user_answers_to_process = []
-
-    # OPTIMIZATION: Fetch existing UserAnswers
-    existing_user_answers = UserAnswer.objects.filter(user=request.user, question_id__in=question_ids)
-    existing_ua_map = {ua.question_id: ua for ua in existing_user_answers}
+    answer_results = []
 
     for q_id in question_ids:
-        question = question_map.get(q_id)
-        if question:
-            answer_info = user_answers_dict.get(str(q_id))
-            user_answer_obj = None
-            is_correct = False
+        if q_id in existing_ids:
+            answer_info = user_answers_dict.get(q_id)
 
             if answer_info:
                 # Question was answered (or submitted blank in Quiz mode)
-                if answer_info.get('answer_id'):
-                    user_answer_obj = next((a for a in question.answers.all() if a.id == answer_info['answer_id']), None)
-
                 is_correct = answer_info.get('is_correct', False)
 
-                # OPTIMIZATION: Prepare in-memory instances for bulk update/create
-                ua_instance = existing_ua_map.get(q_id)
-                
-                if ua_instance:
-                    ua_instance.is_correct = is_correct
-                else:
-                    ua_instance = UserAnswer(user=request.user, question=question, is_correct=is_correct)
-                
-                user_answers_to_process.append(ua_instance)
+                answer_results.append((q_id, is_correct, answer_info.get('answer_id')))
 
                 if is_correct:
                     correct_count += 1
@@ -595,24 +873,18 @@ def quiz_results(request):
             elif quiz_context.get('mode') == 'test' or penalty_value > 0:
                  incorrect_count += 1
 
-            review_data.append({'question': question, 'user_answer': user_answer_obj})
-
-    # OPTIMIZATION: Execute Bulk Operations
-    to_create = [ua for ua in user_answers_to_process if ua.pk is None]
-    to_update = [ua for ua in user_answers_to_process if ua.pk is not None]
-
-    if to_create:
+    if answer_results:
+        # OPTIMIZATION: Queued for a batched upsert and AnswerEvent log (see quiz/ingest.py). With a drain
+        # worker the page renders from the attempt without waiting on the writes; without one the queue
+        # is drained inline here.
         try:
-            UserAnswer.objects.bulk_create(to_create)
+            enqueue_results(request.user.id, answer_results, attempt_id=quiz_context['attempt_id'])
         except Exception as e:
-            logger.error(f"Error during bulk_create of UserAnswers: {e}", exc_info=True)
-    
-    if to_update:
-        try:
-            # 'timestamp' (auto_now=True) updates automatically.
-            UserAnswer.objects.bulk_update(to_update, ['is_correct'])
-        except Exception as e:
-            logger.error(f"Error during bulk_update of UserAnswers: {e}", exc_info=True)
+            logger.error(f"Error queueing UserAnswers: {e}", exc_info=True)
+        else:
+            # Keep the cached answer history bitsets in step with the rows just queued
+            record_user_answers(request.user.id, [(q_id, is_correct) for q_id, is_correct, _ in answer_results])
+        bump_dashboard_generation(request.user.id)
 
     # --- Score Calculation ---
     total_penalty = incorrect_count * penalty_value
@@ -629,7 +901,7 @@ def quiz_results(request):
         'final_score': final_score.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP),
         'total_questions': total_questions,
         'percentage_score': percentage_score.quantize(Decimal('0.1'), rounding=ROUND_HALF_UP),
-        'review_data': review_data,
+        'incorrect_review_count': total_questions - correct_count,
         'penalty_applied': penalty_value > 0,
         'penalty_value': penalty_value.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP),
         'total_penalty': total_penalty.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP),
@@ -638,6 +910,49 @@ def quiz_results(request):
     }
     return render(request, 'quiz/results.html', context)
 
+@login_required
+def quiz_review(request):
+    """Serves one page of the last finished quiz's question review (a fragment for the results page with ?fragment=1)"""
+    attempt_id = request.session.get(REVIEW_SESSION_KEY)
+    review_context = get_attempt_meta(attempt_id, request.user.id)
+    if not review_context:
+        messages.info(request, "The review for that quiz is no longer available.")
+        return redirect('dashboard')
+
+    question_ids = _get_question_ids(review_context)
+    user_answers = get_attempt_answers(attempt_id)
+    review_filter = request.GET.get('filter')
+    if review_filter not in REVIEW_FILTERS:
+        review_filter = 'all'
+
+    positions = list(enumerate(question_ids, start=1))
+    if review_filter == 'incorrect':
+        # Incorrect or unanswered
+        positions = [(number, q_id) for number, q_id in positions if not user_answers.get(q_id, {}).get('is_correct')]
+    page_obj = Paginator(positions, REVIEW_PAGE_SIZE).get_page(request.GET.get('page'))
+
+    # OPTIMIZATION: Only the current page's question bundles are loaded and rendered
+    question_map = get_question_bundles([q_id for _, q_id in page_obj])
+    review_items = []
+    for number, q_id in page_obj:
+        question = question_map.get(q_id)
+        if not question:
+            continue
+        answer_info = user_answers.get(q_id)
+        user_answer = None
+        if answer_info and answer_info.get('answer_id'):
+            user_answer = get_bundle_answer(question, answer_info['answer_id'])
+        review_items.append({'number': number, 'question': question, 'user_answer': user_answer})
+
+    context = {
+        'review_items': review_items,
+        'page_obj': page_obj,
+        'review_filter': review_filter,
+        'total_questions': len(question_ids),
+    }
+    template = 'quiz/review_items.html' if request.GET.get('fragment') else 'quiz/review.html'
+    return render(request, template, context)
+
 
 # --- Dashboard Action Views ---
 
@@ -645,53 +960,58 @@ def quiz_results(request):
 @csrf_protect
 def reset_performance(request):
     if request.method == 'POST':
-        UserAnswer.objects.filter(user=request.user).delete()
-        FlaggedQuestion.objects.filter(user=request.user).delete()
+        with transaction.atomic():
+            # Locked like every other writer of the user's answers and rollups (see quiz/stats.py)
+            lock_users([request.user.id])
+            # Take the user's answers back out of the per-question totals
+            removed = list(UserAnswer.objects.select_for_update().filter(user=request.user).values_list('question_id', 'is_correct'))
+            apply_question_changes([(q_id, is_correct, None) for q_id, is_correct in removed])
+            UserAnswer.objects.filter(user=request.user).delete()
+            reset_user_stats(request.user.id)
+            # The AnswerEvent log is append-only and feeds the platform metrics, so it is kept;
+            # the dashboard's activity chart starts from the reset instead
+            if Profile:
+                Profile.objects.filter(user=request.user).update(stats_reset_at=timezone.now())
+        reset_user_flags(request.user.id)
+        reset_user_bitsets(request.user.id)
+        bump_dashboard_generation(request.user.id)
         messages.success(request, "Your performance statistics and flags have been successfully reset.")
     return redirect('dashboard')
 
 @login_required
 def start_incorrect_quiz(request):
-    # Handle potential DatabaseError if 'status' column is missing
-    try:
-        question_ids = list(UserAnswer.objects.filter(
-            user=request.user, 
-            is_correct=False,
-            question__status='LIVE'
-        ).values_list('question_id', flat=True).distinct())
-    except DatabaseError:
-         logger.warning("DatabaseError in start_incorrect_quiz. 'status' column likely missing. Falling back.")
-         question_ids = list(UserAnswer.objects.filter(
-            user=request.user, 
-            is_correct=False
-        ).values_list('question_id', flat=True).distinct())
+    # OPTIMIZATION: Incorrect = answered and not correct, restricted to live questions,
+    # computed from the cached bitsets instead of a subquery over the user's history.
+    # Capped like any other quiz, so the attempt record doesn't grow with the user's history.
+    answered, correct = get_user_bitsets(request.user.id)
+    question_ids = list(iter_bits(answered & ~correct & get_live_bitset()))
+    random.shuffle(question_ids)
 
     if not question_ids:
         messages.success(request, "Great job! You have no incorrect answers to review (or the questions are currently unavailable).")
         return redirect('dashboard')
-    random.shuffle(question_ids)
-    request.session['quiz_context'] = {'question_ids': question_ids, 'total_questions': len(question_ids), 'mode': 'quiz', 'user_answers': {}, 'penalty_value': 0.0}
+    if len(question_ids) > MAX_QUESTIONS_PER_QUIZ:
+        messages.warning(request, f"To ensure stability, the quiz has been limited to the maximum of {MAX_QUESTIONS_PER_QUIZ} questions.")
+        question_ids = question_ids[:MAX_QUESTIONS_PER_QUIZ]
+    _begin_quiz(request, {'question_ids': question_ids, 'total_questions': len(question_ids),
+                          'mode': 'quiz', 'penalty_value': 0.0})
     return redirect('start_quiz')
 
 @login_required
 def start_flagged_quiz(request):
-    # Handle potential DatabaseError if 'status' column is missing
-    try:
-        question_ids = list(FlaggedQuestion.objects.filter(
-            user=request.user,
-            question__status='LIVE'
-        ).values_list('question_id', flat=True))
-    except DatabaseError:
-        logger.warning("DatabaseError in start_flagged_quiz. 'status' column likely missing. Falling back.")
-        question_ids = list(FlaggedQuestion.objects.filter(
-            user=request.user
-        ).values_list('question_id', flat=True))
-        
+    # OPTIMIZATION: Read from the flag store (including unflushed toggles, see quiz/flags.py), restricted to
+    # live questions with the cached live bitset instead of a join on every request. Capped like any other quiz.
+    is_live = bit_predicate(get_live_bitset())
+    question_ids = sorted(q_id for q_id in get_flagged_ids(request.user.id) if is_live(q_id))
+
     if not question_ids:
         messages.info(request, "You have not flagged any questions for review (or the questions are currently unavailable).")
         return redirect('dashboard')
     random.shuffle(question_ids)
-    request.session['quiz_context'] = {'question_ids': question_ids, 'total_questions': len(question_ids), 'mode': 'quiz', 'user_answers': {}, 'penalty_value': 0.0}
+    if len(question_ids) > MAX_QUESTIONS_PER_QUIZ:
+        messages.warning(request, f"To ensure stability, the quiz has been limited to the maximum of {MAX_QUESTIONS_PER_QUIZ} questions.")
+        question_ids = question_ids[:MAX_QUESTIONS_PER_QUIZ]
+    _begin_quiz(request, {'question_ids': question_ids, 'total_questions': len(question_ids), 'mode': 'quiz', 'penalty_value': 0.0})
     return redirect('start_quiz')
 
 
@@ -727,11 +1047,12 @@ def report_question(request):
                 return JsonResponse({'status': 'error', 'message': 'Reason too long (max 1000 characters).'}, status=400)
             
             # Validate question ID
-            question = get_object_or_404(Question, pk=question_id)
+            if get_question_bundle(question_id) is None:
+                raise Http404("Question not found")
             
             QuestionReport.objects.update_or_create(
                 user=request.user,
-                question=question,
+                question_id=question_id,
                 defaults={'reason': reason, 'status': 'OPEN'}
             )
             
@@ -4,6 +4,7 @@ from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
+from django.db.models.functions import Lower
 from django.utils.html import format_html
 # FIX: We need 'reverse' for the __init__ method.
 from django.urls import reverse
@@ -77,6 +78,8 @@ class CustomUserCreationForm(UserCreationForm):
         Verify that the email address is not already in use.
         """
         email = self.cleaned_data.get('email').lower()
-        if User.objects.filter(email__iexact=email).exists():
+        # OPTIMIZATION: Compare LOWER(email) so the auth_user lower(email) index (users migration 0004)
+        # is used; email__iexact compiles to UPPER() on PostgreSQL and LIKE on SQLite, which can't use it.
+        if User.objects.alias(email_lower=Lower('email')).filter(email_lower=email).exists():
             raise ValidationError("This email address is already in use. Please use a different one.")
         return email
\ No newline at end of file
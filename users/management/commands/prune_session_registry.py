@@ -0,0 +1,17 @@
+# users/management/commands/prune_session_registry.py
+
+from django.core.management.base import BaseCommand
+
+from users.session_registry import prune_session_registry, registry_window
+
+
+class Command(BaseCommand):
+    help = 'Drops sessions and users not seen within the session lifetime from the active-session registry (also done automatically once a minute).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age', type=int, default=None,
+                            help=f'Seconds since last seen to keep (default: SESSION_COOKIE_AGE, {registry_window()}).')
+
+    def handle(self, *args, **options):
+        removed = prune_session_registry(options['max_age'])
+        self.stdout.write(self.style.SUCCESS(f'Pruned {removed} stale session registry entries.'))
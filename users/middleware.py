@@ -3,6 +3,9 @@
 # Import ObjectDoesNotExist (crucial for the fix) and logging
 from django.db.models import ObjectDoesNotExist
 import logging
+import time
+
+from .session_registry import SESSION_SEEN_KEY, SESSION_TOUCH_INTERVAL, touch_session
 
 # Set up logger
 logger = logging.getLogger(__name__)
@@ -45,4 +48,28 @@ class EnsureProfileMiddleware:
 
         
         response = self.get_response(request)
-        return response
\ No newline at end of file
+        return response
+
+
+class SessionRegistryMiddleware:
+    """Records the request's session in the active-session registry (see users/session_registry.py)."""
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # Sessions that haven't been saved yet have no key; they are registered on their next request
+        session_key = request.session.session_key
+        if session_key:
+            user_id = request.user.id if request.user.is_authenticated else None
+            seen_key, seen_user, seen_at = request.session.get(SESSION_SEEN_KEY) or (None, None, 0)
+            now = time.time()
+            # OPTIMIZATION: At most one registry write per session per interval (the marker rides along
+            # in the session, which is saved on every request anyway), unless the key or user changed
+            if (seen_key, seen_user) != (session_key, user_id) or now - seen_at >= SESSION_TOUCH_INTERVAL:
+                try:
+                    touch_session(session_key, user_id, now, replaces=seen_key if seen_key != session_key else None)
+                    request.session[SESSION_SEEN_KEY] = [session_key, user_id, now]
+                except Exception as e:
+                    logger.error(f"Error updating the session registry: {e}", exc_info=True)
+
+        return self.get_response(request)
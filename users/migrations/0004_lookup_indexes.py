@@ -0,0 +1,30 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0003_historicalprofile'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='historicalprofile',
+            name='stripe_customer_id',
+            field=models.CharField(blank=True, db_index=True, max_length=255, null=True),
+        ),
+        migrations.AlterField(
+            model_name='profile',
+            name='stripe_customer_id',
+            field=models.CharField(blank=True, db_index=True, max_length=255, null=True),
+        ),
+        # auth_user belongs to django.contrib.auth, so its case-insensitive email index (used by the
+        # signup duplicate-email check) is created here with raw SQL. Same syntax on SQLite and PostgreSQL.
+        migrations.RunSQL(
+            sql='CREATE INDEX users_auth_user_email_lower_idx ON auth_user (LOWER(email));',
+            reverse_sql='DROP INDEX users_auth_user_email_lower_idx;',
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-17 03:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_activesession'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historicalprofile',
+            name='stats_reset_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='stats_reset_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
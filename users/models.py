@@ -21,11 +21,26 @@ class Profile(models.Model):
     membership_expiry_date = models.DateField(null=True, blank=True)
 
     # Field to store the Stripe Customer ID, linked to their subscription
-    stripe_customer_id = models.CharField(max_length=255, blank=True, null=True)
+    # (indexed: the Stripe webhook looks profiles up by it)
+    stripe_customer_id = models.CharField(max_length=255, blank=True, null=True, db_index=True)
+
+    # When the user last reset their performance statistics; the dashboard's activity chart starts here
+    stats_reset_at = models.DateTimeField(null=True, blank=True)
 
     # Add History Tracking
     history = HistoricalRecords()
 
     # This makes the object display nicely in the admin panel
     def __str__(self):
-        return f'{self.user.username} Profile'
\ No newline at end of file
+        return f'{self.user.username} Profile'
+
+# Active-session registry entries (DB fallback for users/session_registry.py when Redis is not configured)
+class ActiveSession(models.Model):
+    session_key = models.CharField(max_length=40, primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    last_seen = models.DateTimeField(db_index=True)
+    # Cleared on logout: the session stops counting, but its user still counts within the window
+    is_open = models.BooleanField(default=True)
+
+    def __str__(self):
+        return f'Session {self.session_key} seen {self.last_seen}'
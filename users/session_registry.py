@@ -0,0 +1,111 @@
+# users/session_registry.py
+
+import logging
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+
+from quiz.redis_store import get_redis, redis_key
+
+from .models import ActiveSession
+
+logger = logging.getLogger(__name__)
+
+# Active-session registry. Sessions live in the cache backend, so the django_session table is empty
+# and scanning the cache for session keys would be far too slow. Instead SessionRegistryMiddleware
+# records each session key (and its user) in a Redis sorted set scored by last-seen time, at most once
+# per SESSION_TOUCH_INTERVAL per session. Counting the sessions/users seen within a window is then
+# a ZCOUNT (O(log n)), and entries older than the session lifetime are pruned as a side effect of
+# touch_session, at most once per REGISTRY_PRUNE_INTERVAL (`manage.py prune_session_registry` does it
+# on demand). Without REDIS_URL the registry is the ActiveSession table, so every worker shares it
+# (a per-process cache would only count the sessions that hit the admin's own worker).
+ACTIVE_SESSIONS_KEY = 'users:active_sessions'
+ACTIVE_USERS_KEY = 'users:active_users'
+SESSION_TOUCH_INTERVAL = 60  # Seconds between registry updates for the same session
+SESSION_SEEN_KEY = '_registry_seen'  # [session key, user ID, time] last registered; stored in the session
+REGISTRY_PRUNE_KEY = 'users:registry_pruned'
+REGISTRY_PRUNE_INTERVAL = 60  # Seconds between automatic prunes
+
+
+def registry_window():
+    """Seconds a session counts as active by default: the session lifetime."""
+    return settings.SESSION_COOKIE_AGE
+
+
+def _as_datetime(timestamp):
+    return datetime.fromtimestamp(timestamp, tz=dt_timezone.utc)
+
+
+def touch_session(session_key, user_id=None, now=None, replaces=None):
+    """Marks a session (and its user, if logged in) as seen now. `replaces` is the session's previous
+    key, removed after a key change (login cycles the key but keeps the data)."""
+    now = now or time.time()
+    client = get_redis()
+    if client is None:
+        if replaces:
+            ActiveSession.objects.filter(session_key=replaces).delete()
+        # One upsert per touch
+        ActiveSession.objects.bulk_create(
+            [ActiveSession(session_key=session_key, user_id=user_id, last_seen=_as_datetime(now), is_open=True)],
+            update_conflicts=True,
+            unique_fields=['session_key'],
+            update_fields=['user', 'last_seen', 'is_open'],
+        )
+    else:
+        with client.pipeline(transaction=False) as pipe:
+            if replaces:
+                pipe.zrem(redis_key(ACTIVE_SESSIONS_KEY), replaces)
+            pipe.zadd(redis_key(ACTIVE_SESSIONS_KEY), {session_key: now})
+            if user_id is not None:
+                pipe.zadd(redis_key(ACTIVE_USERS_KEY), {user_id: now})
+            pipe.execute()
+
+    # The first touch after the interval (in any worker sharing the cache) prunes the registry
+    if cache.add(REGISTRY_PRUNE_KEY, True, REGISTRY_PRUNE_INTERVAL):
+        prune_session_registry()
+
+
+def forget_session(session_key):
+    """Removes a session from the registry (on logout). The user ages out of their window."""
+    client = get_redis()
+    if client is None:
+        ActiveSession.objects.filter(session_key=session_key).update(is_open=False)
+        return
+    client.zrem(redis_key(ACTIVE_SESSIONS_KEY), session_key)
+
+
+def count_active_sessions(window=None):
+    """Sessions seen within the last `window` seconds (default: the session lifetime)."""
+    since = time.time() - (window or registry_window())
+    client = get_redis()
+    if client is None:
+        return ActiveSession.objects.filter(last_seen__gte=_as_datetime(since), is_open=True).count()
+    return client.zcount(redis_key(ACTIVE_SESSIONS_KEY), since, '+inf')
+
+
+def count_active_users(window=None):
+    """Distinct logged-in users seen within the last `window` seconds (default: the session lifetime)."""
+    since = time.time() - (window or registry_window())
+    client = get_redis()
+    if client is None:
+        return (ActiveSession.objects.filter(last_seen__gte=_as_datetime(since), user__isnull=False)
+                .values('user').distinct().count())
+    return client.zcount(redis_key(ACTIVE_USERS_KEY), since, '+inf')
+
+
+def prune_session_registry(max_age=None):
+    """Drops entries not seen for `max_age` seconds (default: the session lifetime). Returns the number removed."""
+    cutoff = time.time() - (max_age or registry_window())
+    client = get_redis()
+    if client is None:
+        removed, _ = ActiveSession.objects.filter(last_seen__lt=_as_datetime(cutoff)).delete()
+    else:
+        with client.pipeline(transaction=False) as pipe:
+            pipe.zremrangebyscore(redis_key(ACTIVE_SESSIONS_KEY), '-inf', f'({cutoff}')
+            pipe.zremrangebyscore(redis_key(ACTIVE_USERS_KEY), '-inf', f'({cutoff}')
+            removed = sum(pipe.execute())
+    if removed:
+        logger.info(f"Pruned {removed} stale entries from the session registry")
+    return removed
@@ -2,12 +2,21 @@
 
 from django.db.models.signals import post_save
 from django.contrib.auth.models import User
+from django.contrib.auth.signals import user_logged_out
 from django.dispatch import receiver
 from .models import Profile
+from .session_registry import forget_session
 
 # This function will run every time a User object is saved
 @receiver(post_save, sender=User)
 def create_or_update_user_profile(sender, instance, created, **kwargs):
     # 'created' is a boolean that is True if the save operation created a new object
     if created:
-        Profile.objects.create(user=instance)
\ No newline at end of file
+        Profile.objects.create(user=instance)
+
+
+# Logging out flushes the session, so drop it from the active-session registry straight away
+@receiver(user_logged_out)
+def forget_logged_out_session(sender, request, user, **kwargs):
+    if request is not None and request.session.session_key:
+        forget_session(request.session.session_key)